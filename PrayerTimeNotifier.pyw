@@ -1,39 +1,79 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QDialog, QSystemTrayIcon
+from PyQt5.QtWidgets import QApplication, QDialog
 from PyQt5.QtGui import QIcon
-from ui_components import DraggableWindow
-from input_dialog import CityCountryInputDialog  # Import the input dialog from the new file
-from taskbar_tray import SystemTray
 
 
 if __name__ == '__main__':
     try:
         app = QApplication(sys.argv)
+        # The app lives in the tray; closing the overlay window must not quit it
+        app.setQuitOnLastWindowClosed(False)
 
-        # Create a dialog for city and country input
-        dialog = CityCountryInputDialog()
-        if dialog.exec_() == QDialog.Accepted:
-            city_name, country_name = dialog.get_city_country()
+        # One instance per user: a later launch hands its arguments (e.g. --change-location) over and exits
+        from single_instance import QUIT_ARG, RETRY_CONNECT_TIMEOUT_MS, SingleInstance
+        instance = SingleInstance()
+        if instance.forward(sys.argv[1:]):
+            sys.exit(0)
+        if QUIT_ARG in sys.argv[1:]:
+            sys.exit(0)  # Nothing is running, so there is nothing to quit
+        if not instance.listen():
+            # The running instance was busy, or another launch got there first: hand over to it after all
+            if instance.forward(sys.argv[1:], RETRY_CONNECT_TIMEOUT_MS):
+                sys.exit(0)
+            print("Starting without the single instance check.")
+
+        # Show the tray icon first; its menus are filled when they are first opened
+        from taskbar_tray import SystemTray
+        tray = SystemTray(app)
+        tray.setIcon(QIcon("icon.png"))
+        tray.show()  # Show the tray icon
+        instance.message_received.connect(tray.handle_instance_args)
+
+        # Library errors (e.g. unparsable prayer times) are shown as dialogs in the GUI
+        from prayer_time_handler import set_error_reporter
+        set_error_reporter(tray.show_error_dialog)
+
+        # Opt-in metrics file and Prometheus endpoint (see metrics.py); a no-op unless enabled
+        from metrics import start_metrics
+        start_metrics()
 
+        # Reuse the location chosen on an earlier launch; only ask (and load the city list) the first time
+        from settings import load_extra_locations, load_location, save_location
+        location, method = load_location()
+        if location is None:
+            # Create a dialog for city and country input
+            from input_dialog import CityCountryInputDialog
+            dialog = CityCountryInputDialog()
+            if dialog.exec_() != QDialog.Accepted:
+                print("Dialog was canceled.")
+                sys.exit(0)
+
+            city_name, country_name = dialog.get_city_country()
             if not city_name or not country_name:
                 print("City or country name was not provided. Exiting.")
                 sys.exit(1)
 
-            # Create the draggable window
-            window = DraggableWindow(city_name, country_name, None)
+            location = dialog.get_selected_location()
+            save_location(location, method)
+
+        # Create the draggable window; catalogue entries carry coordinates for offline calculation
+        from ui_components import DraggableWindow
+        window = DraggableWindow(
+            location.city, location.country, tray, location.latitude, location.longitude, location.timezone, method
+        )
+
+        # Further locations share the window's scheduler and notification queue and live in the tray menu
+        for extra_location, extra_method in load_extra_locations():
+            window.tracker.add_location(*extra_location, method=extra_method)
 
-            # Create the system tray icon and link the window
-            tray = SystemTray(app, window)
-            window.tray = tray  # Link the tray to the window
-            tray.setIcon(QIcon("icon.png"))
-            tray.show()  # Show the tray icon
+        # Link the window to the tray
+        tray.set_window(window)
 
-            # Prevent app exit on window close
-            app.lastWindowClosed.connect(lambda: app.setQuitOnLastWindowClosed(False))
+        # Arguments given to the first launch are handled like forwarded ones
+        if sys.argv[1:]:
+            tray.handle_instance_args(sys.argv[1:])
 
-            sys.exit(app.exec_())
-        else:
-            print("Dialog was canceled.")
+        sys.exit(app.exec_())
 
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
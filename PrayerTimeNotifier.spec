@@ -1,11 +1,21 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
+
+# The offline city catalogue is generated by build_city_catalogue.py and is optional: without it
+# the app completes cities from the online list
+datas = []
+if os.path.exists(os.path.join(SPECPATH, 'city_catalogue.bin')):
+    datas.append(('city_catalogue.bin', '.'))
+else:
+    print("city_catalogue.bin not found; building without the offline city catalogue. "
+          "Run 'python build_city_catalogue.py' first to include it.")
 
 
 a = Analysis(
     ['PrayerTimeNotifier.pyw'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=datas,
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
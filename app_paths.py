@@ -0,0 +1,23 @@
+import os
+import sys
+
+APP_DIR_NAME = "PrayerTimeNotifier"
+
+
+def get_data_dir():
+    """Return (and create) the per-user directory where the app keeps its files."""
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+
+    path = os.path.join(base, APP_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_data_file(name):
+    """Return the full path of a file inside the app data directory."""
+    return os.path.join(get_data_dir(), name)
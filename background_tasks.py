@@ -0,0 +1,84 @@
+from PyQt5.QtCore import QCoreApplication, QObject, QRunnable, QThreadPool, pyqtSignal
+
+MAX_BACKGROUND_THREADS = 4
+SHUTDOWN_WAIT_MS = 10000  # How long quitting waits for running tasks to finish
+
+_thread_pool = None
+
+
+class TaskSignals(QObject):
+    """Signals a background task uses to hand its outcome back to the GUI thread."""
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    progress = pyqtSignal(object)  # Partial results reported while the task runs
+
+
+class BackgroundTask(QRunnable):
+    """Run a blocking call (usually a network fetch) on a worker thread."""
+
+    def __init__(self, func, *args, **kwargs):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        # Created on the calling (GUI) thread, so connected slots run there as queued calls
+        self.signals = TaskSignals()
+
+    def run(self):
+        try:
+            result = self.func(*self.args, **self.kwargs)
+        except Exception as e:
+            print(f"Background task {getattr(self.func, '__name__', self.func)} failed: {e}")
+            self.emit("failed", str(e))
+        else:
+            self.emit("finished", result)
+
+    def emit(self, signal_name, value):
+        try:
+            getattr(self.signals, signal_name).emit(value)
+        except RuntimeError:
+            pass  # The app quit while the task ran and its signals object is gone
+
+
+def get_thread_pool():
+    """
+    Return the app's own thread pool for blocking work.
+    Qt uses QThreadPool.globalInstance() internally (e.g. while loading images) and blocks on it
+    with the GIL held, so Python tasks must not share that pool.
+    """
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = QThreadPool()
+        _thread_pool.setMaxThreadCount(MAX_BACKGROUND_THREADS)
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(shutdown_thread_pool)
+    return _thread_pool
+
+
+def shutdown_thread_pool():
+    """Drop queued tasks and wait for running ones, so none finishes after Qt has torn down."""
+    if _thread_pool is not None:
+        _thread_pool.clear()
+        _thread_pool.waitForDone(SHUTDOWN_WAIT_MS)
+    QThreadPool.globalInstance().clear()
+    QThreadPool.globalInstance().waitForDone(SHUTDOWN_WAIT_MS)
+
+
+def run_in_background(func, *args, on_result=None, on_error=None, on_progress=None, **kwargs):
+    """
+    Start func(*args, **kwargs) on the app's thread pool and return the task.
+    on_result/on_error are called on the GUI thread with the return value or the error message.
+    With on_progress, func is also passed report=, and every report(value) reaches on_progress on the
+    GUI thread, in order and before on_result.
+    """
+    task = BackgroundTask(func, *args, **kwargs)
+    if on_progress:
+        task.kwargs["report"] = lambda value: task.emit("progress", value)
+        task.signals.progress.connect(on_progress)
+    if on_result:
+        task.signals.finished.connect(on_result)
+    if on_error:
+        task.signals.failed.connect(on_error)
+    get_thread_pool().start(task)
+    return task
@@ -0,0 +1,221 @@
+"""
+Generate prayer timetables for a whole dataset of locations on every CPU core.
+
+    python batch_timetable.py locations.csv --start 2025-01-01 --end 2027-12-31 --methods 2,3,4
+                              --output timetables.npy [--workers N] [--chunk-locations 512] [--chunk-days 366]
+
+locations.csv has a header row with id, latitude, longitude, timezone and optionally elevation;
+timezone is an IANA name, a UTC offset in hours, or empty for the system zone.
+
+The (method x location x date) space is cut into chunks that a process pool computes with
+bulk_timetable.generate_timetable. Workers write each chunk straight into a ring of slots in one
+shared memory block, so only slot numbers travel between processes, and the parent streams finished
+chunks to disk in order and hands their slots out again. Memory therefore depends on the chunk size
+and worker count, not on the size of the output.
+
+Output is chosen by extension:
+    .npy  int16 array shaped (methods, locations, days, len(TIMING_KEYS)) of minutes since local
+          midnight, -1 where a time does not occur; locations in input order. Suited to any size.
+    .csv  one row per (location, method, date) with "HH:MM" columns. Formatting the text runs in
+          the parent, so it does not scale with cores; prefer .npy for national datasets.
+"""
+import argparse
+import csv
+import datetime
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from bulk_timetable import generate_timetable
+from prayer_calculator import CALCULATION_METHODS, DEFAULT_METHOD, TIMING_KEYS
+
+DEFAULT_CHUNK_LOCATIONS = 512
+DEFAULT_CHUNK_DAYS = 366
+SLOTS_PER_WORKER = 2  # One chunk being computed and one waiting to be written, per worker
+
+Locations = namedtuple("Locations", ["ids", "latitudes", "longitudes", "timezones", "elevations"])
+# One unit of work: rows [location_start, location_stop) and days [day_start, day_stop) for one method
+Chunk = namedtuple("Chunk", ["method_index", "method", "location_start", "location_stop", "day_start", "day_stop"])
+
+
+def read_locations(path):
+    """Read a locations CSV into a Locations tuple of lists."""
+    ids, latitudes, longitudes, timezones, elevations = [], [], [], [], []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            ids.append(row.get("id") or str(len(ids)))
+            latitudes.append(float(row["latitude"]))
+            longitudes.append(float(row["longitude"]))
+            timezone = (row.get("timezone") or "").strip()
+            try:
+                timezones.append(float(timezone) if timezone else None)
+            except ValueError:
+                timezones.append(timezone)
+            elevations.append(float(row.get("elevation") or 0))
+    return Locations(ids, latitudes, longitudes, timezones, elevations)
+
+
+def plan_chunks(methods, location_count, day_count, chunk_locations, chunk_days):
+    """Yield the chunks in output order: by method, then location block, then date block."""
+    for method_index, method in enumerate(methods):
+        for location_start in range(0, location_count, chunk_locations):
+            location_stop = min(location_start + chunk_locations, location_count)
+            for day_start in range(0, day_count, chunk_days):
+                yield Chunk(method_index, method, location_start, location_stop,
+                            day_start, min(day_start + chunk_days, day_count))
+
+
+# Per-process state of a pool worker, set once by _init_worker
+_worker = None
+
+
+def _init_worker(memory_name, slots_shape, locations, start_date):
+    global _worker
+    memory = shared_memory.SharedMemory(name=memory_name)
+    slots = np.ndarray(slots_shape, dtype=np.int16, buffer=memory.buf)
+    _worker = (memory, slots, locations, start_date)
+
+
+def _compute_chunk(slot, chunk):
+    """Fill a shared memory slot with one chunk's timetable. Runs in a pool worker."""
+    _, slots, locations, start_date = _worker
+    rows = slice(chunk.location_start, chunk.location_stop)
+    generate_timetable(
+        locations.latitudes[rows], locations.longitudes[rows], locations.timezones[rows],
+        start_date + datetime.timedelta(days=chunk.day_start),
+        start_date + datetime.timedelta(days=chunk.day_stop - 1),
+        method=chunk.method, elevations=locations.elevations[rows],
+        out=slots[slot, :chunk.location_stop - chunk.location_start, :chunk.day_stop - chunk.day_start],
+    )
+    return slot
+
+
+class NpyWriter:
+    """Writes chunks into their place in a .npy file, without holding the whole array."""
+
+    def __init__(self, path, shape):
+        self.shape = shape
+        self.file = open(path, "wb")
+        np.lib.format.write_array_header_1_0(self.file, {"descr": "<i2", "fortran_order": False, "shape": shape})
+        self.data_offset = self.file.tell()
+        self.file.truncate(self.data_offset + int(np.prod(shape)) * 2)
+
+    def write(self, chunk, values):
+        _, locations, days, keys = self.shape
+        for index, location in enumerate(range(chunk.location_start, chunk.location_stop)):
+            row = (chunk.method_index * locations + location) * days + chunk.day_start
+            self.file.seek(self.data_offset + row * keys * 2)
+            self.file.write(values[index].astype("<i2", copy=False).tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+class CsvWriter:
+    """Appends each chunk as rows of "HH:MM" columns."""
+
+    def __init__(self, path, ids, start_date):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["location", "method", "date"] + TIMING_KEYS)
+        self.ids = ids
+        self.start_date = start_date
+        self.labels = [f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)] + [""]  # -1 is the last entry
+
+    def write(self, chunk, values):
+        labels = self.labels
+        dates = [(self.start_date + datetime.timedelta(days=day)).isoformat()
+                 for day in range(chunk.day_start, chunk.day_stop)]
+        for location, rows in zip(self.ids[chunk.location_start:chunk.location_stop], values.tolist()):
+            self.writer.writerows([location, chunk.method, date] + [labels[m] for m in row]
+                                  for date, row in zip(dates, rows))
+
+    def close(self):
+        self.file.close()
+
+
+def run_batch(locations, start_date, end_date, methods, output, workers=None,
+              chunk_locations=DEFAULT_CHUNK_LOCATIONS, chunk_days=DEFAULT_CHUNK_DAYS):
+    """
+    Generate timetables for every location, date in [start_date, end_date] and method, writing them
+    to `output` (.npy or .csv) as chunks finish. Returns the number of (location, method, date) rows.
+    """
+    for method in methods:
+        if method not in CALCULATION_METHODS:
+            raise ValueError(f"Unknown calculation method: {method}")
+    if end_date < start_date:
+        raise ValueError("end_date must not be before start_date.")
+    workers = workers or os.cpu_count() or 1
+    location_count = len(locations.ids)
+    day_count = (end_date - start_date).days + 1
+    chunk_locations = min(chunk_locations, location_count)
+    chunk_days = min(chunk_days, day_count)
+
+    if output.lower().endswith(".npy"):
+        writer = NpyWriter(output, (len(methods), location_count, day_count, len(TIMING_KEYS)))
+    else:
+        writer = CsvWriter(output, locations.ids, start_date)
+
+    slot_count = workers * SLOTS_PER_WORKER
+    slots_shape = (slot_count, chunk_locations, chunk_days, len(TIMING_KEYS))
+    memory = shared_memory.SharedMemory(create=True, size=int(np.prod(slots_shape)) * 2)
+    try:
+        slots = np.ndarray(slots_shape, dtype=np.int16, buffer=memory.buf)
+        worker_locations = Locations(None, np.asarray(locations.latitudes, dtype=np.float64),
+                                     np.asarray(locations.longitudes, dtype=np.float64),
+                                     list(locations.timezones), np.asarray(locations.elevations, dtype=np.float64))
+        chunks = plan_chunks(methods, location_count, day_count, chunk_locations, chunk_days)
+        free_slots = list(range(slot_count))
+        pending = deque()
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(memory.name, slots_shape, worker_locations, start_date)) as pool:
+            while True:
+                # Keep every slot busy; a slot is reused only after its chunk is on disk
+                while free_slots:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    slot = free_slots.pop()
+                    pending.append((chunk, pool.submit(_compute_chunk, slot, chunk)))
+                if not pending:
+                    break
+                chunk, future = pending.popleft()
+                slot = future.result()
+                writer.write(chunk, slots[slot, :chunk.location_stop - chunk.location_start, :chunk.day_stop - chunk.day_start])
+                free_slots.append(slot)
+        del slots  # Release the view before closing the block it points into
+    finally:
+        writer.close()
+        memory.close()
+        memory.unlink()
+    return location_count * day_count * len(methods)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("locations", help="CSV with id, latitude, longitude, timezone[, elevation] columns")
+    parser.add_argument("--start", required=True, type=datetime.date.fromisoformat, help="First date, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, type=datetime.date.fromisoformat, help="Last date, YYYY-MM-DD")
+    parser.add_argument("--methods", default=str(DEFAULT_METHOD),
+                        help=f"Comma-separated calculation method ids (default: {DEFAULT_METHOD})")
+    parser.add_argument("--output", required=True, help="Output file, .npy or .csv")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-locations", type=int, default=DEFAULT_CHUNK_LOCATIONS, help="Locations per chunk")
+    parser.add_argument("--chunk-days", type=int, default=DEFAULT_CHUNK_DAYS, help="Days per chunk")
+    args = parser.parse_args()
+
+    locations = read_locations(args.locations)
+    if not locations.ids:
+        parser.error(f"No locations in {args.locations}.")
+    methods = [int(method) for method in args.methods.split(",")]
+    started = time.perf_counter()
+    rows = run_batch(locations, args.start, args.end, methods, args.output, args.workers,
+                     args.chunk_locations, args.chunk_days)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {rows:,} timetable rows to {args.output} in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Scaling curve of the sharded batch generator (batch_timetable.py) across worker counts.
+
+    python benchmarks/batch_scaling_benchmark.py [--locations 20000] [--years 1] [--methods 2,3]
+                                                 [--workers 1,2,4,8] [--chunk-locations 512]
+
+Each worker count runs in a fresh process on the same synthetic dataset and writes a .npy file to a
+temporary directory. Reported per run: wall time, rows per second, speedup and parallel efficiency
+against one worker, and the peak resident memory of the parent and of the largest worker. Peak memory
+should follow the chunk size and worker count, not the dataset; try a larger --locations to see it.
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+
+START_DATE = datetime.date(2025, 1, 1)
+
+
+def synthetic_locations(count, seed=0):
+    """Locations spread over the inhabited latitudes, with whole-hour UTC offsets from their longitude."""
+    import numpy as np
+    from batch_timetable import Locations
+
+    rng = np.random.default_rng(seed)
+    latitudes = rng.uniform(-55, 60, count)
+    longitudes = rng.uniform(-180, 180, count)
+    return Locations([str(i) for i in range(count)], latitudes.tolist(), longitudes.tolist(),
+                     np.round(longitudes / 15).tolist(), [0.0] * count)
+
+
+def peak_rss_mib():
+    """(parent, largest child) peak resident memory in MiB, or (None, None) where it is not available."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None, None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB elsewhere
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / scale / 1024,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024 / scale / 1024)
+
+
+def run_one(args):
+    """Time one worker count in this process and print the result as JSON."""
+    from batch_timetable import run_batch
+
+    locations = synthetic_locations(args.locations)
+    end_date = START_DATE + datetime.timedelta(days=round(365.25 * args.years) - 1)
+    methods = [int(method) for method in args.methods.split(",")]
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        rows = run_batch(locations, START_DATE, end_date, methods, os.path.join(directory, "timetable.npy"),
+                         args.run_one, args.chunk_locations, args.chunk_days)
+        elapsed = time.perf_counter() - started
+    parent, child = peak_rss_mib()
+    print(json.dumps({"workers": args.run_one, "seconds": elapsed, "rows": rows,
+                      "parent_rss_mib": parent, "worker_rss_mib": child}))
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({1, cpus} | {n for n in (2, 4, 8, 16, 32, 64) if n < cpus})
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--locations", type=int, default=20000)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--methods", default="2,3")
+    parser.add_argument("--workers", default=",".join(map(str, default_workers)), help="Worker counts to try")
+    parser.add_argument("--chunk-locations", type=int, default=512)
+    parser.add_argument("--chunk-days", type=int, default=366)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--run-one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(args)
+        return
+
+    print(f"{args.locations:,} locations x {args.years:g} years x methods {args.methods} on {cpus} CPUs")
+    print(f"{'workers':>7} {'seconds':>9} {'rows/s':>13} {'speedup':>8} {'efficiency':>10} "
+          f"{'parent MiB':>10} {'worker MiB':>10}")
+    results = []
+    for workers in [int(n) for n in args.workers.split(",")]:
+        command = [sys.executable, os.path.abspath(__file__), "--run-one", str(workers),
+                   "--locations", str(args.locations), "--years", str(args.years), "--methods", args.methods,
+                   "--chunk-locations", str(args.chunk_locations), "--chunk-days", str(args.chunk_days)]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        single = results[0]["seconds"] * results[0]["workers"] if results else result["seconds"] * workers
+        result["speedup"] = single / result["seconds"]
+        result["efficiency"] = result["speedup"] / workers
+        results.append(result)
+        memory = [f"{value:>10.1f}" if value is not None else f"{'n/a':>10}"
+                  for value in (result["parent_rss_mib"], result["worker_rss_mib"])]
+        print(f"{workers:>7} {result['seconds']:>9.2f} {result['rows'] / result['seconds']:>13,.0f} "
+              f"{result['speedup']:>7.2f}x {result['efficiency']:>10.0%} {memory[0]} {memory[1]}", flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Throughput and latency benchmark for prayer_daemon.py against a local client.
+
+    python benchmarks/daemon_benchmark.py [--clients 4] [--requests 20000] [--path /current] [--unix-socket]
+
+Starts the daemon for a fixed location (calculated locally, no network), then runs keep-alive
+clients in separate processes and reports requests per second and p50/p99 latency. Also times the
+daemon's in-process request handler on its own.
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCATION_ARGS = ["--city", "Makkah", "--country", "Saudi Arabia", "--latitude", "21.4225",
+                 "--longitude", "39.8262", "--timezone", "Asia/Riyadh"]
+
+
+def connect(address):
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.connect(address)
+    return sock
+
+
+def read_response(sock, buffer):
+    """Read one HTTP response; returns the bytes left over after it."""
+    while b"\r\n\r\n" not in buffer:
+        buffer += sock.recv(65536)
+    head, _, rest = buffer.partition(b"\r\n\r\n")
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.lower() == b"content-length":
+            length = int(value)
+    while len(rest) < length:
+        rest += sock.recv(65536)
+    if not head.startswith(b"HTTP/1.1 200"):
+        raise RuntimeError(head.split(b"\r\n")[0].decode())
+    return rest[length:]
+
+
+def run_client(address, path, requests, results):
+    sock = connect(address)
+    request = f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("ascii")
+    latencies = []
+    buffer = b""
+    for _ in range(requests):
+        started = time.perf_counter()
+        sock.sendall(request)
+        buffer = read_response(sock, buffer)
+        latencies.append(time.perf_counter() - started)
+    sock.close()
+    results.put(latencies)
+
+
+def wait_for_daemon(address, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connect(address).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("The daemon did not start in time.")
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def measure_handler(path):
+    """Time PrayerDaemon.respond() in-process, without any socket I/O."""
+    sys.path.insert(0, ROOT)
+    from prayer_daemon import PrayerDaemon
+
+    daemon = PrayerDaemon("Makkah", "Saudi Arabia", 21.4225, 39.8262, "Asia/Riyadh")
+    daemon.responses = daemon.build_responses(daemon.today())
+    encoded = path.encode("ascii")
+    runs = 100000
+    return timeit.timeit(lambda: daemon.respond(encoded), number=runs) / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent keep-alive client processes")
+    parser.add_argument("--requests", type=int, default=20000, help="Requests per client")
+    parser.add_argument("--path", default="/current")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--unix-socket", action="store_true", help="Use a Unix socket instead of TCP")
+    args = parser.parse_args()
+
+    per_request = measure_handler(args.path)
+    print(f"In-process handler for {args.path}: {per_request * 1e6:.2f} us per request")
+
+    if args.unix_socket:
+        address = os.path.join(tempfile.mkdtemp(), "prayer_daemon.sock")
+        listen_args = ["--unix-socket", address]
+    else:
+        address = ("127.0.0.1", args.port)
+        listen_args = ["--port", str(args.port)]
+
+    daemon = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "prayer_daemon.py"), *LOCATION_ARGS, *listen_args],
+        cwd=ROOT, stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_daemon(address)
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=run_client, args=(address, args.path, args.requests, results))
+            for _ in range(args.clients)
+        ]
+        started = time.perf_counter()
+        for client in clients:
+            client.start()
+        latencies = []
+        for _ in clients:
+            latencies.extend(results.get())
+        elapsed = time.perf_counter() - started
+        for client in clients:
+            client.join()
+    finally:
+        daemon.terminate()
+        daemon.wait()
+
+    latencies.sort()
+    transport = "unix socket" if args.unix_socket else "TCP"
+    print(f"{len(latencies)} requests to {args.path} over {transport}, {args.clients} clients, in {elapsed:.2f} s")
+    print(f"  throughput {len(latencies) / elapsed:10.0f} requests/s")
+    print(f"  latency    p50 {percentile(latencies, 0.5) * 1e6:7.1f} us   p99 {percentile(latencies, 0.99) * 1e6:7.1f} us   "
+          f"mean {statistics.fmean(latencies) * 1e6:7.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+Offline benchmark suite for the app's hot paths.
+
+    python benchmarks/hot_paths_benchmark.py [--only countdown] [--no-gui] [--save-baseline] [--check]
+
+Covers the segment math, the once-a-second countdown tick, the tray menu refresh, the city list
+download and parsing, and month fetches with retries. Network paths talk to the local stand-in
+server (standin_server.py) with a fixed latency and failure rate, so nothing leaves the machine.
+
+Each benchmark reports operations per second, p50/p99 latency per operation and the peak memory
+allocated by one operation (tracemalloc). Results are compared with benchmarks/baselines.json;
+--save-baseline rewrites that file and --check exits non-zero when something regressed by more
+than --tolerance. Baselines are machine-specific, so save them on the machine that checks them.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from zoneinfo import ZoneInfo
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+sys.path.insert(0, ROOT)
+
+BASELINE_FILE = os.path.join(ROOT, "baselines.json")
+LOCATION = ("Makkah", "Saudi Arabia", 21.4225, 39.8262, "Asia/Riyadh")
+NOW = datetime.datetime.combine(datetime.date.today(), datetime.time(14, 30), ZoneInfo(LOCATION[4]))
+NETWORK_LATENCY = 0.005  # Seconds the stand-in waits before every reply
+FAILURE_RATE = 0.2  # Share of stand-in replies that are a 503 in the "with failures" benchmark
+
+
+def measure(func, min_time, batch):
+    """
+    Call func repeatedly for about min_time seconds, timing it in batches of `batch` calls so
+    sub-microsecond operations are not swamped by the timer. Returns (ops/sec, p50 us, p99 us).
+    """
+    func()  # Warm caches and lazy imports
+    samples = []
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        batch_started = time.perf_counter()
+        for _ in range(batch):
+            func()
+        ended = time.perf_counter()
+        samples.append((ended - batch_started) / batch)
+        calls += batch
+        if ended - started >= min_time and len(samples) >= 20:
+            break
+    samples.sort()
+    p50 = samples[len(samples) // 2]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return calls / (ended - started), p50 * 1e6, p99 * 1e6
+
+
+def peak_allocation(func):
+    """Return the peak bytes allocated while running func once."""
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return max(0, peak - baseline)
+
+
+def core_benchmarks():
+    """Benchmarks that need neither Qt nor the network: (name, func, batch)."""
+    from prayer_calculator import calculate_prayer_times
+    from prayer_time_handler import calculate_day_timetable, calculate_segments, determine_label_and_countdown
+    from day_timetable import DayTimetable, build_day_window
+    from segment_table import SegmentTable
+    from hijri_calendar import gregorian_to_hijri
+
+    _, _, latitude, longitude, timezone = LOCATION
+    today = datetime.date.today()
+    timings = calculate_prayer_times(latitude, longitude, timezone)
+    prayer_times = calculate_day_timetable(latitude, longitude, timezone, today)
+    segments = calculate_segments(prayer_times)
+    table = SegmentTable.from_segments(segments)
+
+    return [
+        ("calculate_prayer_times", lambda: calculate_prayer_times(latitude, longitude, timezone), 100),
+        ("DayTimetable.from_timings", lambda: DayTimetable.from_timings(timings, today, timezone), 200),
+        ("DayTimetable.segment_seconds", prayer_times.segment_seconds, 500),
+        ("calculate_segments", lambda: calculate_segments(prayer_times), 200),
+        ("build_day_window", lambda: build_day_window(today, prayer_times, prayer_times, prayer_times), 100),
+        ("determine_label_and_countdown", lambda: determine_label_and_countdown(segments, NOW), 200),
+        ("segment_table.segment_at", lambda: table.segment_at(NOW), 2000),
+        ("gregorian_to_hijri (memoized)", lambda: gregorian_to_hijri(today), 2000),
+    ]
+
+
+def catalogue_benchmarks(server, validating_server):
+    """City list download, parsing and completion: (name, func, batch)."""
+    import city_catalogue
+    from city_catalogue import (
+        CityCatalogue, fetch_city_country_list, flatten_city_country_data, iter_city_country_batches,
+        iter_city_country_records,
+    )
+
+    city_catalogue.COUNTRIES_API_URL = server.countries_url
+    body = server.countries_body
+    city_country_list = flatten_city_country_data(json.loads(body))
+    catalogue = CityCatalogue.from_city_country_list(city_country_list)
+    chunks = [body[i:i + 16384] for i in range(0, len(body), 16384)]
+
+    def stream_into_catalogue():
+        streamed = CityCatalogue()
+        for batch in iter_city_country_batches():
+            streamed.add_entries(batch)
+        return streamed
+
+    def revalidate_and_stream():
+        city_catalogue.COUNTRIES_API_URL = validating_server.countries_url
+        try:
+            return stream_into_catalogue()
+        finally:
+            city_catalogue.COUNTRIES_API_URL = server.countries_url
+
+    return [
+        ("city list fetch + flatten (stand-in)", fetch_city_country_list, 1),
+        ("city list parse + flatten", lambda: flatten_city_country_data(json.loads(body)), 1),
+        ("city list stream + index (stand-in)", stream_into_catalogue, 1),
+        ("city list 304 + stream from disk + index", revalidate_and_stream, 1),
+        ("city list incremental parse", lambda: sum(1 for _ in iter_city_country_records(chunks)), 1),
+        ("city catalogue build", lambda: CityCatalogue.from_city_country_list(city_country_list), 1),
+        ("city catalogue complete", lambda: catalogue.complete("ka"), 500),
+    ]
+
+
+def fetch_benchmarks(server, failing_server, validating_server):
+    """Month fetches through the pooled session and the retry loop: (name, func, batch)."""
+    import prayer_time_handler
+    from http_client import retry_with_backoff
+
+    city, country = LOCATION[:2]
+    today = datetime.date.today()
+
+    def fetch_month(url):
+        def fetch():
+            prayer_time_handler.ALADHAN_API_URL = url
+            return retry_with_backoff(prayer_time_handler.fetch_month_timings, city, country,
+                                      today.year, today.month, base_delay=0.01, max_delay=0.05)
+        return fetch
+
+    return [
+        ("fetch_month_timings (stand-in)", fetch_month(server.aladhan_url), 1),
+        (f"fetch_month_timings ({FAILURE_RATE:.0%} failures)", fetch_month(failing_server.aladhan_url), 1),
+        ("fetch_month_timings (304 revalidated)", fetch_month(validating_server.aladhan_url), 1),
+    ]
+
+
+def report_error(title, message):
+    """Stands in for the app's error dialogs, which would wait offscreen for a click that never comes."""
+    print(f"{title}: {message}")
+
+
+def gui_benchmarks():
+    """The overlay's countdown tick and the tray menu refresh, drawn offscreen: (name, func, batch)."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    from taskbar_tray import SystemTray
+    from ui_components import DraggableWindow
+
+    # Replaced on the classes, as the tray reports errors from its constructor
+    SystemTray.show_error_dialog = staticmethod(report_error)
+    DraggableWindow.show_error_dialog = staticmethod(report_error)
+    tray = SystemTray(app)
+    city, country, latitude, longitude, timezone = LOCATION
+    window = DraggableWindow(city, country, tray, latitude, longitude, timezone)
+    tray.set_window(window)
+
+    def countdown_tick():
+        window.update_countdown()
+        app.processEvents()
+
+    def stale_menu_refresh():
+        tray.menu_texts_source = None
+        tray.update_prayer_times_menu()
+
+    return [
+        ("overlay countdown tick", countdown_tick, 50),
+        ("tray menu refresh (new times)", stale_menu_refresh, 50),
+        ("tray menu refresh (no-op)", tray.refresh_menus_if_stale, 500),
+    ]
+
+
+def run(args):
+    from standin_server import StandInServer
+
+    import http_cache
+    import prayer_time_handler
+    import settings
+    import timings_cache
+
+    os.chdir(os.path.dirname(ROOT))  # The app loads icon.png and other assets relative to the repository
+    prayer_time_handler.set_error_reporter(report_error)
+
+    results = {}
+    with contextlib.ExitStack() as stack:
+        # Full downloads come from stand-ins without validators; conditional requests get their own
+        server = stack.enter_context(StandInServer(latency=NETWORK_LATENCY, validators=False))
+        failing_server = stack.enter_context(StandInServer(latency=NETWORK_LATENCY, failure_rate=FAILURE_RATE, seed=1,
+                                                           validators=False))
+        validating_server = stack.enter_context(StandInServer(latency=NETWORK_LATENCY))
+        # Keep the settings, cached timings and stored replies out of the user's own data directory
+        data_directory = stack.enter_context(tempfile.TemporaryDirectory())
+        http_cache._cache = http_cache.ResponseCache(os.path.join(data_directory, "http_cache"))
+        settings._settings = settings.Settings(os.path.join(data_directory, settings.SETTINGS_FILE_NAME))
+        timings_cache._cache = timings_cache.TimingsCache(os.path.join(data_directory, timings_cache.CACHE_FILE_NAME))
+
+        benchmarks = (core_benchmarks() + catalogue_benchmarks(server, validating_server)
+                      + fetch_benchmarks(server, failing_server, validating_server))
+        if not args.no_gui:
+            benchmarks += gui_benchmarks()
+
+        for name, func, batch in benchmarks:
+            if args.only and args.only not in name:
+                continue
+            with contextlib.redirect_stdout(io.StringIO()):  # The app logs every fetch and retry
+                ops, p50, p99 = measure(func, args.min_time, batch)
+                allocated = peak_allocation(func)
+            results[name] = {"ops_per_sec": round(ops, 1), "p50_us": round(p50, 2),
+                             "p99_us": round(p99, 2), "peak_alloc_bytes": allocated}
+            print(f"{name:<42} {ops:>12,.1f} ops/s  p50 {p50:>10.2f} us  p99 {p99:>10.2f} us  "
+                  f"alloc {allocated / 1024:>9.1f} KiB", flush=True)
+    return results
+
+
+def compare(results, baselines, tolerance):
+    """Print the change against the baselines and return the names that regressed."""
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if not baseline:
+            print(f"{name:<42} no baseline")
+            continue
+        speed = result["ops_per_sec"] / baseline["ops_per_sec"] - 1
+        memory = (result["peak_alloc_bytes"] + 1) / (baseline["peak_alloc_bytes"] + 1) - 1
+        regressed = speed < -tolerance or memory > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<42} speed {speed:>+7.1%}  memory {memory:>+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="Run only the benchmarks whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds to spend on each benchmark")
+    parser.add_argument("--no-gui", action="store_true", help="Skip the benchmarks that need Qt")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Store the results in {BASELINE_FILE}")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if anything regressed")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown or memory growth (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    if args.save_baseline:
+        baselines = {}
+        if os.path.exists(BASELINE_FILE):
+            with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+                baselines = json.load(f)
+        baselines.update(results)
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nSaved {len(results)} baselines to {BASELINE_FILE}")
+        return
+
+    if not os.path.exists(BASELINE_FILE):
+        print("\nNo baselines yet; run with --save-baseline first.")
+        return
+    with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+        baselines = json.load(f)
+    print(f"\nCompared with {BASELINE_FILE} (tolerance {args.tolerance:.0%}):")
+    regressions = compare(results, baselines, args.tolerance)
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Local stand-in for the Aladhan and countriesnow.space APIs, so benchmarks run offline and repeatably.
+
+    from standin_server import StandInServer
+    with StandInServer(latency=0.05, failure_rate=0.1) as server:
+        prayer_time_handler.ALADHAN_API_URL = server.aladhan_url
+        city_catalogue.COUNTRIES_API_URL = server.countries_url
+
+Replies have the same shape as the real APIs. They are generated rather than recorded: Aladhan
+days come from the local calculator for a fixed location, and the city list is a seeded synthetic
+payload of about the real size. Every request waits `latency` seconds (plus up to `jitter`), and
+a `failure_rate` share of them get a 503 so the retry paths are exercised too.
+Replies carry an ETag and Last-Modified and answer a matching conditional request with 304 Not
+Modified, and are gzipped when the client accepts it (turn either off with validators/compress).
+"""
+import datetime
+import email.utils
+import gzip
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hijri_calendar import MONTH_NAMES, HijriDate, gregorian_to_hijri, hijri_to_gregorian
+from prayer_calculator import CALCULATION_METHODS, DEFAULT_METHOD, calculate_prayer_times
+
+LOCATION = (21.4225, 39.8262, "Asia/Riyadh")  # Every city gets Makkah's times; only the shape matters
+TIMEZONE_SUFFIX = " (+03)"
+COUNTRIES = 220
+CITIES_PER_COUNTRY = 400  # Roughly the size of the real countriesnow.space payload
+
+
+def aladhan_day(date, method):
+    """One entry of an Aladhan calendar response."""
+    latitude, longitude, timezone = LOCATION
+    timings = calculate_prayer_times(latitude, longitude, timezone, date=date, method=method)
+    hijri = gregorian_to_hijri(date)
+    return {
+        "timings": {name: value + TIMEZONE_SUFFIX for name, value in timings.items()},
+        "date": {
+            "readable": date.strftime("%d %b %Y"),
+            "timestamp": str(int(datetime.datetime(date.year, date.month, date.day).timestamp())),
+            "gregorian": {
+                "date": date.strftime("%d-%m-%Y"),
+                "format": "DD-MM-YYYY",
+                "day": date.strftime("%d"),
+                "weekday": {"en": date.strftime("%A")},
+                "month": {"number": date.month, "en": date.strftime("%B")},
+                "year": str(date.year),
+            },
+            "hijri": {
+                "date": f"{hijri.day:02d}-{hijri.month:02d}-{hijri.year}",
+                "format": "DD-MM-YYYY",
+                "day": f"{hijri.day:02d}",
+                "month": {"number": hijri.month, "en": MONTH_NAMES[hijri.month - 1]},
+                "year": str(hijri.year),
+            },
+        },
+        "meta": {
+            "latitude": latitude,
+            "longitude": longitude,
+            "timezone": timezone,
+            "method": {"id": method, "name": CALCULATION_METHODS[method]["name"]},
+            "school": "STANDARD",
+        },
+    }
+
+
+def aladhan_calendar(dates, method):
+    return {"code": 200, "status": "OK", "data": [aladhan_day(date, method) for date in dates]}
+
+
+def gregorian_month_dates(year, month):
+    date = datetime.date(year, month, 1)
+    while date.month == month:
+        yield date
+        date += datetime.timedelta(days=1)
+
+
+def hijri_month_dates(year, month):
+    start = hijri_to_gregorian(HijriDate(year, month, 1))
+    end = hijri_to_gregorian(HijriDate(year + month // 12, month % 12 + 1, 1))
+    return [start + datetime.timedelta(days=offset) for offset in range((end - start).days)]
+
+
+def countries_payload(seed=0, countries=COUNTRIES, cities_per_country=CITIES_PER_COUNTRY):
+    """A countriesnow.space /countries reply with made-up but deterministic names."""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+
+    def name():
+        return "".join(rng.choice(letters) for _ in range(rng.randint(4, 12))).capitalize()
+
+    data = []
+    for _ in range(countries):
+        country = name()
+        data.append({
+            "iso2": country[:2].upper(),
+            "iso3": country[:3].upper(),
+            "country": country,
+            "cities": [name() for _ in range(rng.randint(cities_per_country // 2, cities_per_country * 3 // 2))],
+        })
+    return {"error": False, "msg": "countries and cities retrieved", "data": data}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs behind the pooled session
+    disable_nagle_algorithm = True  # Headers and body are separate writes; do not stall on delayed ACKs
+
+    def do_GET(self):
+        server = self.server
+        server.count_request()
+        delay = server.latency + (server.rng.uniform(0, server.jitter) if server.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if server.rng.random() < server.failure_rate:
+            self.send_body(503, b'{"code":503,"status":"Service Unavailable"}')
+            return
+
+        try:
+            body = self.route()
+        except (ValueError, KeyError) as e:
+            self.send_body(400, json.dumps({"code": 400, "status": "Bad Request", "data": str(e)}).encode())
+            return
+        if body is None:
+            self.send_body(404, b'{"code":404,"status":"Not Found"}')
+            return
+        if not server.validators:
+            self.send_body(200, body)
+            return
+
+        etag, last_modified = server.validators_of(body)
+        not_modified = (self.headers.get("If-None-Match") == etag if self.headers.get("If-None-Match")
+                        else self.headers.get("If-Modified-Since") == last_modified)
+        headers = {"ETag": etag, "Last-Modified": last_modified}
+        if not_modified:
+            self.send_body(304, b"", headers)
+        else:
+            self.send_body(200, body, headers)
+
+    def route(self):
+        url = urlsplit(self.path)
+        query = dict(pair.partition("=")[::2] for pair in url.query.split("&") if pair)
+        method = int(query.get("method", DEFAULT_METHOD))
+        parts = url.path.strip("/").split("/")
+
+        if parts == ["api", "v0.1", "countries"]:
+            return self.server.countries_body
+        if len(parts) == 4 and parts[:2] == ["v1", "calendarByCity"]:
+            year, month = int(parts[2]), int(parts[3])
+            return self.server.cached(("calendar", year, month, method),
+                                      lambda: aladhan_calendar(gregorian_month_dates(year, month), method))
+        if len(parts) == 4 and parts[:2] == ["v1", "hijriCalendarByCity"]:
+            year, month = int(parts[2]), int(parts[3])
+            return self.server.cached(("hijri", year, month, method),
+                                      lambda: aladhan_calendar(hijri_month_dates(year, month), method))
+        return None
+
+    def send_body(self, status, body, headers=None):
+        server = self.server
+        if body and server.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = server.gzipped(body)
+            headers = dict(headers or {}, **{"Content-Encoding": "gzip"})
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        server.count_bytes(len(body))
+
+    def log_message(self, format, *args):
+        pass  # Benchmarks make thousands of requests
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Serves the stand-in APIs on 127.0.0.1 from a background thread."""
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, failure_rate=0.0, jitter=0.0, seed=0, port=0, validators=True, compress=True):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.jitter = jitter
+        self.validators = validators
+        self.compress = compress
+        self.last_modified = email.utils.formatdate(time.time(), usegmt=True)
+        self.bytes_sent = 0  # Body bytes, after compression
+        self.rng = random.Random(seed)
+        self.countries_body = json.dumps(countries_payload(seed)).encode()
+        self.bodies = {}
+        self.encoded = {}  # Body -> (ETag, gzipped body)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @property
+    def aladhan_url(self):
+        return f"{self.base_url}/v1"
+
+    @property
+    def countries_url(self):
+        return f"{self.base_url}/api/v0.1/countries"
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def count_bytes(self, count):
+        with self.lock:
+            self.bytes_sent += count
+
+    def _encoded(self, body):
+        encoded = self.encoded.get(body)
+        if encoded is None:
+            etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+            encoded = self.encoded[body] = (etag, gzip.compress(body, 6))
+        return encoded
+
+    def validators_of(self, body):
+        """(ETag, Last-Modified) of a reply; the content never changes while the server runs."""
+        return self._encoded(body)[0], self.last_modified
+
+    def gzipped(self, body):
+        return self._encoded(body)[1]
+
+    def cached(self, key, build):
+        """Generate each reply once, so the server's own work does not show up in the timings."""
+        body = self.bodies.get(key)
+        if body is None:
+            body = self.bodies[key] = json.dumps(build()).encode()
+        return body
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the API stand-in until interrupted.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds per reply")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with a 503")
+    args = parser.parse_args()
+
+    server = StandInServer(args.latency, args.failure_rate, args.jitter, port=args.port)
+    print(f"Aladhan: {server.aladhan_url}\nCountries: {server.countries_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
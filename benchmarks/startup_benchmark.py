@@ -0,0 +1,114 @@
+"""
+Startup benchmark for the tray app.
+
+    python benchmarks/startup_benchmark.py [--runs 10] [--offscreen]
+
+Reports the slowest imports from `python -X importtime` and the wall-clock time from process
+launch to the tray icon being shown and to the overlay window's first paint. The window is
+created for a fixed location with coordinates, so no dialog or network access is involved.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_MODULES = ["taskbar_tray", "input_dialog", "ui_components"]
+
+
+def measure_imports():
+    """Return [(cumulative microseconds, module)] for the app's imports, slowest first."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(APP_MODULES)}"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)
+
+
+def run_child():
+    """Start the tray and overlay like the app does and print milestone times (seconds since start)."""
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+
+    from PyQt5.QtCore import QEvent, QObject
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    app.setQuitOnLastWindowClosed(False)
+
+    from taskbar_tray import SystemTray
+    tray = SystemTray(app)
+    tray.show()
+    print(f"tray {time.perf_counter() - start:.6f}", flush=True)
+
+    from ui_components import DraggableWindow
+
+    class FirstPaint(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint:
+                print(f"paint {time.perf_counter() - start:.6f}", flush=True)
+                app.quit()
+            return False
+
+    window = DraggableWindow("Makkah", "Saudi Arabia", tray, 21.4225, 39.8262, 3)
+    tray.set_window(window)
+    paint_filter = FirstPaint()
+    window.installEventFilter(paint_filter)
+    app.exec_()
+
+
+def measure_startup(runs, offscreen):
+    env = dict(os.environ)
+    if offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+
+    samples = {"launch to tray": [], "launch to first paint": []}
+    names = {"tray": "launch to tray", "paint": "launch to first paint"}
+    for _ in range(runs):
+        launched = time.perf_counter()
+        child = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--child"],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        for line in child.stdout:
+            elapsed = time.perf_counter() - launched
+            milestone = line.split(" ", 1)[0]
+            if milestone in names:  # The app's own progress messages go to stdout as well
+                samples[names[milestone]].append(elapsed)
+        child.wait(timeout=60)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--offscreen", action="store_true", help="Use Qt's offscreen platform (CI, no display)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child()
+        return
+
+    print("Slowest imports (cumulative, -X importtime):")
+    for cumulative, name in measure_imports()[:15]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    print(f"\nWall clock over {args.runs} runs:")
+    for milestone, values in measure_startup(args.runs, args.offscreen).items():
+        if not values:
+            print(f"  {milestone:24s} no samples")
+            continue
+        print(f"  {milestone:24s} min {min(values) * 1000:7.1f} ms   median {statistics.median(values) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import datetime
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+from segment_table import SegmentTable
+from metrics import record_wakeup
+
+
+class BoundaryScheduler(QObject):
+    """
+    Wakes up only when something changes: at the next segment boundary of any tracked location.
+    Each location's boundaries are computed once per day from calculate_segments(), and one single-shot
+    timer is armed for the earliest upcoming boundary across all of them, so the cost grows with the
+    number of transitions, not with the number of locations. Boundaries are aware datetimes in each
+    location's own timezone, so locations anywhere share one timeline.
+    Notifications are handled separately by NotificationEngine.
+    """
+    segment_changed = pyqtSignal(object, str, object)  # location key, label, datetime the segment ends
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tables = {}  # Location key -> SegmentTable for the current day
+        self.current = {}  # Location key -> (label, end time) of the current segment
+
+        self.boundary_timer = QTimer(self)
+        self.boundary_timer.setSingleShot(True)
+        self.boundary_timer.setTimerType(Qt.PreciseTimer)
+        self.boundary_timer.timeout.connect(self.on_boundary)
+
+    def set_segments(self, segments, key=None):
+        """Build a location's boundary list from calculate_segments() output and rearm the timer."""
+        self.set_table(SegmentTable.from_segments(segments), key)
+
+    def set_table(self, table, key=None):
+        """Track a location's SegmentTable (e.g. one spanning yesterday to tomorrow) and rearm the timer."""
+        self.tables[key] = table
+        self.current.pop(key, None)
+        self.refresh(key, datetime.datetime.now().astimezone())
+        self.arm()
+
+    def remove(self, key=None):
+        """Stop tracking a location."""
+        self.tables.pop(key, None)
+        self.current.pop(key, None)
+        self.arm()
+
+    def stop(self):
+        self.boundary_timer.stop()
+
+    def table(self, key=None):
+        return self.tables.get(key)
+
+    def state(self, key=None):
+        """Return (label, end time) of a location's current segment; label is None past the end of its table."""
+        return self.current.get(key, (None, None))
+
+    def find_segment(self, now, key=None):
+        """Return (label, end time) of the segment containing now."""
+        table = self.tables.get(key)
+        if not table:
+            return None, None
+        label, _, end = table.segment_at(now)
+        return label, end
+
+    def refresh(self, key, now):
+        """Work out a location's current segment and report it if it changed."""
+        label, next_time = self.find_segment(now, key)
+        changed = (label, next_time) != self.current.get(key)
+        self.current[key] = (label, next_time)
+        if changed and label is not None:
+            self.segment_changed.emit(key, label, next_time)
+        # Past the end of the day's table the midnight rollover brings a new one
+
+    def arm(self):
+        """Schedule the single wakeup for the earliest upcoming boundary of any location."""
+        self.stop()
+        upcoming = [next_time for _, next_time in self.current.values() if next_time]
+        if upcoming:
+            self.boundary_timer.start(self.milliseconds_until(min(upcoming), datetime.datetime.now().astimezone()))
+
+    def on_boundary(self):
+        # Only the locations whose boundary has passed are looked at again. A late wakeup (sleep,
+        # stalled loop) simply lands in whichever segment is current now.
+        record_wakeup("boundary")
+        now = datetime.datetime.now().astimezone()
+        for key, (_, next_time) in list(self.current.items()):
+            if next_time and next_time <= now:
+                self.refresh(key, now)
+        self.arm()
+
+    @staticmethod
+    def milliseconds_until(moment, now):
+        # Small slack so the timer never fires just before the boundary it waits for
+        return max(0, int((moment - now).total_seconds() * 1000)) + 50
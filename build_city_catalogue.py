@@ -0,0 +1,85 @@
+import argparse
+import io
+import zipfile
+import requests
+from city_catalogue import CATALOGUE_FILE_NAME, CityEntry, get_resource_path, write_catalogue_file
+from gazetteer import GAZETTEER_FILE_NAME, write_gazetteer
+
+GEONAMES_URL = "https://download.geonames.org/export/dump/"
+DEFAULT_CITIES_FILE = "cities15000"  # Cities with more than 15,000 inhabitants
+
+
+def download_text(url):
+    """Download a GeoNames text file, unpacking it if it is zipped."""
+    print(f"Downloading {url}")
+    response = requests.get(url, timeout=120)
+    response.raise_for_status()
+    if url.endswith(".zip"):
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            name = archive.namelist()[0]
+            return archive.read(name).decode("utf-8")
+    return response.content.decode("utf-8")
+
+
+def read_text(path_or_url):
+    if path_or_url.startswith(("http://", "https://")):
+        return download_text(path_or_url)
+    with open(path_or_url, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def parse_country_names(text):
+    """Map ISO country codes to names from GeoNames countryInfo.txt."""
+    names = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split("\t")
+        if len(fields) > 4:
+            names[fields[0]] = fields[4]
+    return names
+
+
+def parse_cities(text, country_names):
+    """Return one CityEntry per (city, country) from a GeoNames cities file, keeping the most populous."""
+    best = {}
+    for line in text.splitlines():
+        fields = line.split("\t")
+        if len(fields) < 18:
+            continue
+        name, latitude, longitude, country_code = fields[1], fields[4], fields[5], fields[8]
+        population = int(fields[14] or 0)
+        timezone = fields[17]
+        country = country_names.get(country_code)
+        if not country:
+            continue
+        key = (name, country)
+        if key not in best or population > best[key][0]:
+            best[key] = (population, CityEntry(name, country, float(latitude), float(longitude), timezone))
+    return [entry for _, entry in best.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline city catalogue from a GeoNames dump.")
+    parser.add_argument("--cities", default=f"{GEONAMES_URL}{DEFAULT_CITIES_FILE}.zip",
+                        help="GeoNames cities file or URL (default: cities15000.zip)")
+    parser.add_argument("--countries", default=f"{GEONAMES_URL}countryInfo.txt",
+                        help="GeoNames countryInfo.txt file or URL")
+    parser.add_argument("--format", choices=["bin", "tsv"], default="bin",
+                        help="bin: memory-mapped gazetteer the app ships with; tsv: readable text catalogue")
+    parser.add_argument("--output", help="Output file (default: next to the app)")
+    args = parser.parse_args()
+
+    country_names = parse_country_names(read_text(args.countries))
+    entries = parse_cities(read_text(args.cities), country_names)
+    if args.format == "bin":
+        output = args.output or get_resource_path(GAZETTEER_FILE_NAME)
+        write_gazetteer(output, entries)
+    else:
+        output = args.output or get_resource_path(CATALOGUE_FILE_NAME)
+        write_catalogue_file(output, entries)
+    print(f"Wrote {len(entries)} cities to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import csv
+import datetime
+import numpy as np
+from prayer_calculator import (
+    CALCULATION_METHODS, DEFAULT_METHOD, IMSAK_MINUTES_BEFORE_FAJR, TIMING_KEYS,
+    julian_day, resolve_utc_offset,
+)
+
+# Value stored for times that do not occur (e.g. polar day or night)
+MISSING_MINUTE = -1
+
+# First guesses (hours) used by prayer_calculator for each solar event
+_GUESS_HOURS = {"fajr": 5, "sunrise": 6, "dhuhr": 12, "asr": 13, "sunset": 18}
+
+
+def _sun_position(jd):
+    """Vectorized version of prayer_calculator.sun_position: (declination, equation_of_time) in degrees/hours."""
+    d = jd - 2451545.0
+    g = np.radians((357.529 + 0.98560028 * d) % 360)
+    q = (280.459 + 0.98564736 * d) % 360
+    l = np.radians((q + 1.915 * np.sin(g) + 0.020 * np.sin(2 * g)) % 360)
+    e = np.radians(23.439 - 0.00000036 * d)
+
+    right_ascension = (np.degrees(np.arctan2(np.cos(e) * np.sin(l), np.cos(l))) / 15) % 24
+    equation_of_time = q / 15 - right_ascension
+    # Keep the equation of time continuous where right ascension wraps around 24h
+    equation_of_time = (equation_of_time + 12) % 24 - 12
+    declination = np.degrees(np.arcsin(np.sin(e) * np.sin(l)))
+    return declination, equation_of_time
+
+
+class _DailySun:
+    """
+    Declination and equation of time for every day, evaluated once at each first-guess hour.
+    A per-day rate is kept so the value at a location's own longitude is a cheap linear correction,
+    which keeps the per-location work down to a broadcast multiply-add.
+    """
+
+    def __init__(self, julian_days):
+        self.values = {}
+        for name, hours in _GUESS_HOURS.items():
+            jd = julian_days + hours / 24
+            declination, equation_of_time = _sun_position(jd)
+            next_declination, next_equation = _sun_position(jd + 1)
+            self.values[name] = (
+                declination[:, None], (next_declination - declination)[:, None],
+                equation_of_time[:, None], (next_equation - equation_of_time)[:, None],
+            )
+
+    def at(self, name, day_shift):
+        """Return (declination, equation_of_time) broadcast to (days, locations)."""
+        declination, declination_rate, equation_of_time, equation_rate = self.values[name]
+        return declination + declination_rate * day_shift, equation_of_time + equation_rate * day_shift
+
+
+def _hour_angle(angle, declination, sin_latitude, cos_latitude):
+    """Hours between solar noon and the moment the sun is `angle` degrees below the horizon; NaN if never."""
+    declination = np.radians(declination)
+    cos_t = (-np.sin(np.radians(angle)) - np.sin(declination) * sin_latitude) / (np.cos(declination) * cos_latitude)
+    with np.errstate(invalid="ignore"):
+        return np.degrees(np.arccos(cos_t)) / 15
+
+
+def _adjust_high_latitude(time, base, angle, night, before_base=False):
+    portion = angle / 60.0 * night
+    diff = ((base - time) if before_base else (time - base)) % 24
+    replace = np.isnan(time) | (diff > portion)
+    return np.where(replace, base - portion if before_base else base + portion, time)
+
+
+def _utc_offsets(timezones, dates, count):
+    """Return a (days, locations) array of UTC offsets in hours."""
+    if np.isscalar(timezones) or timezones is None:
+        timezones = [timezones] * count
+    timezones = list(timezones)
+    if all(isinstance(tz, (int, float, np.integer, np.floating)) for tz in timezones):
+        return np.broadcast_to(np.asarray(timezones, dtype=np.float64), (len(dates), count))
+
+    # Named zones: resolve each distinct zone once per day and scatter to its locations
+    offsets = np.empty((len(dates), count))
+    unique_zones = {}
+    for index, tz in enumerate(timezones):
+        unique_zones.setdefault(tz, []).append(index)
+    for tz, indices in unique_zones.items():
+        column = np.array([resolve_utc_offset(tz, date) for date in dates])
+        offsets[:, indices] = column[:, None]
+    return offsets
+
+
+def _compute_hours(days, latitudes, longitudes, offsets, params, asr_school, elevation):
+    """Return a dict of (days, locations) arrays of fractional clock hours."""
+    sun = _DailySun(days)
+    day_shift = -longitudes / 360.0
+    rise_set_angle = 0.833 + 0.0347 * np.sqrt(np.maximum(elevation, 0))
+    maghrib_angle = params.get("maghrib")
+    isha_angle = params.get("isha")
+    shift = offsets - longitudes / 15
+    sin_latitude = np.sin(np.radians(latitudes))
+    cos_latitude = np.cos(np.radians(latitudes))
+
+    def event(name, angle, before_noon=False):
+        declination, equation_of_time = sun.at(name, day_shift)
+        noon = (12 - equation_of_time) % 24
+        t = _hour_angle(angle, declination, sin_latitude, cos_latitude)
+        return (noon - t if before_noon else noon + t) + shift
+
+    declination, equation_of_time = sun.at("dhuhr", day_shift)
+    dhuhr = (12 - equation_of_time) % 24 + shift
+
+    declination, _ = sun.at("asr", day_shift)
+    asr_angle = -np.degrees(np.arctan(1 / (asr_school + 1 + np.tan(np.radians(np.abs(latitudes - declination))))))
+
+    fajr = event("fajr", params["fajr"], before_noon=True)
+    sunrise = event("sunrise", rise_set_angle, before_noon=True)
+    asr = event("asr", asr_angle)
+    sunset = event("sunset", rise_set_angle)
+    maghrib = event("sunset", maghrib_angle) if maghrib_angle else sunset
+
+    night = (sunrise - sunset) % 24
+    fajr = _adjust_high_latitude(fajr, sunrise, params["fajr"], night, before_base=True)
+    if maghrib_angle:
+        maghrib = _adjust_high_latitude(maghrib, sunset, maghrib_angle, night)
+    if isha_angle:
+        isha = _adjust_high_latitude(event("sunset", isha_angle), sunset, isha_angle, night)
+    else:
+        isha = maghrib + params["isha_minutes"] / 60
+
+    return {"Fajr": fajr, "Sunrise": sunrise, "Dhuhr": dhuhr, "Asr": asr, "Sunset": sunset, "Maghrib": maghrib, "Isha": isha}
+
+
+def _to_minutes(hours):
+    """Round fractional hours to whole minutes since local midnight, like prayer_calculator._format_time."""
+    missing = np.isnan(hours)
+    minutes = np.floor(np.where(missing, 0, hours) * 60 + 0.5).astype(np.int32) % (24 * 60)
+    minutes[missing] = MISSING_MINUTE
+    return minutes
+
+
+def generate_timetable(latitudes, longitudes, timezones, start_date, end_date, method=DEFAULT_METHOD, asr_school=0, elevations=0,
+                       out=None):
+    """
+    Calculate prayer times for many locations over a date range (inclusive) in one call.
+    timezones may be one value or one per location: UTC offsets in hours, IANA names, or None for the system zone.
+    Returns an int16 array shaped (locations, days, len(TIMING_KEYS)) of minutes since local midnight,
+    with MISSING_MINUTE where a time does not occur. Pass `out` (an int16 array of that shape, e.g. a view of
+    shared memory) to have it filled instead of a new array being allocated.
+    """
+    if method not in CALCULATION_METHODS:
+        raise ValueError(f"Unknown calculation method: {method}")
+    if end_date < start_date:
+        raise ValueError("end_date must not be before start_date.")
+
+    latitudes = np.atleast_1d(np.asarray(latitudes, dtype=np.float64))[None, :]
+    longitudes = np.atleast_1d(np.asarray(longitudes, dtype=np.float64))[None, :]
+    elevations = np.broadcast_to(np.asarray(elevations, dtype=np.float64), latitudes.shape[1:])[None, :]
+    count = latitudes.shape[1]
+    day_count = (end_date - start_date).days + 1
+
+    # One extra day so every night can run to the following Fajr
+    dates = [start_date + datetime.timedelta(days=i) for i in range(day_count + 1)]
+    julian_days = np.array([julian_day(date) for date in dates], dtype=np.float64)
+    offsets = _utc_offsets(timezones, dates, count)
+
+    params = CALCULATION_METHODS[method]
+    times = _compute_hours(julian_days, latitudes, longitudes, offsets, params, asr_school, elevations)
+
+    sunset = times["Sunset"][:-1]
+    night = times["Fajr"][1:] + 24 - sunset
+    midnight_end = times["Fajr" if params.get("jafari_midnight") else "Sunrise"][1:]
+    times = {key: value[:-1] for key, value in times.items()}
+    times["Imsak"] = times["Fajr"] - IMSAK_MINUTES_BEFORE_FAJR / 60
+    times["Midnight"] = sunset + (midnight_end + 24 - sunset) / 2
+    times["Firstthird"] = sunset + night / 3
+    times["Lastthird"] = sunset + night * 2 / 3
+
+    shape = (count, day_count, len(TIMING_KEYS))
+    if out is None:
+        timetable = np.empty(shape, dtype=np.int16)
+    elif out.shape != shape or out.dtype != np.int16:
+        raise ValueError(f"out must be an int16 array shaped {shape}.")
+    else:
+        timetable = out
+    for index, key in enumerate(TIMING_KEYS):
+        timetable[:, :, index] = _to_minutes(times[key]).T
+    return timetable
+
+
+def timetable_dates(start_date, timetable):
+    """Return the dates along the day axis of a timetable."""
+    return [start_date + datetime.timedelta(days=i) for i in range(timetable.shape[1])]
+
+
+def export_csv(path, timetable, start_date, location_ids=None):
+    """Write a timetable as one row per (location, date) with "HH:MM" columns."""
+    labels = [f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)]
+    labels.append("")  # MISSING_MINUTE indexes the last entry
+    dates = [date.isoformat() for date in timetable_dates(start_date, timetable)]
+    if location_ids is None:
+        location_ids = range(timetable.shape[0])
+
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["location", "date"] + TIMING_KEYS)
+        for location_id, rows in zip(location_ids, timetable):
+            for date, row in zip(dates, rows.tolist()):
+                writer.writerow([location_id, date] + [labels[m] for m in row])
+
+
+def export_parquet(path, timetable, start_date, location_ids=None):
+    """Write a timetable to Parquet with minutes-since-midnight columns. Needs pyarrow."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export requires the 'pyarrow' package.")
+
+    locations, days, _ = timetable.shape
+    if location_ids is None:
+        location_ids = np.arange(locations)
+    dates = np.array(timetable_dates(start_date, timetable), dtype="datetime64[D]")
+
+    columns = {
+        "location": np.repeat(np.asarray(location_ids), days),
+        "date": np.tile(dates, locations),
+    }
+    flat = timetable.reshape(locations * days, len(TIMING_KEYS))
+    for index, key in enumerate(TIMING_KEYS):
+        columns[key] = flat[:, index]
+    pq.write_table(pa.table(columns), path)
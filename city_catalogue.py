@@ -0,0 +1,220 @@
+import heapq
+import os
+import sys
+from bisect import bisect_left
+from collections import namedtuple
+from itertools import islice
+
+CATALOGUE_FILE_NAME = "city_catalogue.tsv"
+COUNTRIES_API_URL = "https://countriesnow.space/api/v0.1/countries"  # Benchmarks point this at a local stand-in server
+MAX_COMPLETIONS = 20
+DOWNLOAD_CHUNK_BYTES = 16 * 1024
+STREAM_BATCH_SIZE = 2000  # Cities handed to the dialog at a time while the city list downloads
+
+# One catalogue row. latitude/longitude/timezone are None when the entry came from the online city list.
+CityEntry = namedtuple("CityEntry", ["city", "country", "latitude", "longitude", "timezone"])
+
+
+def get_resource_path(name):
+    """Return the path of a file shipped next to the app (or inside the PyInstaller bundle)."""
+    base = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base, name)
+
+
+def make_display_name(city, country):
+    return f"{city}, {country}"
+
+
+class CityCatalogue:
+    """
+    Sorted, prefix-searchable index of "City, Country" names.
+    Completion is a bisect into the case-folded sorted keys, and validation is a dict lookup.
+    Entries can be added in batches while a download is still running: each batch becomes a sorted
+    run, and runs are merged as they grow (like a binary counter), so there are only ever a few to search.
+    """
+
+    def __init__(self, entries=()):
+        self.runs = []  # (keys, names) sorted runs, each at least twice as long as the next
+        self.entries_by_name = {}
+        self.add_entries(entries)
+
+    def add_entries(self, entries):
+        """Add entries to the index; names already present keep their first entry."""
+        rows = sorted(
+            ((make_display_name(entry.city, entry.country).casefold(), make_display_name(entry.city, entry.country), entry)
+             for entry in entries),
+            key=lambda row: row[0],
+        )
+        keys = []
+        names = []
+        for key, name, entry in rows:
+            if name in self.entries_by_name:
+                continue  # Keep the first of any duplicate names
+            keys.append(key)
+            names.append(name)
+            self.entries_by_name[name] = entry
+        if not keys:
+            return
+        self.runs.append((keys, names))
+        while len(self.runs) > 1 and len(self.runs[-2][0]) <= 2 * len(self.runs[-1][0]):
+            newer_keys, newer_names = self.runs.pop()
+            older_keys, older_names = self.runs.pop()
+            keys = older_keys + newer_keys
+            names = older_names + newer_names
+            order = sorted(range(len(keys)), key=keys.__getitem__)  # Timsort merges the two sorted halves
+            self.runs.append(([keys[i] for i in order], [names[i] for i in order]))
+
+    def __len__(self):
+        return len(self.entries_by_name)
+
+    def __contains__(self, name):
+        return name in self.entries_by_name
+
+    def get(self, name):
+        """Return the CityEntry for an exact "City, Country" name, or None."""
+        return self.entries_by_name.get(name)
+
+    def complete(self, prefix, limit=MAX_COMPLETIONS):
+        """Return up to `limit` display names starting with prefix (case-insensitive), in sorted order."""
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return []
+        if len(self.runs) == 1:
+            keys, names = self.runs[0]
+            start, stop = self._match_range(keys, prefix, limit)
+            return names[start:stop]
+        run_matches = []
+        for keys, names in self.runs:
+            start, stop = self._match_range(keys, prefix, limit)
+            run_matches.append(zip(keys[start:stop], names[start:stop]))
+        return [name for _, name in islice(heapq.merge(*run_matches), limit)]
+
+    @staticmethod
+    def _match_range(keys, prefix, limit):
+        """Return the index range of at most `limit` keys starting with prefix."""
+        start = bisect_left(keys, prefix)
+        stop = start
+        end = min(start + limit, len(keys))
+        while stop < end and keys[stop].startswith(prefix):
+            stop += 1
+        return start, stop
+
+    @classmethod
+    def from_city_country_list(cls, city_country_list):
+        """Build a catalogue (without coordinates) from "City, Country" strings."""
+        entries = []
+        for name in city_country_list:
+            city, _, country = name.partition(", ")
+            entries.append(CityEntry(city, country, None, None, None))
+        return cls(entries)
+
+
+def flatten_city_country_data(data):
+    """Turn a countriesnow.space payload into "City, Country" strings."""
+    city_country_list = []
+    for country in data['data']:
+        country_name = country['country']
+        for city in country.get('cities', []):
+            city_country_list.append(make_display_name(city, country_name))
+    return city_country_list
+
+
+def iter_city_country_records(chunks):
+    """
+    Yield (city, country) from a countriesnow.space payload arriving in byte chunks, parsing it
+    incrementally so neither the raw text nor the decoded tree is ever held in full.
+    Raises ValueError if the payload is malformed or cut short.
+    """
+    from json_stream import iter_values
+
+    index = None  # Position of the current country in "data"
+    country = None
+    early_cities = []  # Cities listed before their country's name, which the API does not do
+    for path, value in iter_values(chunks):
+        if len(path) == 4 and path[1] == index and country is not None and path[2] == "cities" and path[0] == "data":
+            if isinstance(value, str):
+                yield value, country  # The common case, checked first
+            continue
+        if len(path) < 3 or path[0] != "data" or not isinstance(value, str):
+            continue
+        if path[1] != index:
+            index = path[1]
+            country = None
+            early_cities.clear()
+        if len(path) == 4 and path[2] == "cities":
+            if country is None:
+                early_cities.append(value)
+            else:
+                yield value, country
+        elif len(path) == 3 and path[2] == "country":
+            country = value
+            for city in early_cities:
+                yield city, country
+            early_cities.clear()
+
+
+def iter_city_country_batches(batch_size=STREAM_BATCH_SIZE):
+    """
+    Download the online city list and yield it as lists of CityEntry while it arrives.
+    Blocks, so call it off the GUI thread. Raises on failure, possibly after some batches.
+    """
+    from http_client import conditional_get, retry_with_backoff
+    response = retry_with_backoff(conditional_get, COUNTRIES_API_URL, timeout=15, attempts=3, stream=True)
+    with response:
+        batch = []
+        for city, country in iter_city_country_records(response.iter_content(DOWNLOAD_CHUNK_BYTES)):
+            batch.append(CityEntry(city, country, None, None, None))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def fetch_city_country_list():
+    """
+    Download the whole online city list at once. Blocks, so call it off the GUI thread; raises on failure.
+    The city dialog streams it with iter_city_country_batches() instead, to complete while it downloads.
+    """
+    from http_client import conditional_get, retry_with_backoff
+    response = retry_with_backoff(conditional_get, COUNTRIES_API_URL, timeout=15, attempts=3)
+    return flatten_city_country_data(response.json())
+
+
+def read_catalogue_file(path):
+    """Read a catalogue written by build_city_catalogue.py: city, country, latitude, longitude, timezone per line."""
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) != 5:
+                continue
+            city, country, latitude, longitude, timezone = fields
+            entries.append(CityEntry(city, country, float(latitude), float(longitude), timezone or None))
+    return entries
+
+
+def write_catalogue_file(path, entries):
+    """Write catalogue entries as tab-separated lines, sorted the same way the index is."""
+    rows = sorted(entries, key=lambda entry: make_display_name(entry.city, entry.country).casefold())
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for entry in rows:
+            f.write(f"{entry.city}\t{entry.country}\t{entry.latitude:.5f}\t{entry.longitude:.5f}\t{entry.timezone or ''}\n")
+
+
+def load_local_catalogue():
+    """
+    Return the city catalogue shipped with the app, or None if there is none.
+    The memory-mapped binary gazetteer is preferred; the text catalogue is read fully into memory.
+    """
+    from gazetteer import GAZETTEER_FILE_NAME, Gazetteer
+
+    for name, loader in ((GAZETTEER_FILE_NAME, Gazetteer), (CATALOGUE_FILE_NAME, lambda path: CityCatalogue(read_catalogue_file(path)))):
+        path = get_resource_path(name)
+        if not os.path.exists(path):
+            continue
+        try:
+            return loader(path)
+        except Exception as e:
+            print(f"Error reading city catalogue {path}: {e}")
+    return None
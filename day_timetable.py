@@ -0,0 +1,207 @@
+import datetime
+from collections import namedtuple
+from prayer_calculator import INVALID_TIME, TIMING_KEYS
+from segment_table import SegmentTable
+
+NO_TIME = -1  # Stored for a timing that is missing or could not be parsed
+_KEY_INDEX = {key: index for index, key in enumerate(TIMING_KEYS)}
+
+
+def parse_clock(value):
+    """Return minutes since midnight for "HH:MM" (API values may carry a suffix like "05:12 (BST)"), or NO_TIME."""
+    try:
+        hours, minutes = value.split(" ")[0].split(":")
+        hours, minutes = int(hours), int(minutes)
+    except (AttributeError, ValueError):
+        return NO_TIME
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        return NO_TIME
+    return hours * 60 + minutes
+
+
+def zone_info(timezone):
+    """
+    Return the tzinfo for a timezone as DayTimetable keeps it: an IANA name or a UTC offset in hours.
+    None (the system zone) and names this system does not know give None.
+    """
+    if timezone is None:
+        return None
+    if isinstance(timezone, (int, float)):
+        return datetime.timezone(datetime.timedelta(hours=timezone))
+    from zoneinfo import ZoneInfo  # Needs the "tzdata" package on Windows
+    try:
+        return ZoneInfo(timezone)
+    except (KeyError, ValueError):
+        print(f"Unknown timezone {timezone!r}; using the system zone.")
+        return None
+
+
+def localize(moment, tzinfo):
+    """Make a naive wall-clock time aware: in tzinfo, or in the system zone when tzinfo is None."""
+    return moment.replace(tzinfo=tzinfo) if tzinfo is not None else moment.astimezone()
+
+
+def today_in(timezone):
+    """Return today's date in a location's timezone (the system's when it is None)."""
+    return datetime.datetime.now(zone_info(timezone)).date()
+
+
+class DayTimetable:
+    """
+    One day's prayer times for one location, parsed once: each timing is kept as minutes since local
+    midnight in a tuple, next to the date and timezone. Instances are shared between threads, so
+    nothing about them can change after construction.
+    Reads like the {"Fajr": "HH:MM", ...} dict it replaces, so existing lookups keep working, while
+    the segment math runs on integers and datetimes are only built when asked for.
+    Those datetimes are aware and keep the location's own clock times, so they compare correctly with
+    the current time wherever the location is; compare them with an aware now, not datetime.now().
+    """
+    __slots__ = ("date", "timezone", "minutes", "_segments")
+
+    def __init__(self, date, minutes, timezone=None):
+        if len(minutes) != len(TIMING_KEYS):
+            raise ValueError(f"Expected {len(TIMING_KEYS)} timings, got {len(minutes)}.")
+        object.__setattr__(self, "date", date)
+        object.__setattr__(self, "timezone", timezone)
+        object.__setattr__(self, "minutes", tuple(minutes))
+        object.__setattr__(self, "_segments", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DayTimetable is immutable.")
+
+    @classmethod
+    def from_timings(cls, timings, date, timezone=None):
+        """
+        Parse a {"Fajr": "HH:MM", ...} dict (API, cache or calculator output) once. Without a timezone
+        the one the API reported (kept under "timezone") is used, if any.
+        """
+        if timezone is None:
+            timezone = timings.get("timezone")
+        return cls(date, [parse_clock(timings.get(key)) for key in TIMING_KEYS], timezone)
+
+    def __eq__(self, other):
+        if not isinstance(other, DayTimetable):
+            return NotImplemented
+        return (self.date, self.timezone, self.minutes) == (other.date, other.timezone, other.minutes)
+
+    def __hash__(self):
+        return hash((self.date, self.timezone, self.minutes))
+
+    def __repr__(self):
+        return f"DayTimetable({self.date}, {self.to_dict()}, timezone={self.timezone!r})"
+
+    # Read-only mapping of timing names to "HH:MM" strings
+    def __getitem__(self, key):
+        minutes = self.minutes[_KEY_INDEX[key]]
+        return INVALID_TIME if minutes == NO_TIME else f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+    def get(self, key, default=None):
+        return self[key] if key in _KEY_INDEX else default
+
+    def __contains__(self, key):
+        return key in _KEY_INDEX
+
+    def __iter__(self):
+        return iter(TIMING_KEYS)
+
+    def __len__(self):
+        return len(TIMING_KEYS)
+
+    def keys(self):
+        return list(TIMING_KEYS)
+
+    def items(self):
+        return [(key, self[key]) for key in TIMING_KEYS]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def minute(self, key):
+        """Return a timing as minutes since local midnight, or None if it is missing."""
+        minutes = self.minutes[_KEY_INDEX[key]]
+        return None if minutes == NO_TIME else minutes
+
+    def midnight(self):
+        return datetime.datetime(self.date.year, self.date.month, self.date.day)
+
+    def tzinfo(self):
+        return zone_info(self.timezone)
+
+    def datetime_of(self, key):
+        """Return a timing as an aware datetime on this timetable's date, in the location's timezone."""
+        minutes = self.minute(key)
+        if minutes is None:
+            raise ValueError(f"{key} is missing from the prayer times.")
+        return localize(self.midnight() + datetime.timedelta(minutes=minutes), self.tzinfo())
+
+    def segment_seconds(self, next_day=None):
+        """
+        Return the calculate_segments() boundaries as seconds since this date's midnight; boundaries
+        after midnight exceed 86400. The night ends at next_day's real Fajr when the following day's
+        DayTimetable is given, else today's Fajr is assumed. Raises ValueError if a timing is missing.
+        """
+        fajr, sunrise, dhuhr, asr, maghrib, isha, lastthird = (
+            self.minute(key) for key in ("Fajr", "Sunrise", "Dhuhr", "Asr", "Maghrib", "Isha", "Lastthird")
+        )
+        if None in (fajr, sunrise, dhuhr, asr, maghrib, isha, lastthird):
+            raise ValueError("Prayer times are incomplete.")
+        next_fajr = next_day.minute("Fajr") if next_day is not None else None
+        if next_fajr is None:
+            next_fajr = fajr
+        night = (next_fajr - maghrib) % 1440  # Maghrib to the next Fajr, in minutes
+        # Times of the night may fall after midnight: the last third nearly always does, and at high
+        # latitudes in summer so does Isha
+        if isha < maghrib:
+            isha += 1440
+        if lastthird < maghrib:
+            lastthird += 1440
+        return {
+            "fajr_time": fajr * 60,
+            "sunrise_time": sunrise * 60,
+            "haram1_end": (sunrise + 10) * 60,
+            "dhuhr_time": dhuhr * 60,
+            "haram2_start": (dhuhr - 5) * 60,
+            "asr_time": asr * 60,
+            "haram3_start": (maghrib - 10) * 60,
+            "maghrib_time": maghrib * 60,
+            "isha_time": isha * 60,
+            "midnight_time": maghrib * 60 + night * 30,
+            "lastthird_time": lastthird * 60,
+            "next_fajr_time": (next_fajr + 1440) * 60,
+        }
+
+    def segment_datetimes(self, next_day=None):
+        """Return the segment_seconds() boundaries as aware datetimes in the location's timezone."""
+        midnight = self.midnight()
+        tzinfo = self.tzinfo()
+        if tzinfo is None:  # The system zone's offset is looked up per boundary, as it may change overnight
+            return {
+                key: localize(midnight + datetime.timedelta(seconds=seconds), tzinfo)
+                for key, seconds in self.segment_seconds(next_day).items()
+            }
+        # Adding to an aware datetime keeps wall-clock time, so one zone lookup serves the whole day
+        midnight = midnight.replace(tzinfo=tzinfo)
+        return {key: midnight + datetime.timedelta(seconds=seconds) for key, seconds in self.segment_seconds(next_day).items()}
+
+    def segments(self):
+        """Return the calculate_segments() dict of datetimes; built on first use and reused afterwards."""
+        if self._segments is None:
+            object.__setattr__(self, "_segments", self.segment_datetimes())
+        return dict(self._segments)
+
+
+# The timetables around one date and everything derived from them. A new DayWindow replaces the old one
+# as a whole, so readers never see a mix of two days.
+DayWindow = namedtuple("DayWindow", ["date", "yesterday", "today", "tomorrow", "segments", "table"])
+
+
+def build_day_window(date, yesterday, today, tomorrow):
+    """
+    Combine the DayTimetables of the day before, of and after `date` (either neighbour may be None)
+    into a DayWindow: today's segments end at tomorrow's real Fajr, and one SegmentTable spans all
+    three days, so the night that began yesterday is still found after midnight.
+    Has no side effects, so it can run on a worker thread.
+    """
+    days = [day for day in (yesterday, today, tomorrow) if day is not None]
+    table = SegmentTable.from_days(days)
+    return DayWindow(date, yesterday, today, tomorrow, today.segment_datetimes(tomorrow), table)
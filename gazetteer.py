@@ -0,0 +1,177 @@
+import mmap
+import struct
+from bisect import bisect_left
+from city_catalogue import CityEntry, MAX_COMPLETIONS, make_display_name
+
+GAZETTEER_FILE_NAME = "city_catalogue.bin"
+MAGIC = b"PTGZ"
+VERSION = 1
+
+# magic, version, record count, then byte offsets of the records, names, countries and timezones sections
+HEADER = struct.Struct("<4sHxxIIIII")
+# name offset, name length, country id, timezone id, latitude, longitude
+RECORD = struct.Struct("<IHHHxxff")
+# Lookup tables (countries, timezones): count, then (offset, length) pairs into the section's string blob
+TABLE_COUNT = struct.Struct("<I")
+TABLE_ENTRY = struct.Struct("<IH")
+
+NO_TIMEZONE = 0xFFFF
+
+
+def _pack_string_table(strings):
+    blob = bytearray()
+    index = bytearray(TABLE_COUNT.pack(len(strings)))
+    offset = TABLE_COUNT.size + TABLE_ENTRY.size * len(strings)
+    for value in strings:
+        encoded = value.encode("utf-8")
+        index += TABLE_ENTRY.pack(offset + len(blob), len(encoded))
+        blob += encoded
+    return bytes(index + blob)
+
+
+def write_gazetteer(path, entries):
+    """
+    Pack catalogue entries into one binary file: a header, fixed-width records sorted by the
+    case-folded "City, Country" name, a UTF-8 name blob and the country and timezone tables.
+    """
+    rows = {}
+    for entry in entries:
+        name = make_display_name(entry.city, entry.country)
+        rows.setdefault(name.casefold(), entry)  # Keep the first of any duplicate names
+    ordered = [rows[key] for key in sorted(rows)]
+
+    countries = sorted({entry.country for entry in ordered})
+    timezones = sorted({entry.timezone for entry in ordered if entry.timezone})
+    country_ids = {country: index for index, country in enumerate(countries)}
+    timezone_ids = {timezone: index for index, timezone in enumerate(timezones)}
+
+    records = bytearray()
+    names = bytearray()
+    for entry in ordered:
+        encoded = entry.city.encode("utf-8")
+        records += RECORD.pack(
+            len(names), len(encoded), country_ids[entry.country],
+            timezone_ids.get(entry.timezone, NO_TIMEZONE),
+            entry.latitude if entry.latitude is not None else float("nan"),
+            entry.longitude if entry.longitude is not None else float("nan"),
+        )
+        names += encoded
+
+    countries_table = _pack_string_table(countries)
+    timezones_table = _pack_string_table(timezones)
+    records_offset = HEADER.size
+    names_offset = records_offset + len(records)
+    countries_offset = names_offset + len(names)
+    timezones_offset = countries_offset + len(countries_table)
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(ordered), records_offset, names_offset, countries_offset, timezones_offset))
+        f.write(records)
+        f.write(names)
+        f.write(countries_table)
+        f.write(timezones_table)
+
+
+class _SortKeys:
+    """Sequence view of the case-folded record names, decoded on demand so bisect can search the file."""
+
+    def __init__(self, gazetteer):
+        self.gazetteer = gazetteer
+
+    def __len__(self):
+        return len(self.gazetteer)
+
+    def __getitem__(self, index):
+        return self.gazetteer.display_name(index).casefold()
+
+
+class Gazetteer:
+    """
+    Read-only city catalogue backed by a memory-mapped gazetteer file.
+    Only the pages a lookup touches are read; names are decoded straight from the mapping as needed.
+    Offers the same lookups as CityCatalogue, so the city dialog can use either.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
+
+        magic, version, self.count, self.records_offset, self.names_offset, countries_offset, timezones_offset = \
+            HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} gazetteer file.")
+
+        # The lookup tables are tiny, so they are decoded once
+        self.countries = self._read_string_table(countries_offset)
+        self.timezones = self._read_string_table(timezones_offset)
+        self.sort_keys = _SortKeys(self)
+
+    def _read_string_table(self, offset):
+        (count,) = TABLE_COUNT.unpack_from(self.mm, offset)
+        strings = []
+        for index in range(count):
+            start, length = TABLE_ENTRY.unpack_from(self.mm, offset + TABLE_COUNT.size + index * TABLE_ENTRY.size)
+            strings.append(str(self.view[offset + start:offset + start + length], "utf-8"))
+        return strings
+
+    def close(self):
+        self.view.release()
+        self.mm.close()
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, index):
+        return RECORD.unpack_from(self.mm, self.records_offset + index * RECORD.size)
+
+    def _city(self, record):
+        start = self.names_offset + record[0]
+        return str(self.view[start:start + record[1]], "utf-8")
+
+    def display_name(self, index):
+        record = self._record(index)
+        return make_display_name(self._city(record), self.countries[record[2]])
+
+    def entry(self, index):
+        """Return the CityEntry stored at a record index."""
+        name_offset, name_length, country_id, timezone_id, latitude, longitude = self._record(index)
+        has_coordinates = latitude == latitude  # NaN marks entries without coordinates
+        return CityEntry(
+            self._city((name_offset, name_length)),
+            self.countries[country_id],
+            round(latitude, 5) if has_coordinates else None,
+            round(longitude, 5) if has_coordinates else None,
+            self.timezones[timezone_id] if timezone_id != NO_TIMEZONE else None,
+        )
+
+    def _find(self, name):
+        key = name.casefold()
+        index = bisect_left(self.sort_keys, key)
+        if index < self.count and self.display_name(index) == name:
+            return index
+        return None
+
+    def __contains__(self, name):
+        return self._find(name) is not None
+
+    def get(self, name):
+        """Return the CityEntry for an exact "City, Country" name, or None."""
+        index = self._find(name)
+        return self.entry(index) if index is not None else None
+
+    def complete(self, prefix, limit=MAX_COMPLETIONS):
+        """Return up to `limit` display names starting with prefix (case-insensitive), in sorted order."""
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return []
+        matches = []
+        start = bisect_left(self.sort_keys, prefix)
+        for index in range(start, min(start + limit, self.count)):
+            name = self.display_name(index)
+            if not name.casefold().startswith(prefix):
+                break
+            matches.append(name)
+        return matches
+
@@ -0,0 +1,240 @@
+import datetime
+import math
+from collections import namedtuple
+from functools import lru_cache
+from prayer_calculator import _SolarDay
+
+UMM_AL_QURA = "umm_al_qura"
+TABULAR = "tabular"
+CALENDARS = {UMM_AL_QURA: "Umm al-Qura", TABULAR: "Tabular (civil)"}
+DEFAULT_CALENDAR = UMM_AL_QURA
+
+# When the Hijri date advances: at Maghrib (the Islamic day starts at sunset) or at midnight
+ROLLOVER_MAGHRIB = "maghrib"
+ROLLOVER_MIDNIGHT = "midnight"
+DEFAULT_ROLLOVER = ROLLOVER_MAGHRIB
+
+MAX_ADJUSTMENT_DAYS = 2  # Users may shift the date by up to this many days to match local sighting
+
+# Same English month names the Aladhan API returns
+MONTH_NAMES = [
+    "Muḥarram", "Ṣafar", "Rabīʿ al-awwal", "Rabīʿ al-thānī", "Jumādá al-ūlá", "Jumādá al-ākhirah",
+    "Rajab", "Shaʿbān", "Ramaḍān", "Shawwāl", "Dhū al-Qaʿdah", "Dhū al-Ḥijjah",
+]
+
+HijriDate = namedtuple("HijriDate", ["year", "month", "day"])
+
+# date.toordinal() of 1 Muharram 1 AH in the civil tabular calendar (16 July 622, Julian)
+TABULAR_EPOCH = datetime.date(622, 7, 19).toordinal()
+# Julian day at 00:00 UTC of date.fromordinal(0)
+ORDINAL_JD_OFFSET = 1721424.5
+
+MAKKAH_LATITUDE = 21.4225
+MAKKAH_LONGITUDE = 39.8262
+MAKKAH_UTC_OFFSET = 3
+
+SYNODIC_MONTH = 29.530588861
+DELTA_T_DAYS = 69 / 86400  # Terrestrial minus universal time; close enough for 1900-2100
+
+
+def _sin(d):
+    return math.sin(math.radians(d))
+
+def _cos(d):
+    return math.cos(math.radians(d))
+
+
+# --- Tabular (arithmetical) calendar: 30-year cycle with 11 leap years ---
+
+def _tabular_month_start(index):
+    """Return the ordinal of the first day of a month, counted as (year - 1) * 12 + (month - 1)."""
+    year, month = index // 12 + 1, index % 12 + 1
+    return TABULAR_EPOCH + (year - 1) * 354 + (3 + 11 * year) // 30 + math.ceil(29.5 * (month - 1))
+
+def _tabular_month_index(ordinal):
+    """Return the month index of the tabular month containing an ordinal."""
+    year = (30 * (ordinal - TABULAR_EPOCH) + 10646) // 10631
+    index = (year - 1) * 12
+    while index < (year - 1) * 12 + 11 and _tabular_month_start(index + 1) <= ordinal:
+        index += 1
+    return index
+
+
+# --- Umm al-Qura: the month starts the day after the first Makkah evening on which the
+# conjunction has happened before sunset and the moon sets after the sun ---
+
+def _new_moon(k):
+    """Return the Julian day (UT) of new moon number k, counted from 6 January 2000 (Meeus, ch. 49)."""
+    t = k / 1236.85
+    jde = 2451550.09766 + SYNODIC_MONTH * k + 0.00015437 * t ** 2 - 0.00000015 * t ** 3 + 0.00000000073 * t ** 4
+    e = 1 - 0.002516 * t - 0.0000074 * t ** 2
+    m = 2.5534 + 29.1053567 * k - 0.0000014 * t ** 2 - 0.00000011 * t ** 3
+    mp = 201.5643 + 385.81693528 * k + 0.0107582 * t ** 2 + 0.00001238 * t ** 3 - 0.000000058 * t ** 4
+    f = 160.7108 + 390.67050284 * k - 0.0016118 * t ** 2 - 0.00000227 * t ** 3 + 0.000000011 * t ** 4
+    omega = 124.7746 - 1.56375588 * k + 0.0020672 * t ** 2 + 0.00000215 * t ** 3
+
+    jde += (
+        -0.4072 * _sin(mp) + 0.17241 * e * _sin(m) + 0.01608 * _sin(2 * mp) + 0.01039 * _sin(2 * f)
+        + 0.00739 * e * _sin(mp - m) - 0.00514 * e * _sin(mp + m) + 0.00208 * e * e * _sin(2 * m)
+        - 0.00111 * _sin(mp - 2 * f) - 0.00057 * _sin(mp + 2 * f) + 0.00056 * e * _sin(2 * mp + m)
+        - 0.00042 * _sin(3 * mp) + 0.00042 * e * _sin(m + 2 * f) + 0.00038 * e * _sin(m - 2 * f)
+        - 0.00024 * e * _sin(2 * mp - m) - 0.00017 * _sin(omega) - 0.00007 * _sin(mp + 2 * m)
+        + 0.00004 * _sin(2 * mp - 2 * f) + 0.00004 * _sin(3 * m) + 0.00003 * _sin(mp + m - 2 * f)
+        + 0.00003 * _sin(2 * mp + 2 * f) - 0.00003 * _sin(mp + m + 2 * f) + 0.00003 * _sin(mp - m + 2 * f)
+        - 0.00002 * _sin(mp - m - 2 * f) - 0.00002 * _sin(3 * mp + m) + 0.00002 * _sin(4 * mp)
+    )
+
+    # Planetary arguments
+    for coefficient, (base, rate) in zip(
+        (0.000325, 0.000165, 0.000164, 0.000126, 0.00011, 0.000062, 0.00006,
+         0.000056, 0.000047, 0.000042, 0.00004, 0.000037, 0.000035, 0.000023),
+        ((299.77, 0.107408), (251.88, 0.016321), (251.83, 26.651886), (349.42, 36.412478),
+         (84.66, 18.206239), (141.74, 53.303771), (207.14, 2.453732), (154.84, 7.30686),
+         (34.52, 27.261239), (207.19, 0.121824), (291.34, 1.844379), (161.72, 24.198154),
+         (239.56, 25.513099), (331.55, 3.592518)),
+    ):
+        jde += coefficient * _sin(base + rate * k)
+    return jde - DELTA_T_DAYS
+
+# Periodic terms of the moon's longitude and distance (Meeus, ch. 47, largest terms):
+# multiples of D, M, M', F, then longitude in 1e-6 degrees and distance in metres
+_MOON_LONGITUDE_DISTANCE_TERMS = [
+    (0, 0, 1, 0, 6288774, -20905355), (2, 0, -1, 0, 1274027, -3699111), (2, 0, 0, 0, 658314, -2955968),
+    (0, 0, 2, 0, 213618, -569925), (0, 1, 0, 0, -185116, 48888), (0, 0, 0, 2, -114332, -3149),
+    (2, 0, -2, 0, 58793, 246158), (2, -1, -1, 0, 57066, -152138), (2, 0, 1, 0, 53322, -170733),
+    (2, -1, 0, 0, 45758, -204586), (0, 1, -1, 0, -40923, -129620), (1, 0, 0, 0, -34720, 108743),
+    (0, 1, 1, 0, -30383, 104755), (2, 0, 0, -2, 15327, 10321), (0, 0, 1, 2, -12528, 0),
+    (0, 0, 1, -2, 10980, 79661), (4, 0, -1, 0, 10675, -34782), (0, 0, 3, 0, 10034, -23210),
+    (4, 0, -2, 0, 8548, -21636), (2, 1, -1, 0, -7888, 24208), (2, 1, 0, 0, -6766, 30824),
+    (1, 0, -1, 0, -5163, -8379), (1, 1, 0, 0, 4987, -16675), (2, -1, 1, 0, 4036, -12831),
+    (2, 0, 2, 0, 3994, -10445), (4, 0, 0, 0, 3861, -11650), (2, 0, -3, 0, 3665, 14403),
+]
+# Multiples of D, M, M', F, then latitude in 1e-6 degrees
+_MOON_LATITUDE_TERMS = [
+    (0, 0, 0, 1, 5128122), (0, 0, 1, 1, 280602), (0, 0, 1, -1, 277693), (2, 0, 0, -1, 173237),
+    (2, 0, -1, 1, 55413), (2, 0, -1, -1, 46271), (2, 0, 0, 1, 32573), (0, 0, 2, 1, 17198),
+    (2, 0, 1, -1, 9266), (0, 0, 2, -1, 8822), (2, -1, 0, -1, 8216), (2, 0, -2, -1, 4324),
+    (2, 0, 1, 1, 4200), (2, 1, 0, -1, -3359), (2, -1, -1, 1, 2463),
+]
+
+def _moon_altitude(jd, latitude, longitude):
+    """Return (geocentric altitude, horizontal parallax) of the moon in degrees at a Julian day (UT)."""
+    t = (jd + DELTA_T_DAYS - 2451545.0) / 36525
+    mean_longitude = 218.3164477 + 481267.88123421 * t - 0.0015786 * t ** 2
+    d = 297.8501921 + 445267.1114034 * t - 0.0018819 * t ** 2
+    m = 357.5291092 + 35999.0502909 * t - 0.0001536 * t ** 2
+    mp = 134.9633964 + 477198.8675055 * t + 0.0087414 * t ** 2
+    f = 93.272095 + 483202.0175233 * t - 0.0036539 * t ** 2
+    e = 1 - 0.002516 * t - 0.0000074 * t ** 2
+    a1 = 119.75 + 131.849 * t
+    a2 = 53.09 + 479264.29 * t
+    a3 = 313.45 + 481266.484 * t
+
+    sum_longitude = 3958 * _sin(a1) + 1962 * _sin(mean_longitude - f) + 318 * _sin(a2)
+    sum_distance = 0
+    for cd, cm, cmp, cf, longitude_term, distance_term in _MOON_LONGITUDE_DISTANCE_TERMS:
+        argument = cd * d + cm * m + cmp * mp + cf * f
+        scale = e ** abs(cm)
+        sum_longitude += longitude_term * scale * _sin(argument)
+        sum_distance += distance_term * scale * _cos(argument)
+    sum_latitude = (
+        -2235 * _sin(mean_longitude) + 382 * _sin(a3) + 175 * _sin(a1 - f) + 175 * _sin(a1 + f)
+        + 127 * _sin(mean_longitude - mp) - 115 * _sin(mean_longitude + mp)
+    )
+    for cd, cm, cmp, cf, latitude_term in _MOON_LATITUDE_TERMS:
+        sum_latitude += latitude_term * e ** abs(cm) * _sin(cd * d + cm * m + cmp * mp + cf * f)
+
+    ecliptic_longitude = mean_longitude + sum_longitude / 1e6
+    ecliptic_latitude = sum_latitude / 1e6
+    distance = 385000.56 + sum_distance / 1000
+    parallax = math.degrees(math.asin(6378.14 / distance))
+
+    obliquity = 23.439 - 0.013 * t
+    right_ascension = math.degrees(math.atan2(
+        _sin(ecliptic_longitude) * _cos(obliquity) - math.tan(math.radians(ecliptic_latitude)) * _sin(obliquity),
+        _cos(ecliptic_longitude),
+    ))
+    declination = math.degrees(math.asin(
+        _sin(ecliptic_latitude) * _cos(obliquity) + _cos(ecliptic_latitude) * _sin(obliquity) * _sin(ecliptic_longitude)
+    ))
+    sidereal_time = 280.46061837 + 360.98564736629 * (jd - 2451545.0)
+    hour_angle = sidereal_time + longitude - right_ascension
+    altitude = math.degrees(math.asin(
+        _sin(latitude) * _sin(declination) + _cos(latitude) * _cos(declination) * _cos(hour_angle)
+    ))
+    return altitude, parallax
+
+def _makkah_sunset(ordinal):
+    """Return the Julian day (UT) of sunset in Makkah on a date."""
+    day = _SolarDay(datetime.date.fromordinal(ordinal), MAKKAH_LATITUDE, MAKKAH_LONGITUDE)
+    sunset = day.sun_angle_time(0.833, 18)
+    sunset = day.sun_angle_time(0.833, sunset)  # Refine at the first estimate
+    return ordinal + ORDINAL_JD_OFFSET + (sunset - MAKKAH_LONGITUDE / 15) / 24
+
+def _moon_sets_after_sun(sunset):
+    altitude, parallax = _moon_altitude(sunset, MAKKAH_LATITUDE, MAKKAH_LONGITUDE)
+    # Altitude of the moon's centre at the moment it sets, allowing for refraction, semi-diameter and parallax
+    return altitude > 0.7275 * parallax - 0.5667
+
+@lru_cache(maxsize=None)
+def _umm_al_qura_month_start(index):
+    """Return the ordinal of the first day of an Umm al-Qura month (index as for the tabular calendar)."""
+    estimate = _tabular_month_start(index)
+    k = round((estimate + ORDINAL_JD_OFFSET - 1.5 - 2451550.09766) / SYNODIC_MONTH)
+    conjunction = _new_moon(k)
+    evening = math.floor(conjunction - ORDINAL_JD_OFFSET + MAKKAH_UTC_OFFSET / 24)  # Makkah date of the conjunction
+    while True:
+        sunset = _makkah_sunset(evening)
+        if conjunction < sunset and _moon_sets_after_sun(sunset):
+            return evening + 1
+        evening += 1
+
+def _umm_al_qura_month_index(ordinal):
+    index = _tabular_month_index(ordinal)
+    while _umm_al_qura_month_start(index) > ordinal:
+        index -= 1
+    while _umm_al_qura_month_start(index + 1) <= ordinal:
+        index += 1
+    return index
+
+
+_MONTH_RULES = {
+    TABULAR: (_tabular_month_index, _tabular_month_start),
+    UMM_AL_QURA: (_umm_al_qura_month_index, _umm_al_qura_month_start),
+}
+
+@lru_cache(maxsize=64)
+def gregorian_to_hijri(date, calendar=DEFAULT_CALENDAR, adjustment=0):
+    """
+    Convert a Gregorian date to a HijriDate without any network access.
+    adjustment shifts the result by whole days, to follow a local moon sighting.
+    Results are memoized, so repeated lookups for the same day cost a dict hit.
+    """
+    if calendar not in _MONTH_RULES:
+        raise ValueError(f"Unknown Hijri calendar: {calendar}")
+    month_index, month_start = _MONTH_RULES[calendar]
+    ordinal = date.toordinal() + adjustment
+    index = month_index(ordinal)
+    return HijriDate(index // 12 + 1, index % 12 + 1, ordinal - month_start(index) + 1)
+
+def hijri_to_gregorian(hijri, calendar=DEFAULT_CALENDAR, adjustment=0):
+    """Return the Gregorian date of a HijriDate; the inverse of gregorian_to_hijri()."""
+    if calendar not in _MONTH_RULES:
+        raise ValueError(f"Unknown Hijri calendar: {calendar}")
+    _, month_start = _MONTH_RULES[calendar]
+    ordinal = month_start((hijri.year - 1) * 12 + hijri.month - 1) + hijri.day - 1
+    return datetime.date.fromordinal(ordinal - adjustment)
+
+def hijri_day_for(now, maghrib_time=None, rollover=DEFAULT_ROLLOVER):
+    """
+    Return the Gregorian date whose Hijri date is current at `now`.
+    With the Maghrib rollover the next Hijri day begins at that evening's Maghrib.
+    """
+    day = now.date()
+    if rollover == ROLLOVER_MAGHRIB and maghrib_time and maghrib_time.date() == day and now >= maghrib_time:
+        day += datetime.timedelta(days=1)
+    return day
+
+def format_hijri_date(hijri):
+    """Format a HijriDate like "09 Jumādá al-ākhirah 1446"."""
+    return f"{hijri.day:02d} {MONTH_NAMES[hijri.month - 1]} {hijri.year}"
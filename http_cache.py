@@ -0,0 +1,260 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+from app_paths import get_data_file
+
+CACHE_DIR_NAME = "http_cache"
+INDEX_FILE_NAME = "index.json"
+MAX_ENTRIES = 200  # A month of timings per location and method, plus the city list
+MAX_UNUSED_DAYS = 60  # Bodies not requested for this long are dropped
+READ_CHUNK_BYTES = 64 * 1024
+
+
+def request_key(url, params=None):
+    """Return the full URL a GET with these query parameters goes to, which identifies its stored reply."""
+    from requests import Request
+    return Request("GET", url, params=params).prepare().url
+
+
+class CachedResponse:
+    """A stored body served for a 304 Not Modified reply; reads like the requests Response it stands in for."""
+    status_code = 200
+    from_cache = True
+
+    def __init__(self, path):
+        self.path = path
+
+    @property
+    def content(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=READ_CHUNK_BYTES):
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size or READ_CHUNK_BYTES)
+                if not chunk:
+                    return
+                yield chunk
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RecordingResponse:
+    """
+    A streamed 200 reply that carries validators: reading it through iter_content() also writes the
+    body to the cache, which keeps it once the whole body has been read.
+    """
+    from_cache = False
+
+    def __init__(self, response, cache, key):
+        self.response = response
+        self.cache = cache
+        self.key = key
+        self.stored = False
+
+    @property
+    def status_code(self):
+        return self.response.status_code
+
+    @property
+    def headers(self):
+        return self.response.headers
+
+    @property
+    def content(self):
+        content = self.response.content
+        if not self.stored:
+            self.stored = True
+            self.cache.store(self.key, self.response.headers, content)
+        return content
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        temp_path = f"{self.cache.body_path(self.key)}.{threading.get_ident()}.tmp"
+        complete = False
+        try:
+            with open(temp_path, "wb") as f:
+                for chunk in self.response.iter_content(chunk_size):
+                    f.write(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            if complete:
+                self.cache.commit(self.key, self.response.headers, temp_path)
+            else:
+                _remove(temp_path)  # The reader stopped early or the download failed
+
+    def close(self):
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ResponseCache:
+    """
+    Bodies of GET replies that came with an ETag or Last-Modified header, stored with those validators
+    in the app data directory, so the next request for the same URL can ask "has this changed?" and
+    a 304 Not Modified reply is answered from disk.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or get_data_file(CACHE_DIR_NAME)
+        os.makedirs(self.directory, exist_ok=True)
+        self.index_path = os.path.join(self.directory, INDEX_FILE_NAME)
+        self.lock = threading.Lock()
+        self.entries = self._load()
+        self.evict_stale()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable HTTP cache index: {e}")
+            return {}
+
+    def _save(self):
+        """Write the index atomically so a crash never leaves a half-written file."""
+        temp_path = f"{self.index_path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(temp_path, self.index_path)
+        except Exception as e:
+            print(f"Error saving HTTP cache index: {e}")
+
+    def body_path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".body")
+
+    def validators(self, key):
+        """Return the If-None-Match/If-Modified-Since headers for a stored reply, or {} if there is none."""
+        with self.lock:
+            entry = self.entries.get(key)
+        if not entry or not os.path.exists(self.body_path(key)):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def open(self, key):
+        """Return the stored body as a CachedResponse, or None if it has gone."""
+        path = self.body_path(key)
+        return CachedResponse(path) if os.path.exists(path) else None
+
+    def store(self, key, headers, content):
+        """Keep a whole reply body with the validators from its headers."""
+        temp_path = f"{self.body_path(key)}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(content)
+        except OSError as e:
+            print(f"Error caching {key}: {e}")
+            _remove(temp_path)
+            return
+        self.commit(key, headers, temp_path)
+
+    def commit(self, key, headers, temp_path):
+        """Move a fully written body into place and record its validators."""
+        try:
+            os.replace(temp_path, self.body_path(key))
+        except OSError as e:
+            print(f"Error caching {key}: {e}")
+            _remove(temp_path)
+            return
+        with self.lock:
+            self.entries[key] = {"used": _now()}
+            self._update_validators_locked(key, headers)
+            self._evict_locked()
+            self._save()
+
+    def touch(self, key, headers=None):
+        """
+        Mark a stored reply as confirmed current by a 304, taking any new validators it sent along,
+        so it is kept and used for the next revalidation.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            entry["used"] = _now()
+            if headers:
+                self._update_validators_locked(key, headers)
+            self._save()
+
+    def _update_validators_locked(self, key, headers):
+        entry = self.entries[key]
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag:
+            entry["etag"] = etag
+        if last_modified:
+            entry["last_modified"] = last_modified
+
+    def evict_stale(self):
+        """Drop bodies that have not been requested for a while, and the oldest ones past MAX_ENTRIES."""
+        with self.lock:
+            if self._evict_locked():
+                self._save()
+
+    def _evict_locked(self):
+        oldest_use = (datetime.datetime.now() - datetime.timedelta(days=MAX_UNUSED_DAYS)).isoformat(timespec="seconds")
+        stale_keys = [key for key, entry in self.entries.items()
+                      if not isinstance(entry, dict) or str(entry.get("used", "")) < oldest_use]
+        for key in stale_keys:
+            del self.entries[key]
+        if len(self.entries) > MAX_ENTRIES:
+            by_use = sorted(self.entries, key=lambda key: self.entries[key]["used"])
+            for key in by_use[:len(self.entries) - MAX_ENTRIES]:
+                del self.entries[key]
+                stale_keys.append(key)
+        for key in stale_keys:
+            _remove(self.body_path(key))
+        return bool(stale_keys)
+
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """Return the process-wide HTTP response cache, loading its index on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,161 @@
+import random
+import threading
+import time
+from metrics import increment
+
+# requests is imported on first use: it is the slowest import in the app and startup does not need it
+
+DEFAULT_TIMEOUT = 10
+MAX_ATTEMPTS = 5
+BASE_DELAY = 1.0  # Seconds before the first retry
+MAX_DELAY = 30.0  # Upper bound for a single backoff delay
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def accepted_encodings():
+    """
+    Return the Accept-Encoding header: gzip and deflate always, plus brotli (and zstd) when the
+    optional packages urllib3 needs to decode them are installed.
+    """
+    try:
+        from urllib3.util.request import ACCEPT_ENCODING
+        return ACCEPT_ENCODING
+    except ImportError:
+        return "gzip, deflate"
+
+
+def get_http_session():
+    """
+    Return the process-wide requests session, so every request reuses pooled keep-alive connections
+    and asks for a compressed reply.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            _session = requests.Session()
+            _session.headers["Accept-Encoding"] = accepted_encodings()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def http_get(url, params=None, timeout=DEFAULT_TIMEOUT, stream=False):
+    """
+    GET a URL through the shared session and raise requests.RequestException on a non-200 reply.
+    With stream=True the body is left unread for iter_content(); close the response when done.
+    """
+    import requests
+    response = get_http_session().get(url, params=params, timeout=timeout, stream=stream)
+    if response.status_code != 200:
+        print(f"API returned status code {response.status_code}")
+        response.close()
+        raise requests.RequestException(f"API Error: {response.status_code}")
+    return response
+
+
+def conditional_get(url, params=None, timeout=DEFAULT_TIMEOUT, stream=False):
+    """
+    GET like http_get, revalidating against the reply stored by an earlier request for the same URL:
+    its ETag/Last-Modified go out as If-None-Match/If-Modified-Since, and a 304 Not Modified is
+    answered from disk without downloading the body again. Replies that carry validators are stored.
+    Returns an object with the status_code, content, json(), iter_content() and close() of a Response.
+    """
+    import requests
+    from http_cache import RecordingResponse, get_response_cache, request_key
+
+    cache = get_response_cache()
+    key = request_key(url, params)
+    headers = cache.validators(key)
+    response = get_http_session().get(url, params=params, headers=headers, timeout=timeout, stream=stream)
+    if response.status_code == 304 and headers:
+        response.close()
+        cached = cache.open(key)
+        if cached is not None:
+            increment("http_not_modified")
+            cache.touch(key, response.headers)
+            return cached
+        return http_get(url, params=params, timeout=timeout, stream=stream)  # The stored body went missing
+    if response.status_code != 200:
+        print(f"API returned status code {response.status_code}")
+        response.close()
+        raise requests.RequestException(f"API Error: {response.status_code}")
+    if not (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+        return response
+    if stream:
+        return RecordingResponse(response, cache, key)
+    cache.store(key, response.headers, response.content)
+    return response
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the function, and callers
+    arriving while it runs wait for it and share its result (or exception) instead of fetching again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}  # Key -> _Call in progress
+
+    def run(self, key, func, *args, **kwargs):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            increment("coalesced_calls")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+
+def backoff_delay(attempt, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    """Return the "full jitter" exponential backoff delay for a zero-based retry attempt."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry_with_backoff(func, *args, attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY, max_delay=MAX_DELAY, **kwargs):
+    """
+    Call func until it succeeds, sleeping with bounded exponential backoff and jitter between attempts.
+    Re-raises the last error once all attempts have failed. Only call this off the GUI thread.
+    """
+    import requests
+    for attempt in range(attempts):
+        try:
+            return func(*args, **kwargs)
+        except (requests.RequestException, ValueError) as e:
+            if attempt == attempts - 1:
+                increment("http_failures")
+                raise
+            increment("http_retries")
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            print(f"Request failed: {e}. Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
@@ -1,7 +1,10 @@
 from PyQt5.QtWidgets import QDialog, QLineEdit, QVBoxLayout, QLabel, QDialogButtonBox, QMessageBox, QCompleter,QSpacerItem, QSizePolicy
 from PyQt5.QtGui import QIcon
-from PyQt5.QtCore import Qt
-import requests
+from PyQt5.QtCore import Qt, QStringListModel
+from background_tasks import run_in_background
+from city_catalogue import CityCatalogue, iter_city_country_batches, load_local_catalogue
+
+LOADING_NOTE = "(please wait some moments for loading)"
 
 
 class CityCountryInputDialog(QDialog):
@@ -14,8 +17,13 @@ class CityCountryInputDialog(QDialog):
             # Set the icon for the dialog
             self.setWindowIcon(QIcon("icon.png"))  # Use "icon.png" or "icon.ico" in the working directory
 
-            # Fetch city and country list
-            self.city_country_list = self.fetch_city_country_data()
+            # The city catalogue is loaded in the background once the dialog is up
+            self.catalogue = None
+            self.catalogue_loading = True
+            self.catalogue_incomplete = False  # The download broke off; offered again through the retry link
+            self.selected_city = None
+            self.selected_country = None
+            self.selected_location = None
 
             layout = QVBoxLayout()
 
@@ -33,9 +41,11 @@ class CityCountryInputDialog(QDialog):
             layout.addWidget(self.city_label)
 
             # Add additional instruction line
-            self.loading_note = QLabel("(please wait some moments for loading)")
+            self.loading_note = QLabel(LOADING_NOTE)
             self.loading_note.setAlignment(Qt.AlignCenter)
             self.loading_note.setStyleSheet("font-size: 12px; color: gray;")
+            self.loading_note.setTextInteractionFlags(Qt.LinksAccessibleByMouse)
+            self.loading_note.linkActivated.connect(self.load_in_background)
             layout.addWidget(self.loading_note)
 
             # Input box for city with updated typing space
@@ -53,10 +63,13 @@ class CityCountryInputDialog(QDialog):
             layout.addWidget(self.city_input)
 
 
-            # Autocomplete functionality for the input box
-            completer = QCompleter(self.city_country_list, self)
-            completer.setCaseSensitivity(Qt.CaseInsensitive)
-            self.city_input.setCompleter(completer)
+            # Autocomplete functionality for the input box; the model only ever holds the current prefix matches
+            self.completer_model = QStringListModel(self)
+            self.completer = QCompleter(self.completer_model, self)
+            self.completer.setCaseSensitivity(Qt.CaseInsensitive)
+            self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+            self.city_input.setCompleter(self.completer)
+            self.city_input.textEdited.connect(self.update_completions)
 
             # Dialog buttons
             self.button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, self)
@@ -66,48 +79,101 @@ class CityCountryInputDialog(QDialog):
 
             self.setLayout(layout)
 
+            self.load_in_background()
+
         except Exception as e:
             print(f"Error initializing CityCountryInputDialog: {e}")
 
+    def load_in_background(self, _link=None):
+        """Load the city catalogue from scratch on a worker thread; also the retry link's action."""
+        self.catalogue = None
+        self.catalogue_loading = True
+        self.catalogue_incomplete = False
+        self.loading_note.setText(LOADING_NOTE)
+        run_in_background(self.load_city_catalogue, on_result=self.set_city_catalogue,
+                          on_error=self.set_city_catalogue_failed, on_progress=self.add_city_batch)
 
-    def fetch_city_country_data(self):
+    def fetch_city_country_data(self, report):
         """
-        Fetch a list of cities and countries from the API.
+        Stream the list of cities and countries from the API, reporting each batch of entries as it
+        is parsed. Raises if the download fails, even part-way. Blocks, so it is run off the GUI thread.
         """
-        try:
-            url = "https://countriesnow.space/api/v0.1/countries"
-            response = requests.get(url, timeout=5)
-            if response.status_code != 200:
-                raise Exception("Failed to fetch city and country data.")
-
-            data = response.json()
-            city_country_list = []
-            for country in data['data']:
-                country_name = country['country']
-                cities = country.get('cities', [])
-                for city in cities:
-                    city_country_list.append(f"{city}, {country_name}")
-
-            return city_country_list
-        except Exception as e:
-            print(f"Error fetching city and country data: {e}")
-            return []
+        for batch in iter_city_country_batches():
+            report(batch)
+
+    def load_city_catalogue(self, report):
+        """
+        Load the city catalogue shipped with the app, or None when the online city list was streamed
+        through add_city_batch instead. Blocks, so it is run off the GUI thread.
+        """
+        catalogue = load_local_catalogue()
+        if catalogue is None:
+            self.fetch_city_country_data(report)
+        return catalogue
+
+    def add_city_batch(self, entries):
+        """Make the next part of the downloading city list available for completion; runs on the GUI thread."""
+        if self.catalogue is None:
+            self.catalogue = CityCatalogue()
+        self.catalogue.add_entries(entries)
+        self.loading_note.setText(f"(loading cities: {len(self.catalogue):,} so far)")
+        if self.city_input.text().strip():
+            self.update_completions(self.city_input.text())
+
+    def set_city_catalogue(self, catalogue):
+        """Start completing from the loaded catalogue; runs on the GUI thread."""
+        self.catalogue_loading = False
+        if catalogue is not None:
+            self.catalogue = catalogue
+        elif self.catalogue is None:
+            self.catalogue = CityCatalogue()
+        if len(self.catalogue):
+            self.loading_note.setText("")
+            self.update_completions(self.city_input.text())
+        else:
+            self.loading_note.setText("(could not load the city list)")
+
+    def set_city_catalogue_failed(self, message):
+        """
+        Keep completing from whatever arrived before the city list download failed, but say that it
+        is incomplete and offer to load it again; runs on the GUI thread.
+        """
+        self.catalogue_loading = False
+        self.catalogue_incomplete = True
+        if self.catalogue is None:
+            self.catalogue = CityCatalogue()
+        problem = "incomplete" if len(self.catalogue) else "could not be loaded"
+        self.loading_note.setText(f'(city list {problem}, <a href="retry">retry</a>)')
+
+    def update_completions(self, text):
+        """Show the catalogue entries that start with what has been typed so far."""
+        if not self.catalogue:
+            return
+        self.completer_model.setStringList(self.catalogue.complete(text))
+        if text.strip():
+            self.completer.complete()
 
     def validate_and_accept(self):
         """
         Validate if the input matches the city-country list and accept the dialog.
         """
         user_input = self.city_input.text().strip()
-        if user_input not in self.city_country_list:
+        location = self.catalogue.get(user_input) if self.catalogue else None
+        if location is None and self.catalogue_loading:
+            QMessageBox.warning(self, "Input Error", "The city list is still loading, please wait.")
+            return
+        if location is None and self.catalogue_incomplete:
+            QMessageBox.warning(self, "Input Error",
+                                "The city list could not finish loading, so your city may be missing from it. "
+                                "Click retry to load it again.")
+            return
+        if location is None:
             QMessageBox.warning(self, "Input Error", "Please select a city from the list.")
             return
 
-        # Parse selected city and country
-        if ", " in user_input:
-            self.selected_city, self.selected_country = user_input.split(", ", 1)
-        else:
-            self.selected_city = user_input
-            self.selected_country = ""
+        self.selected_location = location
+        self.selected_city = location.city
+        self.selected_country = location.country
 
         self.accept()
 
@@ -119,3 +185,10 @@ class CityCountryInputDialog(QDialog):
             QMessageBox.warning(self, "Input Error", "Please select a valid city.")
             return None, None
         return self.selected_city, self.selected_country
+
+    def get_selected_location(self):
+        """
+        Return the selected CityEntry, whose coordinates and timezone are None
+        when the catalogue came from the online city list.
+        """
+        return self.selected_location
@@ -0,0 +1,137 @@
+import codecs
+import json
+import re
+
+# Incremental JSON reader for large downloads: walks a document arriving in byte chunks and yields its
+# scalar values with their position, without ever holding the whole text or building the tree.
+
+# A run of `"string",` items (only array elements and object values look like that) is taken in one
+# match, so long arrays of names cost a regex step instead of two tokens each.
+_TOKEN = re.compile(
+    r'\s*(?:((?:"[^"\\]*(?:\\.[^"\\]*)*"\s*,\s*)+)|([{}\[\]:,])|"([^"\\]*(?:\\.[^"\\]*)*)"|(-?[0-9][0-9.eE+-]*|true|false|null))', re.S)
+_STRING = re.compile(r'"([^"\\]*(?:\\.[^"\\]*)*)"', re.S)
+_WHITESPACE = re.compile(r"\s*")
+_LITERALS = {"true": True, "false": False, "null": None}
+
+# What iter_values() accepts next: a value, a value or "]", a key, a key or "}", ":", or "," or a closing bracket
+_VALUE, _VALUE_OR_END, _KEY, _KEY_OR_END, _COLON, _COMMA_OR_END = range(6)
+
+
+def _number(text):
+    value = float(text)
+    return int(text) if value.is_integer() and not any(c in text for c in ".eE") else value
+
+
+def iter_tokens(chunks):
+    """
+    Yield (kind, value) for each JSON token in an iterable of byte (or str) chunks: kind is the
+    punctuation character itself, "string", "scalar", or "strings" for a list of strings that are
+    each followed by a comma. A token split across chunks is completed from the next one.
+    Raises ValueError on malformed or truncated input.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    chunks = iter(chunks)
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        if chunk is None:
+            final = True
+            buffer += decoder.decode(b"", final=True)
+        else:
+            buffer += decoder.decode(chunk) if isinstance(chunk, (bytes, bytearray)) else chunk
+
+        position = 0
+        length = len(buffer)
+        match = _TOKEN.match
+        while True:
+            token = match(buffer, position)
+            if token is None:
+                break
+            run, punctuation, string, scalar = token.groups()
+            end = token.end()
+            if scalar is not None and end == length and not final:
+                break  # A number may continue in the next chunk
+            position = end
+            if run is not None:
+                yield "strings", [json.loads(f'"{item}"') if "\\" in item else item for item in _STRING.findall(run)]
+            elif punctuation is not None:
+                yield punctuation, punctuation
+            elif string is not None:
+                yield "string", json.loads(f'"{string}"') if "\\" in string else string
+            elif scalar in _LITERALS:
+                yield "scalar", _LITERALS[scalar]
+            else:
+                yield "scalar", _number(scalar)
+
+        buffer = buffer[position:]
+        rest = _WHITESPACE.match(buffer).end()
+        if final and rest != len(buffer):
+            raise ValueError(f"Malformed or truncated JSON near {buffer[rest:rest + 20]!r}")
+        if not final and len(buffer) > rest and buffer[rest] not in '"-0123456789tfn':
+            raise ValueError(f"Malformed JSON near {buffer[rest:rest + 20]!r}")
+
+
+def iter_values(chunks):
+    """
+    Yield (path, value) for every string, number, boolean and null in a streamed JSON document.
+    path is a live list of the enclosing object keys and array indexes, e.g. ["data", 3, "cities", 17]
+    for a city. It changes as parsing goes on, so copy it to keep it.
+    Raises ValueError if the document is malformed or ends early.
+    """
+    path = []
+    expect = _VALUE
+    started = False
+    for kind, value in iter_tokens(chunks):
+        if started and not path:
+            raise ValueError("Unexpected data after the JSON document")
+        started = True
+        in_array = bool(path) and type(path[-1]) is int
+        if kind == "strings":
+            # Values that are each followed by a comma: array elements, or one object value
+            if expect is _VALUE_OR_END or (expect is _VALUE and in_array):
+                for item in value:
+                    yield path, item
+                    path[-1] += 1
+                expect = _VALUE
+            elif expect is _VALUE and path and len(value) == 1:
+                yield path, value[0]
+                expect = _KEY
+            else:
+                raise ValueError("Malformed JSON: unexpected string")
+        elif kind == "string" and (expect is _KEY or expect is _KEY_OR_END):
+            path[-1] = value
+            expect = _COLON
+        elif expect is _VALUE or expect is _VALUE_OR_END:
+            if kind == "string" or kind == "scalar":
+                yield path, value
+                expect = _COMMA_OR_END
+            elif kind == "{":
+                path.append(None)  # Replaced by each key in turn
+                expect = _KEY_OR_END
+            elif kind == "[":
+                path.append(0)
+                expect = _VALUE_OR_END
+            elif kind == "]" and expect is _VALUE_OR_END:
+                path.pop()
+                expect = _COMMA_OR_END
+            else:
+                raise ValueError(f"Malformed JSON: expected a value, got {kind!r}")
+        elif kind == ":" and expect is _COLON:
+            expect = _VALUE
+        elif kind == "," and expect is _COMMA_OR_END:
+            if in_array:
+                path[-1] += 1
+                expect = _VALUE
+            else:
+                expect = _KEY
+        elif kind == "}" and (expect is _COMMA_OR_END or expect is _KEY_OR_END) and not in_array:
+            path.pop()
+            expect = _COMMA_OR_END
+        elif kind == "]" and expect is _COMMA_OR_END and in_array:
+            path.pop()
+            expect = _COMMA_OR_END
+        else:
+            raise ValueError(f"Malformed JSON: unexpected {kind!r}")
+    if not started or path:
+        raise ValueError("JSON document ended early")
@@ -0,0 +1,256 @@
+import datetime
+import itertools
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from prayer_time_handler import calculate_day_timetable, fetch_prayer_times, get_cached_prayer_times
+from day_timetable import build_day_window, localize, today_in, zone_info
+from prayer_calculator import DEFAULT_METHOD
+from background_tasks import run_in_background
+from boundary_scheduler import BoundaryScheduler
+from notification_engine import NotificationEngine
+from metrics import record_wakeup
+
+RETRY_DELAY_MS = 60000  # Wait before trying again when no prayer times could be loaded
+ONE_DAY = datetime.timedelta(days=1)
+ZERO = datetime.timedelta()
+
+_location_keys = itertools.count(1)
+
+
+class TrackedLocation(QObject):
+    """
+    One location's prayer times, as a rolling window of yesterday's, today's and tomorrow's timetables,
+    each with its own real times: the night that began yesterday is still found after midnight, and
+    today's night counts down to tomorrow's real Fajr.
+    Timetables are calculated locally when the coordinates are known, else read from the cache, and only
+    fetched on a worker thread when neither is available. All fetches go through the shared HTTP session
+    in http_client. The next day's window is prepared on a worker thread well before midnight, so the
+    rollover only swaps it in.
+    """
+    prayer_times_changed = pyqtSignal()
+
+    def __init__(self, city_name, country_name, latitude=None, longitude=None, timezone=None, method=DEFAULT_METHOD, parent=None):
+        super().__init__(parent)
+        self.key = f"location{next(_location_keys)}"  # Stable id for the scheduler and notification queue
+        self.set_details(city_name, country_name, latitude, longitude, timezone, method)
+        self.reset()
+
+        self.retry_timer = QTimer(self)
+        self.retry_timer.setSingleShot(True)
+        self.retry_timer.timeout.connect(self.load_prayer_times)
+
+    def set_details(self, city_name, country_name, latitude=None, longitude=None, timezone=None, method=DEFAULT_METHOD):
+        self.city_name = city_name
+        self.country_name = country_name
+        # With coordinates the prayer times are calculated locally instead of fetched
+        self.latitude = latitude
+        self.longitude = longitude
+        self.timezone = timezone
+        self.method = method
+
+    def reset(self):
+        """Forget every loaded day, e.g. after the location changed."""
+        self.days = {}  # Date -> DayTimetable around today, as far as loaded
+        self.unavailable = set()  # Neighbouring dates that could not be fetched; today is retried instead
+        self.window = None  # DayWindow in use; only ever replaced as a whole
+        self.next_window = None  # Tomorrow's DayWindow, prepared in the background
+        self.preparing = None  # Date of the window being prepared
+        self.prayer_times = None  # Today's DayTimetable
+        self.segments = None  # calculate_segments() output for today, ending at tomorrow's Fajr
+
+    @property
+    def display_name(self):
+        return f"{self.city_name}, {self.country_name}"
+
+    def identity(self):
+        return self.city_name, self.country_name, self.method
+
+    def current_timezone(self):
+        """The location's timezone as configured, else as reported with its prayer times; None for the system zone."""
+        return self.timezone if self.timezone is not None else getattr(self.prayer_times, "timezone", None)
+
+    def today(self):
+        """Return today's date where the location is."""
+        return today_in(self.current_timezone())
+
+    def load_day(self, date):
+        """Return a day's DayTimetable without touching the network, or None."""
+        if self.latitude is not None and self.longitude is not None:
+            try:
+                return calculate_day_timetable(self.latitude, self.longitude, self.timezone, date, self.method)
+            except Exception as e:
+                print(f"Local prayer time calculation failed: {e}")
+        return get_cached_prayer_times(self.city_name, self.country_name, self.method, date)
+
+    def load_prayer_times(self):
+        """Show today's window: the prepared one after midnight, else built from what can be loaded now."""
+        today = self.today()
+        if self.next_window and self.next_window.date == today:
+            self.set_window(self.next_window)
+            return
+
+        dates = (today - ONE_DAY, today, today + ONE_DAY)
+        self.days = {date: self.days.get(date) or self.load_day(date) for date in dates}
+        if self.days[today]:
+            try:
+                self.set_window(build_day_window(today, *(self.days[date] for date in dates)))
+            except ValueError as e:
+                print(f"Unusable prayer times for {self.display_name}: {e}")
+                self.window = None
+                self.prayer_times = self.days[today]
+                self.segments = None
+                self.prayer_times_changed.emit()
+
+        # Fetch what is missing one day at a time, today first; a month fetch usually fills the others
+        missing = [date for date in (today, today + ONE_DAY, today - ONE_DAY) if not self.days[date] and date not in self.unavailable]
+        if missing:
+            identity = self.identity()
+            run_in_background(
+                fetch_prayer_times, self.city_name, self.country_name, method=self.method, date=missing[0],
+                on_result=lambda prayer_times: self.set_fetched_day(identity, missing[0], prayer_times),
+            )
+
+    def set_fetched_day(self, identity, date, prayer_times):
+        # Drop a fetch that finished after the user switched to another location
+        if identity != self.identity():
+            return
+        if prayer_times:
+            self.days[date] = prayer_times
+        elif date == self.today():
+            print(f"Prayer times for {self.display_name} unavailable. Retrying in 1 minute...")
+            self.retry_timer.start(RETRY_DELAY_MS)
+            return
+        else:
+            self.unavailable.add(date)
+        self.load_prayer_times()
+
+    def set_window(self, window):
+        """Swap in a new DayWindow and work out today's segments from it."""
+        self.window = window
+        self.days = {window.date + offset: day for offset, day in zip((-ONE_DAY, ZERO, ONE_DAY), window[1:4]) if day}
+        self.prayer_times = window.today
+        self.segments = window.segments
+        self.prayer_times_changed.emit()
+        self.prepare_next_window()
+
+    def prepare_next_window(self):
+        """Build tomorrow's window on a worker thread, so the rollover at midnight needs no parsing or calculation."""
+        window = self.window
+        date = window.date + ONE_DAY
+        if not window.tomorrow or self.preparing == date or (self.next_window and self.next_window.date == date):
+            return
+        self.preparing = date
+        identity = self.identity()
+        run_in_background(
+            build_next_window, window, identity, self.latitude, self.longitude, self.timezone,
+            on_result=lambda next_window: self.set_next_window(identity, next_window),
+            on_error=lambda message: self.set_next_window(identity, None),
+        )
+
+    def set_next_window(self, identity, next_window):
+        if identity != self.identity() or not self.window:
+            return
+        if next_window and next_window.date == self.window.date + ONE_DAY:
+            self.next_window = next_window
+        self.preparing = None
+
+
+def build_next_window(window, identity, latitude, longitude, timezone):
+    """Return the DayWindow following `window`; loads the day after tomorrow. Runs on a worker thread."""
+    city_name, country_name, method = identity
+    day_after = fetch_prayer_times(city_name, country_name, latitude, longitude, timezone, method, window.date + 2 * ONE_DAY)
+    return build_day_window(window.date + ONE_DAY, window.today, window.tomorrow, day_after)
+
+
+class LocationTracker(QObject):
+    """
+    Every tracked location, sharing one boundary scheduler, one notification queue and one midnight
+    timer. Nothing here ticks per second, so tracking twenty cities costs about as much as one.
+    """
+    prayer_times_changed = pyqtSignal(object)  # TrackedLocation
+    segment_changed = pyqtSignal(object, str, object)  # TrackedLocation, label, datetime the segment ends
+    notification_due = pyqtSignal(object, object)  # TrackedLocation, NotificationEvent
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.locations = {}  # Key -> TrackedLocation, in the order they were added
+
+        self.scheduler = BoundaryScheduler(self)
+        self.scheduler.segment_changed.connect(self.on_segment_changed)
+        self.notifications = NotificationEngine(self)
+        self.notifications.notification_due.connect(self.on_notification_due)
+
+        # Switch each location to the next day's window at its midnight
+        self.midnight_timer = QTimer(self)
+        self.midnight_timer.setSingleShot(True)
+        self.midnight_timer.timeout.connect(self.roll_over_to_new_day)
+        self.schedule_midnight_rollover()
+
+    def add_location(self, city_name, country_name, latitude=None, longitude=None, timezone=None, method=DEFAULT_METHOD):
+        """Start tracking a location and load its prayer times. Returns the TrackedLocation."""
+        location = TrackedLocation(city_name, country_name, latitude, longitude, timezone, method, parent=self)
+        location.prayer_times_changed.connect(lambda: self.on_prayer_times_changed(location))
+        self.locations[location.key] = location
+        location.load_prayer_times()
+        return location
+
+    def remove_location(self, location):
+        self.locations.pop(location.key, None)
+        self.scheduler.remove(location.key)
+        self.notifications.clear(location.key)
+        location.retry_timer.stop()
+        location.deleteLater()
+
+    def change_location(self, location, city_name, country_name, latitude=None, longitude=None, timezone=None, method=DEFAULT_METHOD):
+        """Point a tracked location at another city and load its prayer times."""
+        location.set_details(city_name, country_name, latitude, longitude, timezone, method)
+        location.reset()
+        location.retry_timer.stop()
+        self.scheduler.remove(location.key)
+        self.notifications.clear(location.key)
+        location.load_prayer_times()
+
+    def state(self, location):
+        """Return (label, end time) of a location's current segment."""
+        return self.scheduler.state(location.key)
+
+    def on_prayer_times_changed(self, location):
+        self.schedule_midnight_rollover()  # The location's timezone may only be known now
+        if location.window:
+            self.scheduler.set_table(location.window.table, location.key)
+            # Times may have moved (e.g. tomorrow's real Fajr replaced an estimate); what was shown stays shown
+            self.notifications.clear(location.key, forget_delivered=False)
+            self.notifications.schedule_day(location.window.table, key=location.key)
+        else:
+            self.scheduler.remove(location.key)
+        self.prayer_times_changed.emit(location)
+
+    def on_segment_changed(self, key, label, next_time):
+        location = self.locations.get(key)
+        if location:
+            self.segment_changed.emit(location, label, next_time)
+
+    def on_notification_due(self, event):
+        location = self.locations.get(event.key)
+        if location:
+            self.notification_due.emit(location, event)
+
+    def schedule_midnight_rollover(self):
+        """Arm the single-shot timer for just after the next midnight here or at any tracked location."""
+        now = datetime.datetime.now().astimezone()
+        midnights = []
+        for tzinfo in {zone_info(location.current_timezone()) for location in self.locations.values()} | {None}:
+            local = now.astimezone(tzinfo) if tzinfo is not None else now
+            midnights.append(localize(datetime.datetime.combine(local.date() + ONE_DAY, datetime.time()), tzinfo))
+        self.midnight_timer.start(int((min(midnights) - now).total_seconds() * 1000) + 1000)
+
+    def roll_over_to_new_day(self):
+        """Swap in the prepared window (or load one, if none is ready) of every location whose day has changed."""
+        record_wakeup("midnight")
+        try:
+            for location in list(self.locations.values()):
+                if not location.window or location.window.date != location.today():
+                    location.load_prayer_times()
+        except Exception as e:
+            print(f"Error rolling over to the new day: {e}")
+        finally:
+            self.schedule_midnight_rollover()
@@ -0,0 +1,284 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# Opt-in instrumentation: call counts, duration histograms, event counters (retries, cache hits) and
+# timer wakeups per hour. Enable with "metrics_enabled": true in settings.json or PRAYER_TIME_METRICS=1.
+# When disabled, @instrumented returns the function unchanged and the counters return after one check.
+
+METRICS_FILE_NAME = "metrics.log"
+ENABLED_KEY = "metrics_enabled"
+PORT_KEY = "metrics_port"
+ENABLED_ENV = "PRAYER_TIME_METRICS"
+PORT_ENV = "PRAYER_TIME_METRICS_PORT"
+
+# Histogram bucket upper bounds in seconds, from a countdown tick to a slow network fetch
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+SNAPSHOT_INTERVAL = 300  # Seconds between snapshots written to the metrics file
+MAX_FILE_BYTES = 1024 * 1024
+BACKUP_COUNT = 3
+WAKEUP_HOURS_KEPT = 24
+
+_enabled = None
+
+
+def metrics_enabled():
+    """Return whether instrumentation is on. Decided once, on first use, so it never changes while running."""
+    global _enabled
+    if _enabled is None:
+        value = os.environ.get(ENABLED_ENV)
+        if value is not None:
+            _enabled = value.strip().lower() not in ("", "0", "false", "no")
+        else:
+            try:
+                from settings import get_settings
+                _enabled = bool(get_settings().get(ENABLED_KEY, False))
+            except Exception as e:
+                print(f"Error reading the metrics setting: {e}")
+                _enabled = False
+    return _enabled
+
+
+class Histogram:
+    """Counts of observed durations per bucket, plus their sum."""
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # The last bucket is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile, or None if nothing was observed."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """Process-wide metric values. Thread-safe: fetches run off the GUI thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.calls = {}  # Function name -> Histogram of call durations
+        self.errors = {}  # Function name -> calls that raised
+        self.counters = {}  # Event name -> count
+        self.wakeups = {}  # Timer name -> {hour start (epoch seconds): wakeups}
+
+    def observe(self, name, seconds, failed=False):
+        with self.lock:
+            histogram = self.calls.get(name)
+            if histogram is None:
+                histogram = self.calls[name] = Histogram()
+            histogram.observe(seconds)
+            if failed:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def wakeup(self, timer, now=None):
+        hour = int(now if now is not None else time.time()) // 3600 * 3600
+        with self.lock:
+            hours = self.wakeups.setdefault(timer, {})
+            hours[hour] = hours.get(hour, 0) + 1
+            if len(hours) > WAKEUP_HOURS_KEPT:
+                del hours[min(hours)]
+
+    def snapshot(self):
+        """Return the current values as a JSON-serializable dict."""
+        with self.lock:
+            return {
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "uptime_seconds": round(time.time() - self.started),
+                "calls": {
+                    name: {
+                        "count": histogram.count,
+                        "errors": self.errors.get(name, 0),
+                        "total_ms": round(histogram.total * 1000, 3),
+                        "mean_ms": round(histogram.total * 1000 / histogram.count, 3),
+                        "p50_le_ms": histogram.quantile(0.5) * 1000,
+                        "p99_le_ms": histogram.quantile(0.99) * 1000,
+                        "buckets": histogram.counts[:],
+                    }
+                    for name, histogram in self.calls.items()
+                },
+                "counters": dict(self.counters),
+                "wakeups_per_hour": {
+                    timer: {time.strftime("%Y-%m-%dT%H:00", time.localtime(hour)): count for hour, count in sorted(hours.items())}
+                    for timer, hours in self.wakeups.items()
+                },
+            }
+
+    def prometheus_text(self):
+        """Render the current values in the Prometheus text exposition format."""
+        lines = []
+        current_hour = int(time.time()) // 3600 * 3600
+        with self.lock:
+            lines.append("# TYPE prayer_time_call_duration_seconds histogram")
+            for name, histogram in sorted(self.calls.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'prayer_time_call_duration_seconds_bucket{{function="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'prayer_time_call_duration_seconds_sum{{function="{name}"}} {histogram.total!r}')
+                lines.append(f'prayer_time_call_duration_seconds_count{{function="{name}"}} {histogram.count}')
+            lines.append("# TYPE prayer_time_call_errors_total counter")
+            for name in sorted(self.calls):
+                lines.append(f'prayer_time_call_errors_total{{function="{name}"}} {self.errors.get(name, 0)}')
+            lines.append("# TYPE prayer_time_events_total counter")
+            for name, count in sorted(self.counters.items()):
+                lines.append(f'prayer_time_events_total{{event="{name}"}} {count}')
+            lines.append("# TYPE prayer_time_timer_wakeups_total counter")
+            for timer, hours in sorted(self.wakeups.items()):
+                lines.append(f'prayer_time_timer_wakeups_total{{timer="{timer}"}} {sum(hours.values())}')
+            lines.append("# TYPE prayer_time_timer_wakeups_previous_hour gauge")
+            for timer, hours in sorted(self.wakeups.items()):
+                lines.append(f'prayer_time_timer_wakeups_previous_hour{{timer="{timer}"}} {hours.get(current_hour - 3600, 0)}')
+        lines.append(f"prayer_time_uptime_seconds {round(time.time() - self.started)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def instrumented(name):
+    """Decorator recording the call count and duration of a function under `name`, when metrics are on."""
+    def decorate(func):
+        if not metrics_enabled():
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = func(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                registry.observe(name, time.perf_counter() - started, failed)
+        return wrapper
+    return decorate
+
+
+def increment(name, amount=1):
+    """Count an event such as a retry or a cache hit."""
+    if _enabled or (_enabled is None and metrics_enabled()):
+        registry.increment(name, amount)
+
+
+def record_wakeup(timer):
+    """Count one wakeup of a named timer, for the wakeups-per-hour figures."""
+    if _enabled or (_enabled is None and metrics_enabled()):
+        registry.wakeup(timer)
+
+
+_writer = None
+
+
+class _SnapshotWriter:
+    """Appends a JSON snapshot per line to a size-rotated file in the app data directory."""
+
+    def __init__(self, path, interval):
+        from logging import Formatter, getLogger
+        from logging.handlers import RotatingFileHandler
+
+        handler = RotatingFileHandler(path, maxBytes=MAX_FILE_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8")
+        handler.setFormatter(Formatter("%(message)s"))
+        self.logger = getLogger("prayer_time.metrics")
+        self.logger.propagate = False
+        self.logger.addHandler(handler)
+        self.logger.setLevel("INFO")
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="metrics-writer", daemon=True)
+
+    def write(self):
+        try:
+            self.logger.info(json.dumps(registry.snapshot(), separators=(",", ":")))
+        except Exception as e:
+            print(f"Error writing metrics: {e}")
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        self.stopped.set()
+        self.write()
+
+
+def _configured_port():
+    value = os.environ.get(PORT_ENV)
+    if value is None:
+        from settings import get_settings
+        value = get_settings().get(PORT_KEY)
+    return int(value) if value else None
+
+
+def serve_prometheus(port, host="127.0.0.1"):
+    """Serve GET /metrics in the Prometheus text format from a background thread. Returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-endpoint", daemon=True).start()
+    print(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+
+def start_metrics(interval=SNAPSHOT_INTERVAL):
+    """
+    Start writing snapshots to the metrics file and, if a metrics port is configured, serving them
+    for Prometheus. Does nothing when metrics are disabled.
+    """
+    global _writer
+    if not metrics_enabled() or _writer is not None:
+        return
+    try:
+        from app_paths import get_data_file
+        _writer = _SnapshotWriter(get_data_file(METRICS_FILE_NAME), interval)
+        _writer.thread.start()
+        atexit.register(_writer.stop)  # Keep the last few minutes too
+    except Exception as e:
+        print(f"Error starting the metrics file: {e}")
+    try:
+        port = _configured_port()
+        if port:
+            serve_prometheus(port)
+    except Exception as e:
+        print(f"Error starting the metrics endpoint: {e}")
@@ -0,0 +1,155 @@
+import datetime
+import heapq
+from collections import namedtuple
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+from metrics import record_wakeup
+
+START = "start"
+REMINDER = "reminder"
+
+# Labels that get "approx. N minutes left" reminders before they end, unless the user configures otherwise
+REMINDER_LABELS = ["FAJR", "ZUHR", "ASR", "MAGHRIB", "ISHA"]
+DEFAULT_REMINDER_OFFSETS = {label: [30] for label in REMINDER_LABELS}
+OFFSETS_SETTINGS_KEY = "reminder_offsets"
+
+DELIVERED_RETENTION = datetime.timedelta(days=2)  # How long delivered event ids are remembered
+
+# One notification: kind is START or REMINDER, offset the minutes before the segment ends (0 for START),
+# start/end the segment it belongs to (end is None for the last segment of the table), key the location
+NotificationEvent = namedtuple(
+    "NotificationEvent", ["event_id", "kind", "label", "offset", "fire_time", "start", "end", "key"], defaults=(None,)
+)
+
+
+def load_reminder_offsets(settings=None):
+    """
+    Return {label: [minutes before the segment ends, ...]} from the settings, e.g. {"FAJR": [30, 10]}.
+    Falls back to one 30-minute reminder per prayer when nothing (valid) is configured.
+    """
+    if settings is None:
+        from settings import get_settings
+        settings = get_settings()
+    configured = settings.get(OFFSETS_SETTINGS_KEY)
+    if not isinstance(configured, dict):
+        return DEFAULT_REMINDER_OFFSETS
+    offsets = {}
+    for label, minutes in configured.items():
+        if isinstance(minutes, (int, float)):
+            minutes = [minutes]
+        if not isinstance(minutes, list):
+            print(f"Ignoring invalid reminder offsets for {label}: {minutes!r}")
+            continue
+        offsets[label] = sorted({int(m) for m in minutes if isinstance(m, (int, float)) and m > 0}, reverse=True)
+    return offsets
+
+
+def build_day_events(table, offsets, key=None):
+    """
+    Precompute every notification of a SegmentTable: one START event per boundary and one REMINDER event
+    per configured offset. Event ids name the location, label and calendar date rather than the exact
+    minute, so a day rescheduled from slightly different timings does not notify twice.
+    """
+    prefix = f"{key}|" if key is not None else ""
+    events = []
+    for index, label in enumerate(table.labels):
+        start = table.boundaries[index]
+        end = table.boundaries[index + 1] if index + 1 < len(table) else None
+        events.append(NotificationEvent(f"{prefix}{START}|{label}|{start.date()}", START, label, 0, start, start, end, key))
+        if end is None:
+            continue
+        for offset in offsets.get(label, ()):
+            fire_time = end - datetime.timedelta(minutes=offset)
+            if fire_time <= start:
+                continue  # The segment is shorter than the offset
+            events.append(NotificationEvent(
+                f"{prefix}{REMINDER}|{label}|{offset}|{end.date()}", REMINDER, label, offset, fire_time, start, end, key
+            ))
+    return events
+
+
+class NotificationEngine(QObject):
+    """
+    Min-heap of (fire time, event id, event), filled once per day from each location's segment table;
+    one queue serves every tracked location.
+    A single-shot timer wakes up only for the earliest event. After a stall (sleep, busy loop) every
+    overdue event is handled in one go: events whose segment is already over are dropped, and of several
+    overdue events for the same segment only the latest is shown. Delivered ids are remembered, so
+    rescheduling a day never repeats a notification.
+    """
+    notification_due = pyqtSignal(object)  # NotificationEvent
+
+    def __init__(self, parent=None, offsets=None):
+        super().__init__(parent)
+        self.offsets = offsets if offsets is not None else load_reminder_offsets()
+        self.heap = []
+        self.queued = set()  # Ids in the heap
+        self.delivered = {}  # Id -> fire time of events already handled
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.on_timer)
+
+    def schedule_day(self, table, now=None, key=None):
+        """Queue the notifications of a location's SegmentTable that are still ahead."""
+        now = now or datetime.datetime.now().astimezone()
+        for event in build_day_events(table, self.offsets, key):
+            if event.event_id in self.queued or event.event_id in self.delivered or event.fire_time <= now:
+                continue
+            heapq.heappush(self.heap, (event.fire_time, event.event_id, event))
+            self.queued.add(event.event_id)
+        self.arm(now)
+
+    def clear(self, key=None, forget_delivered=True):
+        """
+        Drop the queued notifications of one location, e.g. when it changes or is removed, and forget
+        which of its events were delivered unless forget_delivered is False. Without a key every
+        location is cleared.
+        """
+        keep = (lambda event: False) if key is None else (lambda event: event.key != key)
+        self.heap = [entry for entry in self.heap if keep(entry[2])]
+        heapq.heapify(self.heap)
+        self.queued = {event_id for _, event_id, _ in self.heap}
+        if forget_delivered and key is None:
+            self.delivered.clear()
+        elif forget_delivered:
+            prefix = f"{key}|"
+            self.delivered = {event_id: fired for event_id, fired in self.delivered.items() if not event_id.startswith(prefix)}
+        self.arm(datetime.datetime.now().astimezone())
+
+    def arm(self, now):
+        self.timer.stop()
+        if self.heap:
+            # Small slack so the timer never fires just before the event it waits for
+            self.timer.start(max(0, int((self.heap[0][0] - now).total_seconds() * 1000)) + 50)
+
+    def on_timer(self):
+        record_wakeup("notification")
+        now = datetime.datetime.now().astimezone()
+        for event in self.pop_due(now):
+            self.notification_due.emit(event)
+        self.arm(now)
+
+    def pop_due(self, now):
+        """Remove the events due by now and return the ones still worth showing, oldest first."""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _, event_id, event = heapq.heappop(self.heap)
+            self.queued.discard(event_id)
+            self.delivered[event_id] = event.fire_time
+            due.append(event)
+
+        latest = {}
+        for event in due:
+            if event.end is not None and now >= event.end:
+                continue  # Its segment is already over
+            # Per location, a later start replaces an earlier one and a later reminder replaces an earlier
+            # one for the same segment
+            if event.kind == START:
+                latest[(event.key, START)] = event
+            else:
+                latest[(event.key, REMINDER, event.label, event.end)] = event
+
+        oldest = now - DELIVERED_RETENTION
+        self.delivered = {event_id: fired for event_id, fired in self.delivered.items() if fired >= oldest}
+        return sorted(latest.values(), key=lambda event: event.fire_time)
@@ -0,0 +1,225 @@
+import datetime
+import math
+
+# Calculation methods, keyed by the same ids the Aladhan API uses for its "method" parameter.
+# Angles are sun depression angles in degrees; "isha_minutes" means Isha is a fixed interval after Maghrib.
+# Midnight is halfway from sunset to sunrise, except where "jafari_midnight" runs it to Fajr as Aladhan does.
+CALCULATION_METHODS = {
+    0: {"name": "Shia Ithna-Ansari", "fajr": 16, "isha": 14, "maghrib": 4, "jafari_midnight": True},
+    1: {"name": "University of Islamic Sciences, Karachi", "fajr": 18, "isha": 18},
+    2: {"name": "Islamic Society of North America", "fajr": 15, "isha": 15},
+    3: {"name": "Muslim World League", "fajr": 18, "isha": 17},
+    4: {"name": "Umm Al-Qura University, Makkah", "fajr": 18.5, "isha_minutes": 90},
+    5: {"name": "Egyptian General Authority of Survey", "fajr": 19.5, "isha": 17.5},
+    7: {"name": "Institute of Geophysics, University of Tehran", "fajr": 17.7, "isha": 14, "maghrib": 4.5},
+    8: {"name": "Gulf Region", "fajr": 19.5, "isha_minutes": 90},
+    9: {"name": "Kuwait", "fajr": 18, "isha": 17.5},
+    10: {"name": "Qatar", "fajr": 18, "isha_minutes": 90},
+    11: {"name": "Majlis Ugama Islam Singapura, Singapore", "fajr": 20, "isha": 18},
+    12: {"name": "Union Organization islamic de France", "fajr": 12, "isha": 12},
+    13: {"name": "Diyanet İşleri Başkanlığı, Turkey", "fajr": 18, "isha": 17},
+    14: {"name": "Spiritual Administration of Muslims of Russia", "fajr": 16, "isha": 15},
+    15: {"name": "Moonsighting Committee Worldwide", "fajr": 18, "isha": 18},
+    16: {"name": "Dubai", "fajr": 18.2, "isha": 18.2},
+}
+
+DEFAULT_METHOD = 2  # Same method the app has always requested from Aladhan
+IMSAK_MINUTES_BEFORE_FAJR = 10
+INVALID_TIME = "-----"
+
+# Keys in the same order the Aladhan "timings" object uses
+TIMING_KEYS = ["Fajr", "Sunrise", "Dhuhr", "Asr", "Sunset", "Maghrib", "Isha", "Imsak", "Midnight", "Firstthird", "Lastthird"]
+
+
+def _sin(d):
+    return math.sin(math.radians(d))
+
+def _cos(d):
+    return math.cos(math.radians(d))
+
+def _tan(d):
+    return math.tan(math.radians(d))
+
+def _arcsin(x):
+    return math.degrees(math.asin(x))
+
+def _arccos(x):
+    if x < -1 or x > 1:
+        return math.nan  # The sun never reaches this angle today
+    return math.degrees(math.acos(x))
+
+def _arctan2(y, x):
+    return math.degrees(math.atan2(y, x))
+
+def _arccot(x):
+    return math.degrees(math.atan(1 / x))
+
+def _fix_angle(a):
+    return a % 360.0
+
+def _fix_hour(h):
+    return h % 24.0
+
+
+def julian_day(date):
+    """Return the Julian day number at 00:00 UTC of a Gregorian date."""
+    year, month, day = date.year, date.month, date.day
+    if month <= 2:
+        year -= 1
+        month += 12
+    a = year // 100
+    b = 2 - a + a // 4
+    return math.floor(365.25 * (year + 4716)) + math.floor(30.6001 * (month + 1)) + day + b - 1524.5
+
+def sun_position(jd):
+    """Return (declination, equation_of_time) of the sun for a Julian day."""
+    d = jd - 2451545.0
+    g = _fix_angle(357.529 + 0.98560028 * d)
+    q = _fix_angle(280.459 + 0.98564736 * d)
+    l = _fix_angle(q + 1.915 * _sin(g) + 0.020 * _sin(2 * g))
+    e = 23.439 - 0.00000036 * d
+
+    right_ascension = _fix_hour(_arctan2(_cos(e) * _sin(l), _cos(l)) / 15)
+    equation_of_time = q / 15 - right_ascension
+    declination = _arcsin(_sin(e) * _sin(l))
+    return declination, equation_of_time
+
+
+def resolve_utc_offset(timezone, date):
+    """
+    Return the UTC offset in hours for a date.
+    timezone may be a number of hours, an IANA name such as "Europe/London", or None for the system zone.
+    """
+    if isinstance(timezone, (int, float)):
+        return float(timezone)
+
+    noon = datetime.datetime(date.year, date.month, date.day, 12)
+    if timezone is None:
+        offset = noon.astimezone().utcoffset()
+    else:
+        from zoneinfo import ZoneInfo  # Needs the "tzdata" package on Windows
+        offset = ZoneInfo(timezone).utcoffset(noon)
+    return offset.total_seconds() / 3600.0
+
+
+class _SolarDay:
+    """Solar geometry for one date at one location. Times are hours of local mean time."""
+
+    def __init__(self, date, latitude, longitude):
+        self.latitude = latitude
+        self.jd = julian_day(date) - longitude / (15 * 24)
+
+    def mid_day(self, time):
+        _, equation_of_time = sun_position(self.jd + time / 24)
+        return _fix_hour(12 - equation_of_time)
+
+    def sun_angle_time(self, angle, time, before_noon=False):
+        declination, _ = sun_position(self.jd + time / 24)
+        noon = self.mid_day(time)
+        t = _arccos(
+            (-_sin(angle) - _sin(declination) * _sin(self.latitude)) /
+            (_cos(declination) * _cos(self.latitude))
+        ) / 15
+        return noon - t if before_noon else noon + t
+
+    def asr_time(self, shadow_factor, time):
+        declination, _ = sun_position(self.jd + time / 24)
+        angle = -_arccot(shadow_factor + _tan(abs(self.latitude - declination)))
+        return self.sun_angle_time(angle, time)
+
+
+def _time_diff(t1, t2):
+    return _fix_hour(t2 - t1)
+
+def _adjust_high_latitude(time, base, angle, night, before_base=False):
+    """Clamp a twilight time to the angle-based portion of the night (Aladhan's default rule)."""
+    portion = angle / 60.0 * night
+    diff = _time_diff(time, base) if before_base else _time_diff(base, time)
+    if math.isnan(time) or diff > portion:
+        time = base - portion if before_base else base + portion
+    return time
+
+def _format_time(time):
+    """Format hours as "HH:MM", rounded to the nearest minute like the Aladhan API."""
+    if math.isnan(time):
+        return INVALID_TIME
+    time = _fix_hour(time + 0.5 / 60)
+    hours = int(time)
+    minutes = int((time - hours) * 60)
+    return f"{hours:02d}:{minutes:02d}"
+
+
+def _compute_hours(date, latitude, longitude, utc_offset, params, asr_school, elevation):
+    """Return prayer times for a date as fractional hours of local clock time."""
+    day = _SolarDay(date, latitude, longitude)
+    rise_set_angle = 0.833 + 0.0347 * math.sqrt(max(elevation, 0))
+    maghrib_angle = params.get("maghrib")
+    isha_angle = params.get("isha")
+
+    # First guesses, refined by one pass of the solar position at each guess (same as praytimes.org)
+    fajr = day.sun_angle_time(params["fajr"], 5, before_noon=True)
+    sunrise = day.sun_angle_time(rise_set_angle, 6, before_noon=True)
+    dhuhr = day.mid_day(12)
+    asr = day.asr_time(asr_school + 1, 13)
+    sunset = day.sun_angle_time(rise_set_angle, 18)
+    maghrib = day.sun_angle_time(maghrib_angle, 18) if maghrib_angle else sunset
+    isha = day.sun_angle_time(isha_angle, 18) if isha_angle else math.nan
+
+    shift = utc_offset - longitude / 15
+    fajr, sunrise, dhuhr, asr, sunset, maghrib, isha = (
+        t + shift for t in (fajr, sunrise, dhuhr, asr, sunset, maghrib, isha)
+    )
+
+    night = _time_diff(sunset, sunrise)
+    fajr = _adjust_high_latitude(fajr, sunrise, params["fajr"], night, before_base=True)
+    if maghrib_angle:
+        maghrib = _adjust_high_latitude(maghrib, sunset, maghrib_angle, night)
+    if isha_angle:
+        isha = _adjust_high_latitude(isha, sunset, isha_angle, night)
+    else:
+        isha = maghrib + params["isha_minutes"] / 60
+
+    return {
+        "Fajr": fajr,
+        "Sunrise": sunrise,
+        "Dhuhr": dhuhr,
+        "Asr": asr,
+        "Sunset": sunset,
+        "Maghrib": maghrib,
+        "Isha": isha,
+    }
+
+
+def calculate_prayer_times(latitude, longitude, timezone=None, date=None, method=DEFAULT_METHOD, asr_school=0, elevation=0):
+    """
+    Calculate prayer times locally, without any network access.
+    Returns a dict of "HH:MM" strings with the same keys as the Aladhan "timings" object.
+    asr_school is 0 for Shafi/Maliki/Hanbali and 1 for Hanafi, as in the Aladhan API.
+    """
+    if method not in CALCULATION_METHODS:
+        raise ValueError(f"Unknown calculation method: {method}")
+    if date is None:
+        date = datetime.date.today()
+
+    params = CALCULATION_METHODS[method]
+    utc_offset = resolve_utc_offset(timezone, date)
+    times = _compute_hours(date, latitude, longitude, utc_offset, params, asr_school, elevation)
+
+    # The night runs from sunset to the next day's Fajr
+    next_date = date + datetime.timedelta(days=1)
+    next_offset = resolve_utc_offset(timezone, next_date)
+    next_times = _compute_hours(next_date, latitude, longitude, next_offset, params, asr_school, elevation)
+    night = next_times["Fajr"] + 24 - times["Sunset"]
+    midnight_end = next_times["Fajr"] if params.get("jafari_midnight") else next_times["Sunrise"]
+
+    times["Imsak"] = times["Fajr"] - IMSAK_MINUTES_BEFORE_FAJR / 60
+    times["Midnight"] = times["Sunset"] + (midnight_end + 24 - times["Sunset"]) / 2
+    times["Firstthird"] = times["Sunset"] + night / 3
+    times["Lastthird"] = times["Sunset"] + night * 2 / 3
+
+    return {key: _format_time(times[key]) for key in TIMING_KEYS}
+
+
+# if __name__ == "__main__":
+#     # Makkah, for comparison with https://aladhan.com
+#     print(calculate_prayer_times(21.4225, 39.8262, "Asia/Riyadh", method=4))
@@ -0,0 +1,285 @@
+"""
+Headless prayer-time daemon for status bars and scripts; needs no Qt.
+
+    python prayer_daemon.py [--port 8765 | --unix-socket PATH] [--city NAME --country NAME
+                            [--latitude LAT --longitude LON --timezone ZONE] [--method N]]
+
+Without a location on the command line the one saved by the tray app is used.
+Answers GET requests over localhost HTTP (or HTTP on a Unix socket) with JSON:
+
+    /current  current segment, its start and end, the next segment and the seconds left
+    /day      the whole day's timings and segment table
+    /hijri    the Hijri date, rolled over as configured in the tray app
+    /status   plain text like the overlay, e.g. "Makkah ASR left 1h 2m 3s"
+
+Every response is precomputed once per day; a request costs a bisect and, for /current and
+/status, formatting the seconds left.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import time
+from bisect import bisect_right
+from hijri_calendar import (
+    DEFAULT_CALENDAR, DEFAULT_ROLLOVER, MONTH_NAMES, ROLLOVER_MAGHRIB, format_hijri_date, gregorian_to_hijri,
+)
+from prayer_calculator import CALCULATION_METHODS, DEFAULT_METHOD
+from prayer_time_handler import fetch_prayer_times
+from day_timetable import build_day_window, localize, today_in
+from segment_table import BEFORE_FIRST_LABEL
+from settings import get_settings, load_location
+
+DEFAULT_PORT = 8765
+STATUS_OK = "200 OK"
+STATUS_NOT_FOUND = "404 Not Found"
+STATUS_UNAVAILABLE = "503 Service Unavailable"
+RETRY_SECONDS = 60  # Wait before trying again when no prayer times could be loaded
+
+
+def http_response(status, body, content_type="application/json"):
+    return (
+        f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n"
+    ).encode("ascii") + body
+
+
+def json_body(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def hijri_json(date, calendar, adjustment):
+    hijri = gregorian_to_hijri(date, calendar, adjustment)
+    return {
+        "date": format_hijri_date(hijri),
+        "day": hijri.day,
+        "month": hijri.month,
+        "month_name": MONTH_NAMES[hijri.month - 1],
+        "year": hijri.year,
+        "gregorian_date": date.isoformat(),
+    }
+
+
+class DayResponses:
+    """Every response for one location and day, built once; per request only the seconds left are formatted."""
+
+    def __init__(self, city_name, country_name, window, hijri_settings):
+        table = window.table  # Spans yesterday to tomorrow, so the hours after midnight are right too
+        date = window.date
+        self.date = date
+        self.city_name = city_name
+        self.timezone = window.today.timezone
+
+        # Boundary timestamps (the boundaries are aware, in the location's timezone), so a request needs
+        # nothing but time.time() and a bisect
+        self.stamps = [boundary.timestamp() for boundary in table.boundaries]
+        labels = [BEFORE_FIRST_LABEL] + list(table.labels)
+        starts = [None] + list(table.boundaries)
+        ends = list(table.boundaries) + [None]
+
+        # For each segment: the /current JSON without its closing seconds_left, and the /status text prefix
+        self.current_prefixes = []
+        self.status_prefixes = []
+        for index, label in enumerate(labels):
+            current = {
+                "location": f"{city_name}, {country_name}",
+                "label": label,
+                "start": starts[index].isoformat() if starts[index] else None,
+                "end": ends[index].isoformat() if ends[index] else None,
+                "next_label": labels[index + 1] if index + 1 < len(labels) else None,
+            }
+            self.current_prefixes.append(json_body(current)[:-1] + b', "seconds_left": ')
+            self.status_prefixes.append(f"{city_name} {label} left ".encode("utf-8"))
+
+        day = {
+            "location": f"{city_name}, {country_name}",
+            "date": date.isoformat(),
+            "timings": window.today.to_dict(),
+            "segments": [
+                {"label": label, "start": start.isoformat(), "end": end.isoformat() if end else None}
+                for label, start, end in zip(table.labels, table.boundaries, list(table.boundaries[1:]) + [None])
+                if start.date() == date
+            ],
+        }
+        self.day_response = http_response(STATUS_OK, json_body(day))
+
+        # The Hijri date before and after today's Maghrib
+        calendar, adjustment, rollover = hijri_settings
+        self.hijri_responses = [
+            http_response(STATUS_OK, json_body(hijri_json(date, calendar, adjustment))),
+            http_response(STATUS_OK, json_body(hijri_json(date + datetime.timedelta(days=1), calendar, adjustment))),
+        ]
+        self.hijri_rollover_stamp = window.segments["maghrib_time"].timestamp() if rollover == ROLLOVER_MAGHRIB else None
+        # Rebuilt at the location's midnight, wherever this daemon runs
+        next_midnight = datetime.datetime.combine(date + datetime.timedelta(days=1), datetime.time())
+        self.valid_until = localize(next_midnight, window.today.tzinfo()).timestamp()
+
+    def segment_index(self, now):
+        return bisect_right(self.stamps, now)
+
+    def seconds_left(self, index, now):
+        if index >= len(self.stamps):
+            return None
+        return max(0, int(self.stamps[index] - now))
+
+    def current(self, now):
+        index = self.segment_index(now)
+        seconds = self.seconds_left(index, now)
+        body = self.current_prefixes[index] + (b"null" if seconds is None else str(seconds).encode("ascii")) + b"}"
+        return http_response(STATUS_OK, body)
+
+    def status(self, now):
+        index = self.segment_index(now)
+        seconds = self.seconds_left(index, now)
+        countdown = "..." if seconds is None else f"{seconds // 3600}h {(seconds // 60) % 60}m {seconds % 60}s"
+        return http_response(STATUS_OK, self.status_prefixes[index] + countdown.encode("ascii"), "text/plain; charset=utf-8")
+
+    def hijri(self, now):
+        after_rollover = self.hijri_rollover_stamp is not None and now >= self.hijri_rollover_stamp
+        return self.hijri_responses[after_rollover]
+
+
+class PrayerDaemon:
+    """Keeps today's DayResponses and answers requests from it; rebuilt after midnight."""
+
+    def __init__(self, city_name, country_name, latitude=None, longitude=None, timezone=None, method=DEFAULT_METHOD):
+        self.location = (city_name, country_name, latitude, longitude, timezone, method)
+        self.responses = None
+        self.loading = False
+        self.retry_at = 0
+        self.routes = {
+            b"/current": lambda responses, now: responses.current(now),
+            b"/day": lambda responses, now: responses.day_response,
+            b"/hijri": lambda responses, now: responses.hijri(now),
+            b"/status": lambda responses, now: responses.status(now),
+        }
+
+    def build_responses(self, date):
+        """Load the prayer times around a day and precompute its responses. May block on the network."""
+        city_name, country_name, latitude, longitude, timezone, method = self.location
+        yesterday, today, tomorrow = (
+            fetch_prayer_times(city_name, country_name, latitude, longitude, timezone, method, date + datetime.timedelta(days=offset))
+            for offset in (-1, 0, 1)
+        )
+        if not today:
+            raise ValueError(f"No prayer times for {city_name}, {country_name} on {date}.")
+        settings = get_settings()
+        hijri_settings = (
+            settings.get("hijri_calendar", DEFAULT_CALENDAR),
+            settings.get("hijri_adjustment", 0),
+            settings.get("hijri_rollover", DEFAULT_ROLLOVER),
+        )
+        return DayResponses(city_name, country_name, build_day_window(date, yesterday, today, tomorrow), hijri_settings)
+
+    def today(self):
+        """Return today's date at the location: in its configured timezone, else the one its prayer times came with."""
+        timezone = self.location[4]
+        if timezone is None and self.responses is not None:
+            timezone = self.responses.timezone
+        return today_in(timezone)
+
+    async def refresh(self):
+        """Build today's responses on a worker thread; the previous day's keep being served meanwhile."""
+        self.loading = True
+        try:
+            loop = asyncio.get_running_loop()
+            self.responses = await loop.run_in_executor(None, self.build_responses, self.today())
+        except Exception as e:
+            print(f"Error loading prayer times: {e}")
+            self.retry_at = time.time() + RETRY_SECONDS
+        finally:
+            self.loading = False
+
+    def respond(self, path):
+        now = time.time()
+        responses = self.responses
+        if (responses is None or now >= responses.valid_until) and not self.loading and now >= self.retry_at:
+            asyncio.ensure_future(self.refresh())
+
+        route = self.routes.get(path.split(b"?", 1)[0])
+        if route is None:
+            return http_response(STATUS_NOT_FOUND, json_body({"error": "Unknown path", "paths": [p.decode() for p in self.routes]}))
+        if responses is None:
+            return http_response(STATUS_UNAVAILABLE, json_body({"error": "Prayer times are not loaded yet"}))
+        return route(responses, now)
+
+    async def handle_connection(self, reader, writer):
+        """Serve GET requests on one connection, keeping it open unless the client asks to close it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                keep_alive = not request_line.rstrip().endswith(b"HTTP/1.0")
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.partition(b":")
+                    if name.strip().lower() == b"connection":
+                        keep_alive = value.strip().lower() == b"keep-alive"
+
+                parts = request_line.split()
+                path = parts[1] if len(parts) > 1 else b"/"
+                writer.write(self.respond(path))
+                if not keep_alive:
+                    break
+                await writer.drain()
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None):
+        await self.refresh()
+        if unix_socket:
+            if os.path.exists(unix_socket):
+                os.remove(unix_socket)
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            print(f"Serving on unix socket {unix_socket}", flush=True)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            print(f"Serving on http://{host}:{port}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix-socket", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--city")
+    parser.add_argument("--country")
+    parser.add_argument("--latitude", type=float)
+    parser.add_argument("--longitude", type=float)
+    parser.add_argument("--timezone", help="IANA name (e.g. Europe/London) or UTC offset in hours")
+    parser.add_argument("--method", type=int, choices=sorted(CALCULATION_METHODS))
+    args = parser.parse_args()
+
+    if args.city and args.country:
+        timezone = args.timezone
+        try:
+            timezone = float(timezone)
+        except (TypeError, ValueError):
+            pass
+        location = (args.city, args.country, args.latitude, args.longitude, timezone,
+                    args.method if args.method is not None else DEFAULT_METHOD)
+    else:
+        saved, method = load_location()
+        if saved is None:
+            parser.error("No saved location; pass --city and --country.")
+        location = (*saved, args.method if args.method is not None else method)
+
+    from metrics import start_metrics
+    start_metrics()
+    daemon = PrayerDaemon(*location)
+    try:
+        asyncio.run(daemon.serve(args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,158 @@
-import requests
 import datetime
-import time
-from PyQt5.QtWidgets import QMessageBox
+import threading
+from prayer_calculator import calculate_prayer_times, DEFAULT_METHOD
+from timings_cache import get_timings_cache
+from http_client import SingleFlight, conditional_get, retry_with_backoff
+from segment_table import SegmentTable
+from day_timetable import DayTimetable
+from metrics import increment, instrumented
 
-def fetch_prayer_times(city_name, country_name):
-    """Fetch prayer times using the city and country."""
-    url = f"https://api.aladhan.com/v1/timingsByCity?city={city_name}&country={country_name}&method=2"
-    print(f"Fetching prayer times from: {url}")
+ALADHAN_API_URL = "https://api.aladhan.com/v1"  # Benchmarks point this at a local stand-in server
+PREFETCH_DAYS_BEFORE_MONTH_END = 3  # Fetch next month this many days ahead so midnight never needs the network
 
-    while True:  # Retry loop
+_prayer_time_loads = SingleFlight()
+
+@instrumented("fetch_prayer_times")
+def fetch_prayer_times(city_name, country_name, latitude=None, longitude=None, timezone=None, method=DEFAULT_METHOD, date=None):
+    """
+    Fetch prayer times using the city and country.
+    When coordinates are known the times are calculated locally and no network request is made.
+    Otherwise a whole month is fetched at once and kept in the on-disk timings cache.
+    Network requests retry with bounded backoff and block, so call this off the GUI thread.
+    Concurrent calls for the same location and date share a single fetch.
+    Returns a DayTimetable, or None if the times could not be fetched.
+    """
+    date = date or datetime.date.today()
+    key = (city_name, country_name, latitude, longitude, timezone, method, date)
+    return _prayer_time_loads.run(key, _load_prayer_times, city_name, country_name, latitude, longitude, timezone, method, date)
+
+
+def _load_prayer_times(city_name, country_name, latitude, longitude, timezone, method, date):
+    if latitude is not None and longitude is not None:
         try:
-            response = requests.get(url, timeout=5)
-
-            if response.status_code != 200:
-                print(f"API returned status code {response.status_code}")
-                raise requests.RequestException(f"API Error: {response.status_code}")
-
-            data = response.json()
-            if "data" in data and "timings" in data["data"]:
-                print("Successfully fetched prayer times!")
-                return data["data"]["timings"]
-            else:
-                raise ValueError("Unexpected API response format.")
-
-        except requests.RequestException as e:
-            print(f"Network error occurred: {e}. Retrying in 5 seconds...")
-        except ValueError as e:
-            print(f"Parsing error: {e}. Retrying in 5 seconds...")
+            prayer_times = calculate_day_timetable(latitude, longitude, timezone, date, method)
+            print(f"Calculated prayer times locally for {city_name}, {country_name}")
+            return prayer_times
         except Exception as e:
-            print(f"Unexpected error: {e}. Retrying in 5 seconds...")
+            print(f"Local prayer time calculation failed: {e}. Falling back to the API...")
+
+    prayer_times = get_cached_prayer_times(city_name, country_name, method, date)
+    if prayer_times:
+        print(f"Using cached prayer times for {city_name}, {country_name}")
+        return prayer_times
+
+    import requests  # Only needed once we actually go to the network
+    try:
+        timings_by_date = retry_with_backoff(fetch_month_timings, city_name, country_name, date.year, date.month, method)
+        get_timings_cache().store_days(city_name, country_name, method, timings_by_date)
+        if date not in timings_by_date:
+            raise ValueError(f"Prayer times for {date} are missing from the API response.")
+        print("Successfully fetched prayer times!")
+        return DayTimetable.from_timings(timings_by_date[date], date)
+
+    except requests.RequestException as e:
+        print(f"Network error occurred: {e}")
+    except ValueError as e:
+        print(f"Parsing error: {e}")
+    except Exception as e:
+        print(f"Unexpected error: {e}")
+    increment("fetch_failures")
+    return None
+
+
+def calculate_day_timetable(latitude, longitude, timezone, date, method=DEFAULT_METHOD):
+    """Calculate a day's prayer times locally and return them as a DayTimetable."""
+    return DayTimetable.from_timings(calculate_prayer_times(latitude, longitude, timezone, date=date, method=method), date, timezone)
+
+
+def get_cached_prayer_times(city_name, country_name, method, date):
+    """
+    Return a day's timings from the cache as a DayTimetable without touching the network, or None.
+    Stale entries and the coming month are refreshed in the background.
+    """
+    cache = get_timings_cache()
+    entry = cache.get(city_name, country_name, method, date)
+    if not entry:
+        increment("timings_cache_misses")
+        return None
+    increment("timings_cache_hits")
+
+    if cache.needs_refresh(entry):
+        refresh_month_in_background(city_name, country_name, date.year, date.month, method)
+
+    next_month = (date.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+    if (next_month - date).days <= PREFETCH_DAYS_BEFORE_MONTH_END and not cache.get(city_name, country_name, method, next_month):
+        refresh_month_in_background(city_name, country_name, next_month.year, next_month.month, method)
+
+    return DayTimetable.from_timings(entry["timings"], date)
+
+
+def fetch_month_timings(city_name, country_name, year, month, method=DEFAULT_METHOD):
+    """Fetch a whole Gregorian month of prayer times in one request. Returns {date: timings}."""
+    url = f"{ALADHAN_API_URL}/calendarByCity/{year}/{month}"
+    return _fetch_calendar(url, {"city": city_name, "country": country_name, "method": method})
 
-        time.sleep(5)
+
+def fetch_hijri_month_timings(city_name, country_name, hijri_year, hijri_month, method=DEFAULT_METHOD):
+    """Fetch a whole Hijri month (e.g. Ramadan) of prayer times in one request. Returns {date: timings}."""
+    url = f"{ALADHAN_API_URL}/hijriCalendarByCity/{hijri_year}/{hijri_month}"
+    return _fetch_calendar(url, {"city": city_name, "country": country_name, "method": method})
+
+
+@instrumented("http_fetch_calendar")
+def _fetch_calendar(url, params):
+    """
+    Fetch one of the Aladhan calendar endpoints and index its days by Gregorian date. The location's
+    timezone from the response is kept with each day's timings under "timezone".
+    """
+    print(f"Fetching prayer times from: {url} {params}")
+
+    days = conditional_get(url, params=params).json().get("data")
+    if not isinstance(days, list):
+        raise ValueError("Unexpected API response format.")
+
+    timings_by_date = {}
+    for day in days:
+        try:
+            date = datetime.datetime.strptime(day["date"]["gregorian"]["date"], "%d-%m-%Y").date()
+            timings = strip_timezone_suffixes(day["timings"])
+            timezone = (day.get("meta") or {}).get("timezone")
+            if timezone:
+                timings["timezone"] = timezone
+            timings_by_date[date] = timings
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Unexpected API response format: {e}")
+    return timings_by_date
+
+
+def strip_timezone_suffixes(timings):
+    """Calendar timings look like "05:12 (BST)"; keep only the "HH:MM" part."""
+    return {name: value.split(" ")[0] for name, value in timings.items()}
+
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def refresh_month_in_background(city_name, country_name, year, month, method=DEFAULT_METHOD):
+    """Re-fetch a month into the cache on a daemon thread, at most once at a time per month."""
+    key = (city_name, country_name, year, month, method)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def refresh():
+        try:
+            timings_by_date = fetch_month_timings(city_name, country_name, year, month, method)
+            get_timings_cache().store_days(city_name, country_name, method, timings_by_date)
+            print(f"Refreshed cached prayer times for {city_name}, {country_name}")
+        except Exception as e:
+            print(f"Background refresh failed: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=refresh, daemon=True).start()
 
 
 # def fetch_prayer_times(city_name, country_name):
@@ -46,17 +168,25 @@ def fetch_prayer_times(city_name, country_name):
 #         "Midnight": "23:46"
 #     }
 
+_error_reporter = None
+
+def set_error_reporter(reporter):
+    """
+    Route errors from this module to reporter(title, message), e.g. a dialog in the GUI.
+    Without one they are printed, so the module works without Qt.
+    """
+    global _error_reporter
+    _error_reporter = reporter
+
 def show_error_dialog(title, message):
-    """Display an error dialog to the user."""
-    dialog = QMessageBox()
-    dialog.setIcon(QMessageBox.Warning)
-    dialog.setWindowTitle(title)
-    dialog.setText(message)
-    dialog.setStandardButtons(QMessageBox.Ok)
-    dialog.exec_()
+    """Report an error to the user through the installed reporter, or print it."""
+    if _error_reporter is not None:
+        _error_reporter(title, message)
+    else:
+        print(f"{title}: {message}")
 
 def calculate_segments(prayer_times):
-    """Calculate prayer time segments with error handling for invalid data."""
+    """Calculate prayer time segments (datetimes keyed like "fajr_time") with error handling for invalid data."""
     if not prayer_times:
         show_error_dialog(
             "Prayer Times Error", 
@@ -65,47 +195,10 @@ def calculate_segments(prayer_times):
         return None  # Return None to indicate an error
     
     try:
-        now = datetime.datetime.now()
-        today_date = datetime.datetime(now.year, now.month, now.day)
-
-        def get_time_from_prayer_string(prayer_time_string):
-            hours, minutes = map(int, prayer_time_string.split(':'))
-            return today_date + datetime.timedelta(hours=hours, minutes=minutes)
-
-        # Extract and parse prayer times
-        fajr_time = get_time_from_prayer_string(prayer_times.get('Fajr', '00:00'))
-        sunrise_time = get_time_from_prayer_string(prayer_times.get('Sunrise', '00:00'))
-        dhuhr_time = get_time_from_prayer_string(prayer_times.get('Dhuhr', '00:00'))
-        asr_time = get_time_from_prayer_string(prayer_times.get('Asr', '00:00'))
-        maghrib_time = get_time_from_prayer_string(prayer_times.get('Maghrib', '00:00'))
-        isha_time = get_time_from_prayer_string(prayer_times.get('Isha', '00:00'))
-        # midnight_time = get_time_from_prayer_string(prayer_times.get('Midnight', '00:00'))
-        # Calculate Midnight mathematically
-        time_difference = fajr_time - maghrib_time
-        if time_difference.days < 0:  # Handle overnight time crossing
-            time_difference += datetime.timedelta(days=1)
-
-        midnight_time = maghrib_time + (time_difference / 2)
-        lastthird_time = get_time_from_prayer_string(prayer_times.get('Lastthird', '00:00')) + datetime.timedelta(days=1)
-        next_fajr_time = fajr_time + datetime.timedelta(days=1)
-        haram1_end = sunrise_time + datetime.timedelta(minutes=10)
-        haram2_start = dhuhr_time - datetime.timedelta(minutes=5)
-        haram3_start = maghrib_time - datetime.timedelta(minutes=10)
-
-        return {
-            "fajr_time": fajr_time,
-            "sunrise_time": sunrise_time,
-            "haram1_end": haram1_end,
-            "dhuhr_time": dhuhr_time,
-            "haram2_start": haram2_start,
-            "asr_time": asr_time,
-            "haram3_start": haram3_start,
-            "maghrib_time": maghrib_time,
-            "isha_time": isha_time,
-            "midnight_time": midnight_time,
-            "lastthird_time": lastthird_time,
-            "next_fajr_time": next_fajr_time
-        }
+        # The boundaries come from the integer minutes of a DayTimetable; a plain dict is taken to be today's
+        if not isinstance(prayer_times, DayTimetable):
+            prayer_times = DayTimetable.from_timings(prayer_times, datetime.date.today())
+        return prayer_times.segments()
     except ValueError as e:
         show_error_dialog(
             "Prayer Times Parsing Error", 
@@ -119,7 +212,7 @@ def calculate_segments(prayer_times):
         )
         return None
 
-def determine_label_and_countdown(segments):
+def determine_label_and_countdown(segments, now=None):
     if not segments:
         # If no segments, return UNKNOWN and notify the user via error dialog
         show_error_dialog(
@@ -129,34 +222,16 @@ def determine_label_and_countdown(segments):
         return {'next_time': None, 'label': 'UNKNOWN'}
 
     try:
-        now = datetime.datetime.now()
-
-        # Evaluate the current time against prayer segments and determine the label
-        if now >= segments.get('fajr_time', now) and now < segments.get('sunrise_time', now):
-            return {'next_time': segments['sunrise_time'], 'label': 'FAJR'}
-        elif now >= segments.get('sunrise_time', now) and now < segments.get('haram1_end', now):
-            return {'next_time': segments['haram1_end'], 'label': 'Makruh1'}
-        elif now >= segments.get('haram1_end', now) and now < segments.get('haram2_start', now):
-            return {'next_time': segments['haram2_start'], 'label': 'DUHA'}
-        elif now >= segments.get('haram2_start', now) and now < segments.get('dhuhr_time', now):
-            return {'next_time': segments['dhuhr_time'], 'label': 'Makruh2'}
-        elif now >= segments.get('dhuhr_time', now) and now < segments.get('asr_time', now):
-            return {'next_time': segments['asr_time'], 'label': 'ZUHR'}
-        elif now >= segments.get('asr_time', now) and now < segments.get('haram3_start', now):
-            return {'next_time': segments['haram3_start'], 'label': 'ASR'}
-        elif now >= segments.get('haram3_start', now) and now < segments.get('maghrib_time', now):
-            return {'next_time': segments['maghrib_time'], 'label': 'Makruh3'}
-        elif now >= segments.get('maghrib_time', now) and now < segments.get('isha_time', now):
-            return {'next_time': segments['isha_time'], 'label': 'MAGHRIB'}
-        elif now >= segments.get('isha_time', now) and now < segments.get('midnight_time', now):
-            return {'next_time': segments['midnight_time'], 'label': 'ISHA'}
-        elif now >= segments.get('midnight_time', now) and now < segments.get('lastthird_time', now):
-            return {'next_time': segments['lastthird_time'], 'label': 'Mid Night'}
-        elif now >= segments.get('lastthird_time', now) and now < segments.get('next_fajr_time', now):
-            return {'next_time': segments['next_fajr_time'], 'label': 'TAHAJJUT'}
-        else:
-            # Default to the next Fajr if no other case matches
-            return {'next_time': segments.get('fajr_time', now), 'label': 'TAHAJJUT'}
+        now = now or datetime.datetime.now().astimezone()
+
+        # Look the current time up in the sorted boundary table; a DayWindow's table also covers the
+        # night that began yesterday, so the hours after midnight count down to the real Fajr
+        table = segments if isinstance(segments, SegmentTable) else SegmentTable.from_segments(segments)
+        label, _, next_time = table.segment_at(now)
+        if label is None:
+            # Past the last boundary the last segment is still running; never count down to a time that has passed
+            return {'next_time': None, 'label': table.labels[-1]}
+        return {'next_time': next_time, 'label': label}
 
     except KeyError as e:
         # Handle missing keys gracefully
@@ -0,0 +1,92 @@
+from bisect import bisect_right
+
+# (segment key that starts the period, label shown during it), in the order they occur
+SEGMENT_ORDER = [
+    ("fajr_time", "FAJR"),
+    ("sunrise_time", "Makruh1"),
+    ("haram1_end", "DUHA"),
+    ("haram2_start", "Makruh2"),
+    ("dhuhr_time", "ZUHR"),
+    ("asr_time", "ASR"),
+    ("haram3_start", "Makruh3"),
+    ("maghrib_time", "MAGHRIB"),
+    ("isha_time", "ISHA"),
+    ("midnight_time", "Mid Night"),
+    ("lastthird_time", "TAHAJJUT"),
+    ("next_fajr_time", "FAJR"),
+]
+
+SEGMENT_LABELS = dict(SEGMENT_ORDER)
+
+# Label for the time before the first boundary: the previous night is still running
+BEFORE_FIRST_LABEL = "TAHAJJUT"
+
+
+class SegmentTable:
+    """
+    Immutable, sorted table of one day's segment boundaries.
+    Boundary times and labels are kept as parallel tuples so any lookup is a single bisect.
+    Works for any time t, which lets the UI, scheduler and notifier share it and tests inject times.
+    """
+    __slots__ = ("boundaries", "labels")
+
+    def __init__(self, boundaries, labels):
+        if len(boundaries) != len(labels):
+            raise ValueError("Each boundary needs exactly one label.")
+        if any(later < earlier for earlier, later in zip(boundaries, boundaries[1:])):
+            raise ValueError("Segment boundaries must be in chronological order.")
+        object.__setattr__(self, "boundaries", tuple(boundaries))
+        object.__setattr__(self, "labels", tuple(labels))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SegmentTable is immutable.")
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Build a table from calculate_segments() output. Raises KeyError if a segment is missing."""
+        missing = [key for key, _ in SEGMENT_ORDER if not segments.get(key)]
+        if missing:
+            raise KeyError(f"Missing segment(s): {', '.join(missing)}")
+        rows = sorted(((segments[key], label) for key, label in SEGMENT_ORDER), key=lambda row: row[0])
+        return cls([time for time, _ in rows], [label for _, label in rows])
+
+    @classmethod
+    def from_days(cls, days):
+        """
+        Build one table across consecutive DayTimetables, e.g. yesterday, today and tomorrow. Each night
+        ends at the following day's own Fajr; only the last day's night end is estimated.
+        """
+        rows = []
+        for day, next_day in zip(days, list(days[1:]) + [None]):
+            for key, moment in day.segment_datetimes(next_day).items():
+                if key == "next_fajr_time" and next_day is not None:
+                    continue  # The same moment as the next day's Fajr, which starts its own rows
+                rows.append((moment, SEGMENT_LABELS[key]))
+        rows.sort(key=lambda row: row[0])
+        return cls([time for time, _ in rows], [label for _, label in rows])
+
+    def __len__(self):
+        return len(self.boundaries)
+
+    def segment_at(self, t):
+        """
+        Return (label, start, end) of the segment containing t.
+        Before the first boundary the start is None; after the last boundary the result is (None, last, None).
+        """
+        index = bisect_right(self.boundaries, t)
+        if index == 0:
+            return BEFORE_FIRST_LABEL, None, self.boundaries[0] if self.boundaries else None
+        if index == len(self.boundaries):
+            return None, self.boundaries[-1], None
+        return self.labels[index - 1], self.boundaries[index - 1], self.boundaries[index]
+
+    def label_at(self, t):
+        """Return the label of the segment containing t, or None past the end of the table."""
+        return self.segment_at(t)[0]
+
+    def next_boundary_after(self, t):
+        """Return (time, label starting then) of the first boundary strictly after t, or (None, None)."""
+        index = bisect_right(self.boundaries, t)
+        if index == len(self.boundaries):
+            return None, None
+        return self.boundaries[index], self.labels[index]
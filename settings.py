@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+from app_paths import get_data_file
+from city_catalogue import CityEntry
+from prayer_calculator import CALCULATION_METHODS, DEFAULT_METHOD
+
+SETTINGS_FILE_NAME = "settings.json"
+LOCATION_KEY = "location"
+EXTRA_LOCATIONS_KEY = "extra_locations"
+
+
+class Settings:
+    """User preferences, stored as a JSON object in the app data directory."""
+
+    def __init__(self, path=None):
+        self.path = path or get_data_file(SETTINGS_FILE_NAME)
+        self.lock = threading.Lock()
+        self.values = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable settings file: {e}")
+            return {}
+
+    def _save(self):
+        """Write the settings atomically so a crash never leaves a half-written file."""
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.values, f, indent=2)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"Error saving settings: {e}")
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self.values.get(key, default)
+
+    def set(self, key, value):
+        """Store one setting and persist the file."""
+        with self.lock:
+            if self.values.get(key) == value and key in self.values:
+                return
+            self.values[key] = value
+            self._save()
+
+
+_settings = None
+_settings_lock = threading.Lock()
+
+def get_settings():
+    """Return the process-wide settings, loading them from disk on first use."""
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            _settings = Settings()
+        return _settings
+
+
+def _parse_location(saved):
+    """Return (CityEntry, method) from a dict written by _location_to_dict(), or None if it is invalid."""
+    try:
+        location = CityEntry(
+            saved["city"], saved["country"], saved.get("latitude"), saved.get("longitude"), saved.get("timezone")
+        )
+        method = saved.get("method", DEFAULT_METHOD)
+    except (KeyError, TypeError, AttributeError):
+        return None
+    if not location.city or not location.country:
+        return None
+    if method not in CALCULATION_METHODS:
+        method = DEFAULT_METHOD
+    return location, method
+
+def _location_to_dict(location, method):
+    return {"method": method, **location._asdict()}
+
+def load_location(settings=None):
+    """
+    Return (CityEntry, method) of the location saved by save_location(), or (None, DEFAULT_METHOD).
+    latitude/longitude/timezone are None for a location picked from the online city list.
+    """
+    return _parse_location((settings or get_settings()).get(LOCATION_KEY)) or (None, DEFAULT_METHOD)
+
+def save_location(location, method=DEFAULT_METHOD, settings=None):
+    """Remember the chosen location so later launches can skip the city dialog."""
+    (settings or get_settings()).set(LOCATION_KEY, _location_to_dict(location, method))
+
+def load_extra_locations(settings=None):
+    """Return [(CityEntry, method), ...] of the additional locations shown in the tray menu."""
+    saved = (settings or get_settings()).get(EXTRA_LOCATIONS_KEY)
+    if not isinstance(saved, list):
+        return []
+    return [parsed for parsed in map(_parse_location, saved) if parsed]
+
+def save_extra_locations(locations, settings=None):
+    """Remember the additional locations, given as [(CityEntry, method), ...]."""
+    (settings or get_settings()).set(EXTRA_LOCATIONS_KEY, [_location_to_dict(location, method) for location, method in locations])
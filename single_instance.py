@@ -0,0 +1,108 @@
+import getpass
+import hashlib
+import json
+import os
+from PyQt5.QtCore import QDir, QLockFile, QObject, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+# Arguments a later launch can forward to the running instance
+SHOW_ARG = "--show"
+CHANGE_LOCATION_ARG = "--change-location"
+ADD_LOCATION_ARG = "--add-location"
+QUIT_ARG = "--quit"
+
+CONNECT_TIMEOUT_MS = 200
+RETRY_CONNECT_TIMEOUT_MS = 5000  # For a second try at an instance that is running but busy
+LOCK_TIMEOUT_MS = 5000
+# Connect errors that mean no instance is running; a timeout may just be a busy one
+NO_INSTANCE_ERRORS = (QLocalSocket.ServerNotFoundError, QLocalSocket.ConnectionRefusedError)
+
+
+def server_name():
+    """Per-user name of the local socket, so two users on one machine each get their own instance."""
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "default"
+    return f"PrayerTimeNotifier-{hashlib.sha1(user.encode('utf-8')).hexdigest()[:12]}"
+
+
+class SingleInstance(QObject):
+    """
+    Keeps the app to one process per user through a named local socket (a named pipe on Windows).
+    A later launch hands its arguments to the running instance with forward() and exits; the running
+    instance receives them through message_received.
+    """
+    message_received = pyqtSignal(list)  # Arguments of a later launch
+
+    def __init__(self, name=None, parent=None):
+        super().__init__(parent)
+        self.name = name or server_name()
+        self.server = None
+        self.connect_error = None  # Why the last forward() found no instance
+
+    def connect(self, timeout):
+        """Return a socket connected to the running instance, or None, recording why in connect_error."""
+        socket = QLocalSocket()
+        socket.connectToServer(self.name)
+        if not socket.waitForConnected(timeout):
+            self.connect_error = socket.error()
+            return None
+        return socket
+
+    def forward(self, args, timeout=CONNECT_TIMEOUT_MS):
+        """Send args to a running instance. Returns False if there is none."""
+        socket = self.connect(timeout)
+        if socket is None:
+            return False
+        socket.write(json.dumps(list(args)).encode("utf-8") + b"\n")
+        socket.waitForBytesWritten(timeout)
+        socket.disconnectFromServer()
+        return True
+
+    def listen(self):
+        """
+        Become the running instance. Returns False if another instance is (or just became) the
+        running one, or the socket could not be created; forward() to it again then.
+        """
+        # Launches at the same moment take turns, so none removes a socket another has just created
+        lock = QLockFile(os.path.join(QDir.tempPath(), f"{self.name}.lock"))
+        if not lock.tryLock(LOCK_TIMEOUT_MS):
+            print("Could not lock the single instance socket.")
+            return False
+        try:
+            socket = self.connect(CONNECT_TIMEOUT_MS)
+            if socket is not None:
+                socket.disconnectFromServer()
+                return False  # Started while this launch was waiting for the lock
+            # A socket that refuses connections is a leftover from a crashed instance; one that only
+            # answers slowly belongs to a live instance and is left alone
+            if self.connect_error in NO_INSTANCE_ERRORS:
+                QLocalServer.removeServer(self.name)
+            self.server = QLocalServer(self)
+            self.server.setSocketOptions(QLocalServer.UserAccessOption)
+            self.server.newConnection.connect(self.on_new_connection)
+            if not self.server.listen(self.name):
+                print(f"Could not listen for other instances: {self.server.errorString()}")
+                self.server = None
+                return False
+            return True
+        finally:
+            lock.unlock()
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.read_message(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def read_message(self, socket):
+        if not socket.canReadLine():
+            return  # Wait for the rest of the line
+        try:
+            args = json.loads(bytes(socket.readLine()).decode("utf-8"))
+        except ValueError as e:
+            print(f"Ignoring a malformed message from another instance: {e}")
+            return
+        if isinstance(args, list):
+            self.message_received.emit([str(arg) for arg in args])
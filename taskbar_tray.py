@@ -1,15 +1,92 @@
 from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QSystemTrayIcon, QMenu, QAction, QDialog, QLabel, QVBoxLayout,QMessageBox
+from PyQt5.QtWidgets import QSystemTrayIcon, QMenu, QAction, QActionGroup, QDialog, QLabel, QVBoxLayout,QMessageBox
 from PyQt5.QtGui import QIcon,QPixmap
-import requests
 import datetime
 from prayer_time_handler import calculate_segments
+from hijri_calendar import (
+    CALENDARS, DEFAULT_CALENDAR, DEFAULT_ROLLOVER, MAX_ADJUSTMENT_DAYS, ROLLOVER_MAGHRIB, ROLLOVER_MIDNIGHT,
+    format_hijri_date, gregorian_to_hijri, hijri_day_for,
+)
+from prayer_calculator import DEFAULT_METHOD
+from city_catalogue import CityEntry
+from settings import get_settings, save_extra_locations, save_location
+from metrics import instrumented
+
+# Entries of each day-dependent submenu, built once; only their texts change from day to day
+MENU_ENTRIES = {
+    "prayer_times_menu": ["fajr", "duha", "zuhr", "asr", "maghrib", "esha"],
+    "tahajjud_menu": ["tahajjud"],
+    "imsak_menu": ["imsak"],
+    "sunrise_sunset_menu": ["sunrise", "sunset"],
+    "makruh_menu": ["after_fajr", "before_zuhr", "before_maghrib"],
+}
+
+MENU_ERRORS = {
+    "tahajjud_menu": "Error calculating Tahajjud time",
+    "imsak_menu": "Error fetching Imsak time",
+    "sunrise_sunset_menu": "Error fetching Sunrise/Sunset times",
+    "makruh_menu": "Error calculating Makruh times",
+}
+
+
+def format_clock(hours, minutes):
+    """Format a time of day like strftime('%I:%M %p')."""
+    return f"{hours % 12 or 12:02d}:{minutes:02d} {'AM' if hours < 12 else 'PM'}"
+
+
+def format_menu_texts(prayer_times, segments):
+    """Format the text of every day-dependent menu entry of a DayTimetable in a single pass. Returns {entry: text}."""
+    def clock(moment):
+        return format_clock(moment.hour, moment.minute)
+
+    fajr = clock(segments['fajr_time'])
+    sunrise = clock(segments['sunrise_time'])
+    dhuhr = clock(segments['dhuhr_time'])
+    maghrib = clock(segments['maghrib_time'])
+
+    imsak_minutes = prayer_times.minute('Imsak')
+    imsak = f"Imsak: {format_clock(*divmod(imsak_minutes, 60))}" if imsak_minutes is not None else MENU_ERRORS["imsak_menu"]
+
+    return {
+        "fajr": f"Fajr: {fajr}",
+        "duha": f"Duha: {clock(segments['sunrise_time'] + datetime.timedelta(minutes=20))}",
+        "zuhr": f"Zuhr: {dhuhr}",
+        "asr": f"Asr: {clock(segments['asr_time'])}",
+        "maghrib": f"Maghrib: {maghrib}",
+        "esha": f"Esha: {clock(segments['isha_time'])}",
+        "tahajjud": f"Appr. Best Time: {clock(segments['lastthird_time'])} - {fajr}",
+        "imsak": imsak,
+        "sunrise": f"Sunrise: {sunrise}",
+        "sunset": f"Sunset: {maghrib}",
+        "after_fajr": f"After Fajr: {fajr} - {sunrise}",
+        "before_zuhr": f"Before Zuhr: {clock(segments['dhuhr_time'] - datetime.timedelta(minutes=5))} - {dhuhr}",
+        "before_maghrib": f"Before Maghrib: {clock(segments['maghrib_time'] - datetime.timedelta(minutes=15))} - {maghrib}",
+    }
+
+
+class LocationSection:
+    """The tray submenu of one additional tracked location."""
+
+    def __init__(self, location, menu, status_action, actions):
+        self.location = location
+        self.menu = menu
+        self.status_action = status_action
+        self.actions = actions  # Entry name -> QAction, as in MENU_ENTRIES["prayer_times_menu"]
+        self.source = None  # Prayer times the texts were formatted from
+
 
 class SystemTray(QSystemTrayIcon):
-    def __init__(self, app, window):
+    def __init__(self, app, window=None):
         super().__init__()
         self.window = window
         self.app = app
+        self.menus_stale = True  # Submenus are rebuilt lazily, right before the menu opens
+        self.hijri_date_day = None  # Gregorian day the Hijri date submenu was last filled for
+        self.maghrib_time = None  # Today's Maghrib, when the Hijri date rolls over
+        self.menu_actions = {}  # Entry name -> QAction of the day-dependent submenus
+        self.menu_texts_source = None  # Prayer times the current menu texts were formatted from
+        self.location_sections = {}  # TrackedLocation key -> LocationSection in "Other Locations"
+        self.settings = get_settings()
 
         try:
             # Set the icon for the tray
@@ -42,6 +119,27 @@ class SystemTray(QSystemTrayIcon):
             self.hijri_date_menu = QMenu("Hijri Date", self.tray_menu)
             self.tray_menu.addMenu(self.hijri_date_menu)
 
+            for menu_name, entries in MENU_ENTRIES.items():
+                menu = getattr(self, menu_name)
+                for entry in entries:
+                    self.menu_actions[entry] = menu.addAction("")
+            self.create_hijri_date_menu()
+
+            # Further tracked locations, one submenu each, refreshed only when the submenu opens
+            self.other_locations_menu = QMenu("Other Locations", self.tray_menu)
+            self.tray_menu.addMenu(self.other_locations_menu)
+            self.add_location_action = self.other_locations_menu.addAction("Add Location...")
+            self.add_location_action.setEnabled(False)  # Until the overlay window exists
+            self.add_location_action.triggered.connect(self.add_location)
+            self.other_locations_menu.addSeparator()
+            self.other_locations_menu.aboutToShow.connect(self.refresh_location_sections)
+
+            # Picking another city loads the city list only now, not at every launch
+            self.change_location_action = QAction("Change Location...", self)
+            self.change_location_action.setEnabled(False)  # Until the overlay window exists
+            self.change_location_action.triggered.connect(self.change_location)
+            self.tray_menu.addAction(self.change_location_action)
+
             # Add lock, note, and exit actions
             self.lock_position_action = QAction("Lock Position", self)
             self.lock_position_action.triggered.connect(self.toggle_lock_position)
@@ -61,8 +159,8 @@ class SystemTray(QSystemTrayIcon):
             # Connect tray icon click signal
             self.activated.connect(self.icon_activated)
 
-            # Initialize prayer times menus
-            self.update_prayer_times_menu()
+            # Fill the prayer times menus only when the menu is about to be shown
+            self.tray_menu.aboutToShow.connect(self.refresh_menus_if_stale)
 
         except FileNotFoundError as e:
             self.show_error_dialog("Tray Icon Error", str(e))
@@ -124,113 +222,243 @@ class SystemTray(QSystemTrayIcon):
         except Exception as e:
             self.show_error_dialog("Note Dialog Error", f"An error occurred while displaying the note dialog:\n{e}")
 
+    def show_menu_message(self, menu_name, message):
+        """Show a single message in a day-dependent submenu, hiding its other entries."""
+        actions = [self.menu_actions[entry] for entry in MENU_ENTRIES[menu_name]]
+        actions[0].setText(message)
+        actions[0].setVisible(bool(message))
+        for action in actions[1:]:
+            action.setVisible(False)
+
     def clear_menus(self):
         """Clear all submenus to reset them."""
         try:
-            self.prayer_times_menu.clear()
-            self.imsak_menu.clear()
-            self.tahajjud_menu.clear()
-            self.sunrise_sunset_menu.clear()
-            self.hijri_date_menu.clear()
+            self.menu_texts_source = None
+            for menu_name in MENU_ENTRIES:
+                self.show_menu_message(menu_name, "")
+            self.hijri_date_action.setText("")
         except Exception as e:
             print(f"Error clearing menus: {e}")
 
     def show_fallback_menus(self, message="Error updating menu"):
         """Populate submenus with fallback messages."""
         try:
-            self.prayer_times_menu.clear()
-            self.prayer_times_menu.addAction(message)
+            self.menu_texts_source = None
+            self.show_menu_message("prayer_times_menu", message)
+            for menu_name, error in MENU_ERRORS.items():
+                self.show_menu_message(menu_name, error)
+            self.hijri_date_action.setText("Error calculating Hijri date")
+        except Exception as e:
+            print(f"Error displaying fallback menus: {e}")
+            
+    def set_window(self, window):
+        """Attach the overlay window once it exists; the tray icon is shown before it is created."""
+        self.window = window
+        self.change_location_action.setEnabled(window is not None)
+        self.add_location_action.setEnabled(window is not None)
+        if window is not None:
+            for location in window.tracker.locations.values():
+                if location is not window.location:
+                    self.add_location_section(location)
+        self.invalidate_menus()
+        self.update_lock_position_action_text()
+
+    def add_location(self):
+        """Ask for a city and track it alongside the overlay's location."""
+        try:
+            from input_dialog import CityCountryInputDialog
+            dialog = CityCountryInputDialog()
+            if dialog.exec_() != QDialog.Accepted:
+                return
+            entry = dialog.get_selected_location()
+            if not entry or not self.window:
+                return
+
+            location = self.window.tracker.add_location(*entry, method=getattr(self.window, 'method', DEFAULT_METHOD))
+            self.add_location_section(location)
+            self.save_extra_locations()
+        except Exception as e:
+            self.show_error_dialog("Add Location Error", f"An error occurred while adding the location:\n{e}")
+
+    def remove_location(self, location):
+        section = self.location_sections.pop(location.key, None)
+        if section:
+            self.other_locations_menu.removeAction(section.menu.menuAction())
+            section.menu.deleteLater()
+        self.window.tracker.remove_location(location)
+        self.save_extra_locations()
+
+    def save_extra_locations(self):
+        tracker = self.window.tracker
+        save_extra_locations([
+            (CityEntry(location.city_name, location.country_name, location.latitude, location.longitude, location.timezone), location.method)
+            for location in tracker.locations.values() if location is not self.window.location
+        ])
+
+    def add_location_section(self, location):
+        """Build a location's submenu once: its current segment, the day's prayers and a remove action."""
+        menu = self.other_locations_menu.addMenu(location.display_name)
+        status_action = menu.addAction("Loading prayer times...")
+        menu.addSeparator()
+        actions = {entry: menu.addAction("") for entry in MENU_ENTRIES["prayer_times_menu"]}
+        for action in actions.values():
+            action.setVisible(False)
+        menu.addSeparator()
+        remove_action = menu.addAction("Remove")
+        remove_action.triggered.connect(lambda: self.remove_location(location))
+        self.location_sections[location.key] = LocationSection(location, menu, status_action, actions)
 
-            self.imsak_menu.clear()
-            self.imsak_menu.addAction("Error fetching Imsak time")
+    def refresh_location_sections(self):
+        """Update the other locations' texts; prayer times are only reformatted when they changed."""
+        for section in self.location_sections.values():
+            location = section.location
+            label, next_time = self.window.tracker.state(location)
+            if label and next_time:
+                section.status_action.setText(f"Now: {label} until {format_clock(next_time.hour, next_time.minute)}")
+            elif not location.prayer_times:
+                section.status_action.setText("Loading prayer times...")
 
-            self.tahajjud_menu.clear()
-            self.tahajjud_menu.addAction("Error calculating Tahajjud time")
+            if location.prayer_times and location.segments and location.prayer_times is not section.source:
+                texts = format_menu_texts(location.prayer_times, location.segments)
+                for entry, action in section.actions.items():
+                    action.setText(texts[entry])
+                    action.setVisible(True)
+                section.source = location.prayer_times
 
-            self.sunrise_sunset_menu.clear()
-            self.sunrise_sunset_menu.addAction("Error fetching Sunrise/Sunset times")
+    def change_location(self):
+        """Ask for another city, remember it, and switch the overlay window to it."""
+        try:
+            from input_dialog import CityCountryInputDialog
+            dialog = CityCountryInputDialog()
+            if dialog.exec_() != QDialog.Accepted:
+                return
+            location = dialog.get_selected_location()
+            if not location or not self.window:
+                return
 
-            self.hijri_date_menu.clear()
-            self.hijri_date_menu.addAction("Error fetching Hijri date")
+            method = getattr(self.window, 'method', DEFAULT_METHOD)
+            save_location(location, method)
+            self.window.set_location(*location, method=method)
+            self.invalidate_menus()
         except Exception as e:
-            print(f"Error displaying fallback menus: {e}")
-            
+            self.show_error_dialog("Change Location Error", f"An error occurred while changing the location:\n{e}")
+
+    def handle_instance_args(self, args):
+        """Act on the arguments of a later launch, which SingleInstance forwarded to this one."""
+        from single_instance import ADD_LOCATION_ARG, CHANGE_LOCATION_ARG, QUIT_ARG
+        if QUIT_ARG in args:
+            self.exit_application()
+        elif CHANGE_LOCATION_ARG in args:
+            self.change_location()
+        elif ADD_LOCATION_ARG in args:
+            self.add_location()
+        elif self.window:
+            # A plain relaunch (or --show) brings the overlay back
+            self.window.showNormal()
+            self.window.raise_()
+
+    def invalidate_menus(self):
+        """Mark the submenus out of date; they are rebuilt the next time the menu opens."""
+        self.menus_stale = True
+
+    def refresh_menus_if_stale(self):
+        if self.menus_stale or self.hijri_date_day != self.current_hijri_day():
+            self.update_prayer_times_menu()
+
+    @instrumented("update_prayer_times_menu")
     def update_prayer_times_menu(self):
-            """Update all submenus with the latest prayer times and related information."""
-            if self.window.prayer_times:
+            """
+            Update all submenus with the latest prayer times and related information.
+            The texts are formatted once per set of prayer times; the existing actions only get new text.
+            """
+            self.menus_stale = False
+            if self.window and self.window.prayer_times:
                 prayer_times = self.window.prayer_times
-                segments = calculate_segments(prayer_times)
-    
-                # Update Prayer Times submenu
-                self.prayer_times_menu.clear()
-                self.prayer_times_menu.addAction(f"Fajr: {segments['fajr_time'].strftime('%I:%M %p')}")
-                self.prayer_times_menu.addAction(f"Duha: {(segments['sunrise_time'] + datetime.timedelta(minutes=20)).strftime('%I:%M %p')}")
-                self.prayer_times_menu.addAction(f"Zuhr: {segments['dhuhr_time'].strftime('%I:%M %p')}")
-                self.prayer_times_menu.addAction(f"Asr: {segments['asr_time'].strftime('%I:%M %p')}")
-                self.prayer_times_menu.addAction(f"Maghrib: {segments['maghrib_time'].strftime('%I:%M %p')}")
-                self.prayer_times_menu.addAction(f"Esha: {segments['isha_time'].strftime('%I:%M %p')}")
-    
-                # Update Imsak submenu
-                self.imsak_menu.clear()
-                imsak_time = prayer_times.get('Imsak', 'N/A')
-                if imsak_time != 'N/A':
-                    imsak_datetime = datetime.datetime.strptime(imsak_time, "%H:%M").strftime("%I:%M %p")
-                    self.imsak_menu.addAction(f"Imsak: {imsak_datetime}")
-                else:
-                    self.imsak_menu.addAction("Error fetching Imsak time")
-    
-                # Update Tahajjud submenu
-                self.tahajjud_menu.clear()
-                if "lastthird_time" in segments and "fajr_time" in segments:
-                    self.tahajjud_menu.addAction(
-                        f"Appr. Best Time: {segments['lastthird_time'].strftime('%I:%M %p')} - {segments['fajr_time'].strftime('%I:%M %p')}"
-                    )
-                else:
-                    self.tahajjud_menu.addAction("Error calculating Tahajjud time")
-    
-                # Update Makruh Times submenu
-                self.makruh_menu.clear()
-                self.makruh_menu.addAction(
-                    f"After Fajr: {segments['fajr_time'].strftime('%I:%M %p')} - {segments['sunrise_time'].strftime('%I:%M %p')}"
-                )
-                self.makruh_menu.addAction(
-                    f"Before Zuhr: {(segments['dhuhr_time'] - datetime.timedelta(minutes=5)).strftime('%I:%M %p')} - {segments['dhuhr_time'].strftime('%I:%M %p')}"
-                )
-                self.makruh_menu.addAction(
-                    f"Before Maghrib: {(segments['maghrib_time'] - datetime.timedelta(minutes=15)).strftime('%I:%M %p')} - {segments['maghrib_time'].strftime('%I:%M %p')}"
-                )
-    
-                # Update Sunrise/Sunset submenu
-                self.sunrise_sunset_menu.clear()
-                self.sunrise_sunset_menu.addAction(f"Sunrise: {segments['sunrise_time'].strftime('%I:%M %p')}")
-                self.sunrise_sunset_menu.addAction(f"Sunset: {segments['maghrib_time'].strftime('%I:%M %p')}")
-    
+                if prayer_times is not self.menu_texts_source:
+                    segments = getattr(self.window, 'segments', None) or calculate_segments(prayer_times)
+                    if not segments:
+                        self.show_fallback_menus()
+                        return
+                    for entry, text in format_menu_texts(prayer_times, segments).items():
+                        action = self.menu_actions[entry]
+                        action.setText(text)
+                        action.setVisible(True)
+                    self.menu_texts_source = prayer_times
+                    self.maghrib_time = segments['maghrib_time']
+
                 # Update Hijri Date submenu
-                self.hijri_date_menu.clear()
-                hijri_date = self.get_hijri_date()
-                if hijri_date:
-                    self.hijri_date_menu.addAction(hijri_date)
-                else:
-                    self.hijri_date_menu.addAction("Error fetching Hijri date")
-                    
-    def get_hijri_date(self):
-        """Fetch the Hijri date from the API."""
-        try:
-            response = requests.get("https://api.aladhan.com/v1/gToH", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                hijri_data = data['data']['hijri']
-                day = hijri_data['day']
-                month = hijri_data['month']['en']  # English month name
-                year = hijri_data['year']
-                formatted_hijri_date = f"{day.zfill(2)} {month} {year}"  # e.g., 09 Jumādá al-ākhirah 1446
-                return formatted_hijri_date
+                if self.hijri_date_day != self.current_hijri_day() or not self.hijri_date_action.text():
+                    self.update_hijri_date()
             else:
-                print(f"Error fetching Hijri date: {response.status_code} - {response.text}")
-            return None
+                self.menus_stale = True  # Try again when prayer times have arrived
+                self.clear_menus()
+                self.maghrib_time = None
+                self.update_hijri_date()
+                self.show_menu_message("prayer_times_menu", "Loading prayer times...")
+
+    def create_hijri_date_menu(self):
+        """Build the Hijri date entry and its calendar options once; later updates only change the text."""
+        self.hijri_date_action = self.hijri_date_menu.addAction("")
+        self.hijri_date_menu.addSeparator()
+
+        calendar = self.settings.get("hijri_calendar", DEFAULT_CALENDAR)
+        calendar_menu = self.hijri_date_menu.addMenu("Calendar")
+        calendar_group = QActionGroup(calendar_menu)
+        for key, name in CALENDARS.items():
+            action = calendar_group.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(key == calendar)
+            action.triggered.connect(lambda _, key=key: self.set_hijri_setting("hijri_calendar", key))
+        calendar_menu.addActions(calendar_group.actions())
+
+        adjustment = self.settings.get("hijri_adjustment", 0)
+        adjustment_menu = self.hijri_date_menu.addMenu("Day Adjustment")
+        adjustment_group = QActionGroup(adjustment_menu)
+        for days in range(-MAX_ADJUSTMENT_DAYS, MAX_ADJUSTMENT_DAYS + 1):
+            action = adjustment_group.addAction(f"{days:+d} day{'s' if abs(days) != 1 else ''}" if days else "None")
+            action.setCheckable(True)
+            action.setChecked(days == adjustment)
+            action.triggered.connect(lambda _, days=days: self.set_hijri_setting("hijri_adjustment", days))
+        adjustment_menu.addActions(adjustment_group.actions())
+
+        rollover = self.settings.get("hijri_rollover", DEFAULT_ROLLOVER)
+        rollover_menu = self.hijri_date_menu.addMenu("New Day Starts At")
+        rollover_group = QActionGroup(rollover_menu)
+        for key, name in ((ROLLOVER_MAGHRIB, "Maghrib"), (ROLLOVER_MIDNIGHT, "Midnight")):
+            action = rollover_group.addAction(name)
+            action.setCheckable(True)
+            action.setChecked(key == rollover)
+            action.triggered.connect(lambda _, key=key: self.set_hijri_setting("hijri_rollover", key))
+        rollover_menu.addActions(rollover_group.actions())
+
+    def set_hijri_setting(self, key, value):
+        self.settings.set(key, value)
+        self.update_hijri_date()
+
+    def current_hijri_day(self):
+        """Return the Gregorian day whose Hijri date should be shown right now."""
+        rollover = self.settings.get("hijri_rollover", DEFAULT_ROLLOVER)
+        if not self.maghrib_time:
+            return hijri_day_for(datetime.datetime.now(), None, rollover)
+        # The date where the prayer times are
+        return hijri_day_for(datetime.datetime.now(self.maghrib_time.tzinfo), self.maghrib_time, rollover)
+
+    @instrumented("update_hijri_date")
+    def update_hijri_date(self):
+        """Show the Hijri date, calculated locally (conversions are memoized per day)."""
+        day = self.current_hijri_day()
+        self.hijri_date_day = day
+        try:
+            hijri = gregorian_to_hijri(
+                day,
+                self.settings.get("hijri_calendar", DEFAULT_CALENDAR),
+                self.settings.get("hijri_adjustment", 0),
+            )
+            self.hijri_date_action.setText(format_hijri_date(hijri))  # e.g., 09 Jumādá al-ākhirah 1446
         except Exception as e:
-            print(f"Error fetching Hijri date: {e}")
-            return None
+            print(f"Error calculating Hijri date: {e}")
+            self.hijri_date_action.setText("Error calculating Hijri date")
+
     def toggle_lock_position(self):
         """Toggle lock position on the window with error handling."""
         try:
@@ -252,7 +480,7 @@ class SystemTray(QSystemTrayIcon):
 
     def update_lock_position_action_text(self):
         """Update the lock position action text."""
-        if self.window.position_locked:
+        if self.window and self.window.position_locked:
             self.lock_position_action.setText("Unlock Position")
         else:
             self.lock_position_action.setText("Lock Position")
@@ -0,0 +1,39 @@
+import datetime
+import unittest
+from zoneinfo import ZoneInfo
+from prayer_time_handler import calculate_day_timetable
+from segment_table import SegmentTable
+
+HELSINKI = (60.1699, 24.9384, "Europe/Helsinki")
+NIGHT_KEYS = ["maghrib_time", "isha_time", "midnight_time", "lastthird_time", "next_fajr_time"]
+
+
+class HighLatitudeSummerTest(unittest.TestCase):
+    """Around the June solstice in Helsinki (method 3) Isha falls after midnight."""
+
+    def setUp(self):
+        date = datetime.date(2025, 6, 21)
+        self.today = calculate_day_timetable(*HELSINKI, date, method=3)
+        self.tomorrow = calculate_day_timetable(*HELSINKI, date + datetime.timedelta(days=1), method=3)
+
+    def test_isha_is_after_midnight(self):
+        self.assertLess(self.today.minute("Isha"), self.today.minute("Maghrib"))
+
+    def test_night_boundaries_follow_maghrib(self):
+        seconds = self.today.segment_seconds(self.tomorrow)
+        night = [seconds[key] for key in NIGHT_KEYS]
+        self.assertEqual(night, sorted(night))
+        self.assertGreater(seconds["isha_time"], 24 * 3600)
+
+    def test_isha_starts_after_midnight_of_the_next_date(self):
+        table = SegmentTable.from_days([self.today])
+        zone = ZoneInfo(HELSINKI[2])
+        isha = datetime.datetime.combine(self.tomorrow.date, datetime.time(), zone) + datetime.timedelta(
+            minutes=self.today.minute("Isha"))
+        self.assertEqual(table.label_at(datetime.datetime(2025, 6, 21, 23, 30, tzinfo=zone)), "MAGHRIB")
+        self.assertEqual(table.label_at(isha - datetime.timedelta(minutes=1)), "MAGHRIB")
+        self.assertEqual(table.label_at(isha), "ISHA")
+
+
+if __name__ == "__main__":
+    unittest.main()
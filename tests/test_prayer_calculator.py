@@ -0,0 +1,35 @@
+import datetime
+import unittest
+from prayer_calculator import calculate_prayer_times
+from bulk_timetable import generate_timetable
+
+LONDON = (51.5072, -0.1276, "Europe/London")
+SOLSTICE = datetime.date(2025, 6, 21)
+
+
+def _as_text(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class MidnightTest(unittest.TestCase):
+    """Aladhan's default midnight is halfway from sunset to sunrise; only the Jafari method runs it to Fajr."""
+
+    def test_standard_midnight_is_halfway_to_sunrise(self):
+        timings = calculate_prayer_times(*LONDON, SOLSTICE, method=2)
+        self.assertEqual(timings["Sunset"], "21:22")
+        self.assertEqual(timings["Midnight"], "01:03")
+
+    def test_jafari_midnight_runs_to_fajr(self):
+        timings = calculate_prayer_times(*LONDON, SOLSTICE, method=0)
+        self.assertEqual(timings["Midnight"], "00:04")
+
+    def test_bulk_timetable_agrees(self):
+        for method in (0, 2):
+            timings = calculate_prayer_times(*LONDON, SOLSTICE, method=method)
+            row = generate_timetable([LONDON[0]], [LONDON[1]], [LONDON[2]], SOLSTICE, SOLSTICE, method=method)[0, 0]
+            for key, index in (("Midnight", 8), ("Firstthird", 9), ("Lastthird", 10)):
+                self.assertEqual(_as_text(int(row[index])), timings[key])
+
+
+if __name__ == "__main__":
+    unittest.main()
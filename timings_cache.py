@@ -0,0 +1,108 @@
+import datetime
+import json
+import os
+import threading
+from app_paths import get_data_file
+
+CACHE_FILE_NAME = "timings_cache.json"
+KEEP_PAST_DAYS = 1  # Yesterday is kept for the hours after midnight
+MAX_ENTRY_AGE_DAYS = 45  # Entries fetched longer ago than this are evicted
+REFRESH_AFTER_DAYS = 7  # Cached days older than this are served, then refreshed in the background
+
+
+def make_key(city_name, country_name, method, date):
+    """Build the cache key for one location, calculation method and day."""
+    return f"{city_name.strip().lower()}|{country_name.strip().lower()}|{method}|{date.isoformat()}"
+
+
+class TimingsCache:
+    """Persistent per-day prayer timings, stored as a JSON file in the app data directory."""
+
+    def __init__(self, path=None):
+        self.path = path or get_data_file(CACHE_FILE_NAME)
+        self.lock = threading.Lock()
+        self.entries = self._load()
+        self.evict_stale()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable timings cache: {e}")
+            return {}
+
+    def _save(self):
+        """Write the cache atomically so a crash never leaves a half-written file."""
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"Error saving timings cache: {e}")
+
+    def get(self, city_name, country_name, method, date):
+        """Return the cache entry ({"timings": ..., "fetched": ...}) for a day, or None."""
+        with self.lock:
+            return self.entries.get(make_key(city_name, country_name, method, date))
+
+    def needs_refresh(self, entry, now=None):
+        """Return True if a cached entry is old enough to be refreshed in the background."""
+        now = now or datetime.datetime.now()
+        try:
+            fetched = datetime.datetime.fromisoformat(entry["fetched"])
+        except (KeyError, TypeError, ValueError):
+            return True
+        return now - fetched > datetime.timedelta(days=REFRESH_AFTER_DAYS)
+
+    def store_days(self, city_name, country_name, method, timings_by_date):
+        """Store {date: timings} for one location and persist the cache."""
+        fetched = datetime.datetime.now().isoformat(timespec="seconds")
+        with self.lock:
+            for date, timings in timings_by_date.items():
+                key = make_key(city_name, country_name, method, date)
+                self.entries[key] = {"timings": timings, "fetched": fetched}
+            self._evict_locked()
+            self._save()
+
+    def evict_stale(self):
+        """Drop past days and entries fetched too long ago."""
+        with self.lock:
+            if self._evict_locked():
+                self._save()
+
+    def _evict_locked(self):
+        today = datetime.date.today()
+        oldest_day = today - datetime.timedelta(days=KEEP_PAST_DAYS)
+        oldest_fetch = datetime.datetime.now() - datetime.timedelta(days=MAX_ENTRY_AGE_DAYS)
+
+        stale_keys = []
+        for key, entry in self.entries.items():
+            try:
+                day = datetime.date.fromisoformat(key.rsplit("|", 1)[1])
+                fetched = datetime.datetime.fromisoformat(entry["fetched"])
+            except (IndexError, KeyError, TypeError, ValueError):
+                stale_keys.append(key)
+                continue
+            if day < oldest_day or fetched < oldest_fetch:
+                stale_keys.append(key)
+
+        for key in stale_keys:
+            del self.entries[key]
+        return bool(stale_keys)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_timings_cache():
+    """Return the process-wide timings cache, loading it from disk on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TimingsCache()
+        return _cache
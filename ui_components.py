@@ -1,22 +1,42 @@
-from PyQt5.QtCore import Qt, QPoint, QTimer
-from PyQt5.QtGui import QColor, QPainter, QFont, QCursor
+from PyQt5.QtCore import Qt, QPoint, QPointF, QRect, QTimer
+from PyQt5.QtGui import QColor, QPainter, QFont, QFontMetrics, QStaticText, QTransform, QCursor
 from PyQt5.QtWidgets import QWidget, QMenu, QAction, QLineEdit, QDialog, QDialogButtonBox, QLabel, QVBoxLayout, QApplication, QSystemTrayIcon,QMessageBox
-from prayer_time_handler import calculate_segments, determine_label_and_countdown, fetch_prayer_times
+from prayer_calculator import DEFAULT_METHOD
+from location_tracker import LocationTracker
+from notification_engine import START
+from metrics import instrumented, record_wakeup
 import datetime
 
+WINDOW_HEIGHT = 32
+TEXT_PADDING = 25  # Extra width around the text; the text starts a third of it in from the left
+BACKGROUND_COLOR = QColor(248, 227, 33, int(255 * 1))  # F8E321
+TEXT_COLOR = QColor("#181B23")  # Dark gray for text
+
 class DraggableWindow(QWidget):
-    def __init__(self, city_name, country_name, tray):
+    """
+    Overlay for the primary location. Its prayer times, segment changes and notifications come from a
+    LocationTracker, which may track further locations for the tray menu.
+    """
+    def __init__(self, city_name, country_name, tray, latitude=None, longitude=None, timezone=None, method=DEFAULT_METHOD, tracker=None):
         super().__init__()
         try:
             # Initialize attributes
-            self.city_name = city_name
-            self.country_name = country_name
             self.tray = tray
+            self.location = None  # TrackedLocation shown by this window
             self.position_locked = False
             self.prayer_label = ""
             self.countdown_text = ""
-            self.prayer_wakt = False  # Tracks whether the prayer wakt notification has been shown
-            self.notified_30_minutes = False  # Tracks whether the 30-min reminder has been shown
+            self.next_time = None  # End of the current segment
+
+            # Render cache: the font and its metrics are built once, the "city label left" prefix is a
+            # QStaticText laid out only when it changes, and each second only the countdown is repainted
+            self.text_font = QFont("Trebuchet MS", 14)
+            self.font_metrics = QFontMetrics(self.text_font)
+            self.prefix_text = QStaticText()
+            self.prefix_text.setTextFormat(Qt.PlainText)
+            self.prefix_text.setPerformanceHint(QStaticText.AggressiveCaching)
+            self.prefix_width = 0
+            self.countdown_width = 0
 
             # Setup window properties
             self.setWindowTitle("City Display Window")
@@ -45,25 +65,19 @@ class DraggableWindow(QWidget):
             self.lock_action.triggered.connect(self.toggle_lock_position)
 
             self.update_lock_action()
-            
-            # Setup prayer times
-            self.city_name = city_name
-            self.country_name = country_name
-            self.prayer_times = fetch_prayer_times(city_name, country_name)
 
-            # Setup timers
-            self.timer = QTimer(self)
-            self.timer.timeout.connect(self.update_prayer_info)
-            self.timer.start(1000)  # Trigger update_prayer_info every second
+            # Segment changes and notifications are event driven; the 1-second timer only redraws the countdown
+            self.tracker = tracker or LocationTracker(self)
+            self.tracker.prayer_times_changed.connect(self.on_prayer_times_changed)
+            self.tracker.segment_changed.connect(self.on_segment_changed)
+            self.tracker.notification_due.connect(self.on_notification_due)
 
             self.countdown_timer = QTimer(self)
             self.countdown_timer.timeout.connect(self.update_countdown)
             self.countdown_timer.start(1000)
 
-            # Fetch prayer times
-            self.prayer_times = fetch_prayer_times(self.city_name, self.country_name)
-            if not self.prayer_times:
-                raise ValueError("Error fetching prayer times.")
+            # Render right away from calculated or cached times (or a placeholder while they are fetched)
+            self.location = self.tracker.add_location(city_name, country_name, latitude, longitude, timezone, method)
             self.update_prayer_info()
 
             self.show()
@@ -75,17 +89,39 @@ class DraggableWindow(QWidget):
             print(f"Unexpected DraggableWindow initialization error: {e}")
             self.show_error_dialog("Unexpected Error", f"An unexpected error occurred:\n{e}")
 
-    def get_next_state(self, current_label):
+    # The tray reads the primary location's details through the window
+    @property
+    def city_name(self):
+        return self.location.city_name if self.location else ""
 
-        # Define the sequence of states
-        states = ["FAJR", "Makruh1", "DUHA", "Makruh2", "ZUHR", "ASR", "Makruh3", "MAGHRIB", "ISHA", "Mid Night", "TAHAJJUT"]
-    
-        # Find the index of the current state
-        current_index = states.index(current_label)
-    
-        # Determine the next state (wrap around to the beginning if at the end)
-        next_index = (current_index + 1) % len(states)
-        return states[next_index]
+    @property
+    def country_name(self):
+        return self.location.country_name if self.location else ""
+
+    @property
+    def method(self):
+        return self.location.method if self.location else DEFAULT_METHOD
+
+    @property
+    def prayer_times(self):
+        return self.location.prayer_times if self.location else None
+
+    @property
+    def segments(self):
+        return self.location.segments if self.location else None
+
+    def set_location(self, city_name, country_name, latitude=None, longitude=None, timezone=None, method=DEFAULT_METHOD):
+        """Switch the overlay to another location and load its prayer times."""
+        self.next_time = None
+        self.tracker.change_location(self.location, city_name, country_name, latitude, longitude, timezone, method)
+        self.update_prayer_info()
+
+    def on_prayer_times_changed(self, location):
+        """Called by the tracker when any location has new prayer times."""
+        if location is self.location:
+            self.update_prayer_info()
+        if self.tray and hasattr(self.tray, 'invalidate_menus'):
+            self.tray.invalidate_menus()
 
     def toggle_lock_position(self):
         self.position_locked = not self.position_locked
@@ -98,111 +134,106 @@ class DraggableWindow(QWidget):
         else:
             self.lock_action.setText("Lock Position")
 
+    @instrumented("update_prayer_info")
     def update_prayer_info(self):
-        """Update prayer information with error handling."""
+        """Show the current segment of the window's location, as worked out by the shared scheduler."""
         try:
             if not self.prayer_times:
-                self.prayer_label = "Error fetching prayer times"
-                self.countdown_text = ""
-                self.timer.start(60000)  # Retry in 1 minute
-                self.update()  # Trigger UI update
+                self.set_display_text("Loading", "...")
                 return
     
-            # Calculate prayer time segments
-            segments = calculate_segments(self.prayer_times)
-            if not segments:
-                self.prayer_label = "Error calculating prayer times"
-                self.countdown_text = ""
-                self.timer.start(60000)  # Retry in 1 minute
-                self.update()  # Trigger UI update
+            if not self.segments:
+                self.next_time = None
+                self.set_display_text("Error calculating prayer times", "...")
                 return
     
-            # Determine the next prayer info
-            prayer_info = determine_label_and_countdown(segments)
-            self.prayer_label = prayer_info['label']
-            next_time = prayer_info['next_time']
-    
-            if next_time and next_time > datetime.datetime.now():
-                time_remaining = next_time - datetime.datetime.now()
-                self.countdown_text = f"{time_remaining.seconds // 3600}h {(time_remaining.seconds // 60) % 60}m {time_remaining.seconds % 60}s"
-                self.timer.start(max(1, int(time_remaining.total_seconds() * 1000)))
-            else:
-                self.prayer_label = "Prayer time error"
-                self.countdown_text = ""
-                self.timer.start(60000)  # Retry in 1 minute
+            label, next_time = self.tracker.state(self.location)
+            if not label:
+                self.next_time = None
+                self.set_display_text("Prayer time error", "...")
+                return
+            self.on_segment_changed(self.location, label, next_time)
     
         except Exception as e:
             print(f"Error in update_prayer_info: {e}")
-            self.prayer_label = "Error updating prayer info"
-            self.countdown_text = ""
-            self.timer.start(60000)  # Retry in 1 minute
-            self.update()  # Trigger UI update
+            self.next_time = None
+            self.set_display_text("Error updating prayer info", "...")
+
+    def on_segment_changed(self, location, label, next_time):
+        """Called by the tracker whenever the current segment of a location changes."""
+        if location is not self.location:
+            return
+        self.next_time = next_time
+        self.set_display_text(label, self.format_countdown())
 
+    def on_notification_due(self, location, event):
+        """Show a notification from the shared queue; reminders state the time actually left."""
+        if event.kind == START:
+            message = f"{event.label} Time Started!."
+        else:
+            minutes_left = max(1, round((event.end - datetime.datetime.now(event.end.tzinfo)).total_seconds() / 60))
+            message = f"Approx. {minutes_left} minutes left for {event.label}."
+        if len(self.tracker.locations) > 1:
+            message = f"{location.city_name}: {message}"
+        self.show_notification("Prayer Reminder", message)
+
+    def format_countdown(self):
+        # Now in the boundary's own zone: the same instant, and the cheapest aware subtraction
+        seconds = max(0, int((self.next_time - datetime.datetime.now(self.next_time.tzinfo)).total_seconds()))
+        return f"{seconds // 3600}h {(seconds // 60) % 60}m {seconds % 60}s"
+
+    @instrumented("update_countdown")
     def update_countdown(self):
+        """Refresh the countdown text; the segment itself is tracked by the scheduler."""
+        record_wakeup("countdown")
         try:
-            # Validate prayer times
-            if not self.prayer_times:
-                self.countdown_text = "Prayer times unavailable"
-                self.update()  # Trigger UI update
-                return
-    
-            # Calculate segments
-            segments = calculate_segments(self.prayer_times)
-            if not segments:
-                self.countdown_text = "Error calculating countdown"
-                self.update()  # Trigger UI update
-                return
-    
-            # Determine the next prayer time
-            prayer_info = determine_label_and_countdown(segments)
-            next_time = prayer_info.get('next_time')
-            self.prayer_label = prayer_info.get('label', "UNKNOWN")  # Update class-level label
-    
-            if not next_time or next_time <= datetime.datetime.now():
-                self.countdown_text = "Countdown unavailable"
-                self.notified_30_minutes = False  # Reset 30-minute notification flag
-                self.prayer_wakt = False  # Reset wakt notification flag
-                self.update()  # Trigger UI update
+            if not self.next_time:
                 return
-    
-            # Calculate time remaining
-            time_remaining = next_time - datetime.datetime.now()
-    
-            # Notify for 30-minute reminders
-            if (
-                0 < time_remaining.total_seconds() <= 1800 and
-                not self.notified_30_minutes and
-                self.prayer_label in ["FAJR", "ZUHR", "ASR", "MAGHRIB", "ISHA"]
-            ):
-                self.show_notification(
-                    "Prayer Reminder",
-                    f"Approx. 30 minutes left for {self.prayer_label}."
-                )
-                self.notified_30_minutes = True
-    
-            # Notify for wakt reminders
-            if (
-                 0 < time_remaining.total_seconds() <= 1 and  # Time has passed
-                not self.prayer_wakt and  # Notification not already shown
-                self.prayer_label in ["FAJR", "Makruh1", "DUHA", "Makruh2", "ZUHR", "ASR", "Makruh3", "MAGHRIB", "ISHA", "Mid Night", "TAHAJJUT"]
-            ):
-                next_state = self.get_next_state(self.prayer_label)
-                
-                self.show_notification(
-                    "Prayer Reminder",
-                    f"{next_state} Time Started!."
-                )
-                self.prayer_wakt = True  # Prevent repeated notifications
-    
-            # Update countdown text
-            self.countdown_text = f"{time_remaining.seconds // 3600}h {(time_remaining.seconds // 60) % 60}m {time_remaining.seconds % 60}s"
-            self.update()  # Trigger UI update
+            self.set_display_text(self.prayer_label, self.format_countdown())
     
         except Exception as e:
             print(f"Error in update_countdown: {e}")
-            self.countdown_text = "Error updating countdown"
-            self.update()  # Trigger UI update
+            self.set_display_text(self.prayer_label, "Error updating countdown")
+
+    def set_display_text(self, prayer_label, countdown_text):
+        """
+        Change the overlay text, repainting only what changed: a new label relayouts the prefix and
+        repaints everything, a new countdown repaints just the countdown. The window is resized
+        only when the text width changes.
+        """
+        prefix = f"{self.city_name} {prayer_label} left "
+        old_countdown_rect = self.countdown_rect()
+        label_changed = prefix != self.prefix_text.text()
+        if not label_changed and countdown_text == self.countdown_text:
+            return
 
+        self.prayer_label = prayer_label
+        self.countdown_text = countdown_text
+        if label_changed:
+            self.prefix_text.setText(prefix)
+            self.prefix_text.prepare(QTransform(), self.text_font)
+            self.prefix_width = self.font_metrics.width(prefix)
+        self.countdown_width = self.font_metrics.width(countdown_text)
+
+        width = self.prefix_width + self.countdown_width + TEXT_PADDING
+        if width != self.width() or self.height() != WINDOW_HEIGHT:
+            self.resize(width, WINDOW_HEIGHT)  # Schedules a full repaint
+        elif label_changed:
+            self.update()
+        elif self.isVisible():
+            self.update(old_countdown_rect.united(self.countdown_rect()))
+
+    def text_origin(self):
+        """Return (x, baseline y) of the text, placed as the overlay always has been."""
+        text_width = self.prefix_width + self.countdown_width
+        return (self.width() - text_width) // 3, (self.height() + self.font_metrics.height()) // 3
+
+    def countdown_rect(self):
+        x, _ = self.text_origin()
+        # A little slack on both sides for antialiased glyph edges
+        return QRect(x + self.prefix_width - 2, 0, self.countdown_width + 4, self.height())
+
+    @instrumented("paintEvent")
     def paintEvent(self, event):
         """Handle the painting of the window with error handling."""
         try:
@@ -210,36 +241,22 @@ class DraggableWindow(QWidget):
             if not self.city_name or not self.prayer_label or not self.countdown_text:
                 raise ValueError("Missing critical data for rendering.")
     
+            # Everything is clipped to the dirty region, which is usually just the countdown
             painter = QPainter(self)
             painter.setRenderHint(QPainter.Antialiasing)
     
-            # Gradient Background with 90% Opacity
-            background_color = QColor(248, 227, 33, int(255 * 1))  # F8E321 with 90% opacity
-            painter.setBrush(background_color)
-            painter.setPen(Qt.NoPen)
-
-    
-            # Font Setup
-            font = QFont("Trebuchet MS", 14)
-            painter.setFont(font)
-    
-            # Calculate Text Size
-            text = f"{self.city_name} {self.prayer_label} left {self.countdown_text}"
-            text_width = painter.fontMetrics().width(text)
-            text_height = painter.fontMetrics().height()
-    
-            # Resize Window
-            self.resize(text_width + 25, 32)
-    
             # Draw Background
+            painter.setBrush(BACKGROUND_COLOR)
+            painter.setPen(Qt.NoPen)
             painter.drawRoundedRect(0, 0, self.width() - 5, self.height() - 5, 10, 10)
     
-            # Set Text Color (181B23) and Draw Text
-            text_color = QColor("#181B23")  # Dark gray for text
-            painter.setPen(text_color)
-            x_pos = (self.width() - text_width) // 3
-            y_pos = (self.height() + text_height) // 3
-            painter.drawText(x_pos, y_pos, text)
+            # Draw Text: the cached prefix only when it is part of the dirty region
+            painter.setFont(self.text_font)
+            painter.setPen(TEXT_COLOR)
+            x_pos, y_pos = self.text_origin()
+            if event.rect().left() < x_pos + self.prefix_width:
+                painter.drawStaticText(QPointF(x_pos, y_pos - self.font_metrics.ascent()), self.prefix_text)
+            painter.drawText(x_pos + self.prefix_width, y_pos, self.countdown_text)
     
         except ValueError as e:
             print(f"Paint error: {e}")